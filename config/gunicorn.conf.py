@@ -0,0 +1,10 @@
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+
+def on_starting(server):
+    """Удаляет файлы метрик воркеров прошлого запуска"""
+    from monitoring.metrics import REGISTRY
+
+    REGISTRY.clear()
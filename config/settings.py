@@ -36,9 +36,12 @@ INSTALLED_APPS = [
     "cities_light",
     "users",
     "habits",
+    "monitoring",
 ]
 
 MIDDLEWARE = [
+    "monitoring.middleware.MetricsMiddleware",
+    "monitoring.middleware.PerformanceMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -154,8 +157,51 @@ if CACHE_ENABLED:
         }
     }
 
+if "test" in sys.argv:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Время жизни закэшированной страницы ленты публичных привычек (в секундах)
+PUBLIC_FEED_CACHE_TIMEOUT = 300
+
 # Logging settings
 
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+        },
+    },
+    "loggers": {
+        "monitoring.requests": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
+# Доля запросов, для которых замеряются время, запросы к базе и этапы обработки DRF (0 - выключено, 1 - все)
+PERFORMANCE_SAMPLE_RATE = float(os.getenv("PERFORMANCE_SAMPLE_RATE", 0.05))
+if "test" in sys.argv:
+    PERFORMANCE_SAMPLE_RATE = 0
+# Отдавать замеры клиенту в заголовке Server-Timing
+PERFORMANCE_SERVER_TIMING = os.getenv("PERFORMANCE_SERVER_TIMING", "True").lower() == "true"
+
+# Metrics settings
+
+# Общий каталог файлов метрик процессов (воркеры gunicorn, Celery); без него /metrics отдает метрики одного процесса
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+# Как часто (в секундах) процесс сохраняет свои метрики в файл каталога
+METRICS_FLUSH_INTERVAL = 1
+# Токен для доступа к /metrics (заголовок Authorization: Bearer <токен>); если не задан, доступ закрыт
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
 # Rest_framework settings
 
 REST_FRAMEWORK = {
@@ -172,6 +218,21 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 5,
 }
 
+# Максимальное количество элементов в пакетной операции над привычками (/habits/habits/bulk/)
+HABITS_BULK_MAX_ITEMS = 500
+
+# Количество строк, читаемых из базы за раз при потоковой выгрузке привычек (/habits/habits/export/)
+HABITS_EXPORT_CHUNK_SIZE = int(os.getenv("HABITS_EXPORT_CHUNK_SIZE", 2000))
+
+# Импорт привычек из файла (/habits/habits/import/, команда import_habits): строк в одной транзакции
+# и сколько ошибок строк возвращается в отчете (остальные только подсчитываются)
+HABITS_IMPORT_CHUNK_SIZE = int(os.getenv("HABITS_IMPORT_CHUNK_SIZE", 1000))
+HABITS_IMPORT_MAX_ERRORS = 1000
+# Импорт через API выполняется внутри запроса (~1000 строк в секунду), поэтому размер файла и число строк
+# ограничены, чтобы уложиться в таймаут воркера; большие файлы импортируются командой import_habits
+HABITS_IMPORT_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+HABITS_IMPORT_MAX_ROWS = 20000
+
 # CORS
 
 CORS_ALLOWED_ORIGINS = [
@@ -191,11 +252,34 @@ CELERY_ENABLE_UTC = False
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 
+# Количество шардов (по user_id), на которые делится рассылка напоминаний одной минуты
+REMINDER_SHARDS = int(os.getenv("REMINDER_SHARDS", 1))
+# Сколько хранить записи журнала отправленных напоминаний (защита от повторной отправки)
+REMINDER_DELIVERY_TTL = timedelta(days=2)
+
+# Роллап статистики выполнений (habits.stats.refresh_habit_stats): записей журнала за одну транзакцию,
+# задержка перед учетом новых записей и сколько дней хранить даты выполнений для долей за 7/30/90 дней
+HABIT_STATS_BATCH_SIZE = 5000
+HABIT_STATS_LAG = timedelta(seconds=10)
+HABIT_STATS_KEEP_DAYS = 90
+
 CELERY_BEAT_SCHEDULE = {
     "send_habit_reminder": {
         "task": "habits.tasks.send_habit_reminder",
         "schedule": timedelta(minutes=1),
     },
+    "cleanup_reminder_deliveries": {
+        "task": "habits.tasks.cleanup_reminder_deliveries",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "refresh_habit_stats": {
+        "task": "habits.tasks.refresh_habit_stats",
+        "schedule": timedelta(minutes=1),
+    },
+    "flush_telegram_completions": {
+        "task": "habits.tasks.flush_telegram_completions",
+        "schedule": timedelta(seconds=5),
+    },
 }
 
 # EMAIL BACKEND SETTINGS
@@ -219,3 +303,45 @@ FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:8000")
 
 TELEGRAM_URL = "https://api.telegram.org/bot"
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+TELEGRAM_TIMEOUT = 10
+# Режим отправки: "sync" - последовательно через requests, "async" - конкурентно через httpx
+TELEGRAM_SENDER = os.getenv("TELEGRAM_SENDER", "sync")
+TELEGRAM_ASYNC_CONCURRENCY = int(os.getenv("TELEGRAM_ASYNC_CONCURRENCY", 50))
+# HTTP/2 для асинхронного режима требует пакет h2 (pip install "httpx[http2]")
+TELEGRAM_HTTP2 = os.getenv("TELEGRAM_HTTP2", "False").lower() == "true"
+TELEGRAM_POOL_SIZE = 10
+TELEGRAM_BATCH_SIZE = 500
+# Лимиты Bot API: не более 30 сообщений в секунду всего и не более 1 сообщения в секунду в один чат
+TELEGRAM_GLOBAL_RATE = 30
+TELEGRAM_PER_CHAT_RATE = 1
+
+# Входящие обновления бота (webhook /habits/telegram/webhook/): секрет из setWebhook(secret_token),
+# очередь обновлений ("redis" - список в Redis, "memory" - в памяти процесса, для тестов и разработки)
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET")
+TELEGRAM_BOT_USERNAME = os.getenv("TELEGRAM_BOT_USERNAME")
+TELEGRAM_UPDATES_QUEUE = os.getenv("TELEGRAM_UPDATES_QUEUE", "redis")
+if "test" in sys.argv:
+    TELEGRAM_UPDATES_QUEUE = "memory"
+TELEGRAM_UPDATES_REDIS_URL = os.getenv("TELEGRAM_UPDATES_REDIS_URL", os.getenv("LOCATION"))
+TELEGRAM_UPDATES_KEY = "telegram:updates"
+# Обработка запускается не чаще раза в TELEGRAM_UPDATES_BATCH_DELAY секунд и забирает обновления пачками
+TELEGRAM_UPDATES_BATCH_DELAY = 1
+TELEGRAM_UPDATES_BATCH_SIZE = 1000
+# На сколько минут откладывает напоминание кнопка "Отложить"
+TELEGRAM_SNOOZE_MINUTES = 10
+# Задержки (в секундах) перед повторными попытками отправки сообщений, которые Telegram не принял
+TELEGRAM_RETRY_DELAYS = (30, 120, 600)
+# Срок действия ссылки привязки аккаунта к Telegram (/start <токен>), в секундах
+TELEGRAM_LINK_MAX_AGE = 60 * 60
+
+# Очередь отложенных сообщений (отложенные и разовые напоминания, повторы): "redis" - sorted set в Redis,
+# "memory" - в памяти процесса. Диспетчер (manage.py dispatch_delayed_messages) проверяет ее не реже
+# раза в DELAYED_QUEUE_POLL_INTERVAL секунд
+DELAYED_QUEUE = os.getenv("DELAYED_QUEUE", "redis")
+if "test" in sys.argv:
+    DELAYED_QUEUE = "memory"
+DELAYED_QUEUE_REDIS_URL = os.getenv("DELAYED_QUEUE_REDIS_URL", os.getenv("LOCATION"))
+DELAYED_QUEUE_KEY = "delayed:messages"
+DELAYED_QUEUE_POLL_INTERVAL = 1
+# На сколько вперед можно запланировать разовое напоминание
+ONE_OFF_REMINDER_MAX_AHEAD = timedelta(days=30)
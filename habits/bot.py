@@ -0,0 +1,352 @@
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date
+from typing import NamedTuple
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+import redis
+
+from habits.completions import get_local_date, record_completions
+from habits.models import Habit
+from users.models import CustomUser
+
+LINK_SALT = "habits.bot.link"
+DONE_PREFIX = "done"
+SNOOZE_PREFIX = "snooze"
+
+LINKED_MESSAGE = "Аккаунт привязан: напоминания о привычках будут приходить в этот чат"
+LINK_INVALID_MESSAGE = "Ссылка недействительна или устарела: получите новую в профиле"
+DONE_BUTTON = "Выполнено"
+DONE_ANSWER = "Выполнение отмечено"
+SNOOZE_BUTTON = "Отложить на {minutes} мин"
+SNOOZE_ANSWER = "Напомню через {minutes} мин"
+
+
+# Привязка аккаунта: t.me/<бот>?start=<токен>. Параметр start допускает только A-Z, a-z, 0-9, _ и -
+# (не длиннее 64 символов), поэтому токен - id пользователя, время выдачи (base 36) и укороченная подпись
+
+
+def _link_signature(user_id, issued):
+    return salted_hmac(LINK_SALT, f"{user_id}:{issued}").hexdigest()[:24]
+
+
+def make_link_token(user, now=None):
+    """Подписанный токен привязки чата к пользователю для команды /start"""
+    issued = _to_base36(int(now if now is not None else time.time()))
+    return f"{user.id}_{issued}_{_link_signature(user.id, issued)}"
+
+
+def read_link_token(token, now=None):
+    """Возвращает id пользователя из действительного токена привязки или None"""
+    try:
+        user_id, issued, signature = token.split("_")
+        user_id = int(user_id)
+        issued_at = int(issued, 36)
+    except ValueError:
+        return None
+    if not constant_time_compare(signature, _link_signature(user_id, issued)):
+        return None
+    if (now if now is not None else time.time()) - issued_at > settings.TELEGRAM_LINK_MAX_AGE:
+        return None
+    return user_id
+
+
+def _to_base36(value):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    result = ""
+    while True:
+        value, remainder = divmod(value, 36)
+        result = digits[remainder] + result
+        if not value:
+            return result
+
+
+def get_link_url(user):
+    """Ссылка на бота, привязывающая текущий чат Telegram к пользователю"""
+    return f"https://t.me/{settings.TELEGRAM_BOT_USERNAME}?start={make_link_token(user)}"
+
+
+def reminder_keyboard(habit, day):
+    """Inline-кнопки напоминания: "Выполнено" и "Отложить" с id привычки и локальной датой напоминания"""
+    minutes = settings.TELEGRAM_SNOOZE_MINUTES
+    return {
+        "inline_keyboard": [
+            [
+                {"text": DONE_BUTTON, "callback_data": f"{DONE_PREFIX}:{habit.id}:{day.isoformat()}"},
+                {
+                    "text": SNOOZE_BUTTON.format(minutes=minutes),
+                    "callback_data": f"{SNOOZE_PREFIX}:{habit.id}:{day.isoformat()}",
+                },
+            ]
+        ]
+    }
+
+
+class Callback(NamedTuple):
+    """Нажатие кнопки напоминания"""
+
+    action: str
+    chat_id: int
+    habit_id: int
+    day: date | None
+
+
+def parse_callback(callback):
+    """Разбирает нажатие кнопки напоминания (callback_query) или возвращает None для чужих данных"""
+    if not isinstance(callback, dict):
+        return None
+    parts = str(callback.get("data", "")).split(":")
+    if len(parts) not in (2, 3) or parts[0] not in (DONE_PREFIX, SNOOZE_PREFIX):
+        return None
+    # Чат сообщения с кнопкой (в личном чате совпадает с id нажавшего пользователя)
+    chat = (callback.get("message") or {}).get("chat") or callback.get("from") or {}
+    try:
+        day = date.fromisoformat(parts[2]) if len(parts) == 3 and parts[2] else None
+        return Callback(parts[0], int(chat["id"]), int(parts[1]), day)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class RedisUpdateQueue:
+    """
+    Очередь входящих обновлений - список в Redis: webhook добавляет обновления, обработчик забирает их пачками.
+    Флаг запланированной обработки (с таймаутом на случай потерянной задачи) не дает ставить задачу на каждое
+    обновление: при всплеске нажатий одна задача обрабатывает все обновления, накопленные за время задержки.
+    Нажатия "Выполнено" копятся отдельно - в множестве, где повторные нажатия одной кнопки схлопываются
+    """
+
+    def __init__(self, url=None, key=None):
+        self.client = redis.Redis.from_url(url or settings.TELEGRAM_UPDATES_REDIS_URL, decode_responses=True)
+        self.key = key or settings.TELEGRAM_UPDATES_KEY
+        self.scheduled_key = f"{self.key}:scheduled"
+        self.completions_key = f"{self.key}:completions"
+
+    def push(self, update):
+        self.client.rpush(self.key, update)
+
+    def pop_batch(self, size):
+        return self.client.lpop(self.key, size) or []
+
+    def requeue(self, updates):
+        """Возвращает необработанные обновления в начало очереди в прежнем порядке"""
+        if updates:
+            self.client.lpush(self.key, *reversed(updates))
+
+    def schedule(self):
+        """Ставит флаг обработки. Возвращает True, если обработка еще не была запланирована"""
+        return bool(self.client.set(self.scheduled_key, 1, nx=True, ex=60))
+
+    def release(self):
+        self.client.delete(self.scheduled_key)
+
+    def add_completions(self, members):
+        if members:
+            self.client.sadd(self.completions_key, *members)
+
+    def pop_completions(self, size):
+        return self.client.spop(self.completions_key, size) or []
+
+    def dead_letter_completions(self, members):
+        """Откладывает нажатия, которые не удается записать, в отдельное множество для разбора"""
+        if members:
+            self.client.sadd(f"{self.completions_key}:failed", *members)
+
+
+class MemoryUpdateQueue:
+    """Очередь обновлений в памяти процесса (для тестов и разработки без Redis)"""
+
+    def __init__(self):
+        self.items = deque()
+        self.completions = set()
+        self.failed_completions = set()
+        self.scheduled = False
+        self.lock = threading.Lock()
+
+    def push(self, update):
+        self.items.append(update)
+
+    def pop_batch(self, size):
+        with self.lock:
+            return [self.items.popleft() for _ in range(min(size, len(self.items)))]
+
+    def requeue(self, updates):
+        with self.lock:
+            self.items.extendleft(reversed(updates))
+
+    def schedule(self):
+        with self.lock:
+            scheduled, self.scheduled = self.scheduled, True
+        return not scheduled
+
+    def release(self):
+        self.scheduled = False
+
+    def add_completions(self, members):
+        with self.lock:
+            self.completions.update(members)
+
+    def pop_completions(self, size):
+        with self.lock:
+            return [self.completions.pop() for _ in range(min(size, len(self.completions)))]
+
+    def dead_letter_completions(self, members):
+        with self.lock:
+            self.failed_completions.update(members)
+
+
+UPDATE_QUEUES = {
+    "redis": RedisUpdateQueue,
+    "memory": MemoryUpdateQueue,
+}
+
+_queues = {}
+
+
+def get_update_queue():
+    """Возвращает общую для процесса очередь обновлений. Тип очереди задается настройкой TELEGRAM_UPDATES_QUEUE"""
+    mode = settings.TELEGRAM_UPDATES_QUEUE
+    if mode not in _queues:
+        _queues[mode] = UPDATE_QUEUES[mode]()
+    return _queues[mode]
+
+
+def enqueue_update(raw, update):
+    """
+    Кладет обновление от webhook в очередь. Нажатие "Выполнено" не ставится в общую очередь, а добавляется
+    в множество ожидающих выполнений, которое задача flush_telegram_completions записывает в базу пачками.
+    Возвращает True, если нужно запланировать обработку общей очереди
+    """
+    queue = get_update_queue()
+    callback = parse_callback(update.get("callback_query"))
+    if callback is not None and callback.action == DONE_PREFIX:
+        queue.add_completions([f"{callback.chat_id}:{callback.habit_id}:{callback.day or ''}"])
+        return False
+    queue.push(raw)
+    return queue.schedule()
+
+
+def webhook_answer(update):
+    """
+    Ответ на webhook: нажатие кнопки подтверждается сразу в теле ответа (answerCallbackQuery),
+    без отдельного запроса к Bot API
+    """
+    callback = parse_callback(update.get("callback_query"))
+    if callback is None:
+        return None
+    answer = DONE_ANSWER if callback.action == DONE_PREFIX else SNOOZE_ANSWER
+    return {
+        "method": "answerCallbackQuery",
+        "callback_query_id": update["callback_query"].get("id"),
+        "text": answer.format(minutes=settings.TELEGRAM_SNOOZE_MINUTES),
+    }
+
+
+@dataclass
+class UpdatesReport:
+    """Итоги обработки пачки обновлений"""
+
+    updates: int = 0
+    linked: int = 0
+    replies: list = field(default_factory=list)
+    snoozed: list = field(default_factory=list)
+
+
+def process_updates(raw_updates):
+    """
+    Обрабатывает пачку обновлений Telegram: привязывает чаты по /start <токен> одним bulk_update
+    и собирает отложенные кнопкой "Отложить" напоминания. Ответы в чаты (replies) и отложенные напоминания
+    (snoozed) возвращаются списками [(chat_id, сообщение[, reply_markup]), ...] для отправки пачкой
+    """
+    report = UpdatesReport()
+    links, seen = {}, set()
+    for raw in raw_updates:
+        try:
+            update = json.loads(raw)
+        except ValueError:
+            continue
+        if not isinstance(update, dict) or update.get("update_id") in seen:
+            continue
+        seen.add(update.get("update_id"))
+
+        message = update.get("message") or {}
+        text = message.get("text") or ""
+        if text.startswith("/start"):
+            chat_id = (message.get("chat") or {}).get("id")
+            parts = text.split(maxsplit=1)
+            user_id = read_link_token(parts[1].strip()) if len(parts) == 2 else None
+            if user_id is None:
+                report.replies.append((chat_id, LINK_INVALID_MESSAGE))
+            else:
+                links[chat_id] = user_id
+            continue
+
+        callback = parse_callback(update.get("callback_query"))
+        if callback is not None and callback.action == SNOOZE_PREFIX:
+            # Напоминание повторяется тем же сообщением, с теми же кнопками
+            reminder = update["callback_query"].get("message") or {}
+            if reminder.get("text"):
+                report.snoozed.append((callback.chat_id, reminder["text"], reminder.get("reply_markup")))
+
+    linked = _link_chats(links)
+    report.updates, report.linked = len(seen), len(linked)
+    report.replies += [(chat_id, LINKED_MESSAGE) for chat_id in linked]
+    return report
+
+
+def flush_completions(members):
+    """
+    Записывает накопленные нажатия "Выполнено" (элементы "chat_id:habit_id:дата") одним вызовом
+    record_completions. Возвращает количество новых выполнений
+    """
+    done = []
+    for member in members:
+        chat_id, habit_id, day = member.split(":")
+        done.append((int(chat_id), int(habit_id), date.fromisoformat(day) if day else None))
+    return _complete_habits(done)
+
+
+def _link_chats(links):
+    """Привязывает чаты к пользователям одним bulk_update; чат отвязывается от прежнего владельца"""
+    if not links:
+        return []
+    users = CustomUser.objects.only("id", "tg_chat_id").in_bulk(set(links.values()))
+    for chat_id, user_id in links.items():
+        if user_id in users:
+            users[user_id].tg_chat_id = chat_id
+    linked = [user.tg_chat_id for user in users.values()]
+    CustomUser.objects.filter(tg_chat_id__in=linked).exclude(id__in=users.keys()).update(tg_chat_id=None)
+    CustomUser.objects.bulk_update(users.values(), ["tg_chat_id"])
+    return linked
+
+
+def _complete_habits(done):
+    """
+    Отмечает выполнения по кнопкам: владелец привычки определяется по чату, чужие привычки пропускаются.
+    Дата выполнения - дата напоминания из кнопки или текущая дата пользователя. Нажатия с датой в будущем
+    (поддельные кнопки) пропускаются: API тоже не принимает выполнение в будущем
+    """
+    if not done:
+        return 0
+    users = {
+        user.tg_chat_id: user
+        for user in CustomUser.objects.filter(tg_chat_id__in={chat_id for chat_id, _, _ in done}).only(
+            "id", "tg_chat_id", "timezone"
+        )
+    }
+    owners = dict(Habit.objects.filter(id__in={habit_id for _, habit_id, _ in done}).values_list("id", "user_id"))
+    completions = []
+    for chat_id, habit_id, day in done:
+        user = users.get(chat_id)
+        if user is None or owners.get(habit_id) != user.id:
+            continue
+        today = get_local_date(user)
+        if day is not None and day > today:
+            continue
+        completions.append((habit_id, day or today))
+    _, created = record_completions(completions)
+    return len(created)
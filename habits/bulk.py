@@ -0,0 +1,185 @@
+from dataclasses import dataclass, field
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from rest_framework import serializers
+
+from habits.cache import bump_public_feed_version
+from habits.models import Habit
+from habits.serializers import UNIQUE_ERROR, BulkHabitsSerializer
+from habits.validators import HabitsValidator
+
+NOT_FOUND_ERROR = "Привычка не найдена"
+DUPLICATE_ID_ERROR = "Привычка уже указана в пачке"
+
+
+@dataclass
+class BulkResult:
+    """Итоги пакетной операции: обработанные привычки (или id удаленных) и ошибки по индексам элементов"""
+
+    results: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+
+    def add_error(self, index, detail):
+        self.errors.append({"index": index, "errors": detail})
+
+    def finish(self, results):
+        self.results = results
+        self.errors.sort(key=lambda error: error["index"])
+        return self
+
+
+def _to_id(value):
+    """Приводит id элемента пачки к числу (None, если id некорректный)"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _get_item_value(item, name):
+    return item.get(name) if isinstance(item, dict) else None
+
+
+def validate_items(items, habits, result, partial=False):
+    """
+    Валидирует элементы пачки одним сериализатором (поля создаются один раз, связанные привычки всех элементов
+    загружаются одним запросом), затем проверяет правила привычки для всей пачки (HabitsValidator.validate_many).
+    habits - {индекс: привычка, к которой применяются значения элемента}.
+    Возвращает [(индекс, привычка, провалидированные значения)]
+    """
+    related_ids = {_to_id(_get_item_value(item, "related_habit")) for item in items} - {None}
+    related_habits = Habit.objects.in_bulk(related_ids) if related_ids else {}
+    serializer = BulkHabitsSerializer(context={"related_habits": related_habits}, partial=partial)
+
+    checked = []
+    for index, item in enumerate(items):
+        habit = habits.get(index)
+        if habit is None:
+            continue
+        serializer.instance = habit if habit.pk else None
+        try:
+            attrs = serializer.run_validation(item)
+        except serializers.ValidationError as e:
+            result.add_error(index, e.detail)
+            continue
+        checked.append((index, habit, attrs))
+
+    errors = HabitsValidator.validate_many([attrs for _, _, attrs in checked], [habit for _, habit, _ in checked])
+    valid = []
+    for (index, habit, attrs), item_errors in zip(checked, errors):
+        if item_errors:
+            result.add_error(index, {"non_field_errors": item_errors})
+            continue
+        for name, value in attrs.items():
+            setattr(habit, name, value)
+        valid.append((index, habit, attrs))
+    return valid
+
+
+def _exclude_duplicates(valid, result):
+    """
+    Отбрасывает привычки, нарушающие уникальность (пользователь, действие, место) внутри пачки
+    или относительно базы. Проверка в базе - один запрос на всю пачку
+    """
+    if not valid:
+        return valid
+    habits = [habit for _, habit, _ in valid]
+    existing = set(
+        Habit.objects.filter(
+            user_id__in={habit.user_id for habit in habits},
+            action__in={habit.action for habit in habits},
+            place__in={habit.place for habit in habits},
+        )
+        .exclude(id__in=[habit.id for habit in habits if habit.id is not None])
+        .values_list("user_id", "action", "place")
+    )
+    unique = []
+    for index, habit, attrs in valid:
+        key = (habit.user_id, habit.action, habit.place)
+        if key in existing:
+            result.add_error(index, {"non_field_errors": [UNIQUE_ERROR]})
+            continue
+        existing.add(key)
+        unique.append((index, habit, attrs))
+    return unique
+
+
+def _write(write):
+    """Выполняет запись в одной транзакции; конфликт уникальности с параллельным запросом - ошибка всей пачки"""
+    try:
+        with transaction.atomic():
+            write()
+    except IntegrityError:
+        raise serializers.ValidationError({"non_field_errors": [UNIQUE_ERROR]})
+
+
+def bulk_create_habits(user, items):
+    """Создает привычки пользователя пачкой: валидация за один проход и одна вставка bulk_create"""
+    result = BulkResult()
+    habits = {index: Habit(user=user) for index in range(len(items))}
+    valid = _exclude_duplicates(validate_items(items, habits, result), result)
+
+    created = [habit for _, habit, _ in valid]
+    for habit in created:
+        habit.reminder_minute = Habit.get_reminder_minute(habit.habit_time, user.timezone)
+    if created:
+        _write(lambda: Habit.objects.bulk_create(created))
+        if any(habit.is_public for habit in created):
+            bump_public_feed_version()
+    return result.finish(created)
+
+
+def bulk_update_habits(user, items):
+    """
+    Частично обновляет привычки пачкой: элементы содержат id и изменяемые поля.
+    Привычки загружаются одним запросом (чужие, кроме как суперпользователю, недоступны), записываются bulk_update
+    """
+    result = BulkResult()
+    queryset = Habit.objects.select_related("user", "related_habit")
+    if not user.is_superuser:
+        queryset = queryset.filter(user=user)
+    ids = [_to_id(_get_item_value(item, "id")) for item in items]
+    instances = queryset.in_bulk(set(ids) - {None})
+    was_public = {habit.id: habit.is_public for habit in instances.values()}
+
+    habits = {}
+    for index, habit_id in enumerate(ids):
+        habit = instances.pop(habit_id, None)
+        if habit is None:
+            result.add_error(index, {"id": [DUPLICATE_ID_ERROR if habit_id in was_public else NOT_FOUND_ERROR]})
+            continue
+        habits[index] = habit
+    valid = _exclude_duplicates(validate_items(items, habits, result, partial=True), result)
+
+    updated = [habit for _, habit, _ in valid]
+    fields = {name for _, _, attrs in valid for name in attrs} | {"reminder_minute", "updated_at"}
+    now = timezone.now()
+    for habit in updated:
+        habit.reminder_minute = Habit.get_reminder_minute(habit.habit_time, habit.user.timezone)
+        habit.updated_at = now
+    if updated:
+        _write(lambda: Habit.objects.bulk_update(updated, sorted(fields)))
+        if any(habit.is_public or was_public[habit.id] for habit in updated):
+            bump_public_feed_version()
+    return result.finish(updated)
+
+
+def bulk_delete_habits(user, ids):
+    """Удаляет привычки пачкой одним запросом; сигналы удаления сбрасывают кэш ленты для публичных привычек"""
+    result = BulkResult()
+    queryset = Habit.objects.all() if user.is_superuser else Habit.objects.filter(user=user)
+    habit_ids = [_to_id(value) for value in ids]
+    existing = set(queryset.filter(id__in=set(habit_ids) - {None}).values_list("id", flat=True))
+
+    deleted = []
+    for index, habit_id in enumerate(habit_ids):
+        if habit_id not in existing:
+            result.add_error(index, {"id": [DUPLICATE_ID_ERROR if habit_id in deleted else NOT_FOUND_ERROR]})
+            continue
+        existing.discard(habit_id)
+        deleted.append(habit_id)
+    if deleted:
+        _write(lambda: Habit.objects.filter(id__in=deleted).delete())
+    return result.finish(deleted)
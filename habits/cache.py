@@ -0,0 +1,66 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+PUBLIC_FEED_PREFIX = "habits:public_feed"
+PUBLIC_FEED_VERSION_KEY = f"{PUBLIC_FEED_PREFIX}:version"
+PUBLIC_FEED_HITS_KEY = f"{PUBLIC_FEED_PREFIX}:hits"
+PUBLIC_FEED_MISSES_KEY = f"{PUBLIC_FEED_PREFIX}:misses"
+
+
+def _incr(key):
+    """Увеличивает счетчик в кэше, создавая его при отсутствии"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout=None):
+            return 1
+        return cache.incr(key)
+
+
+def get_public_feed_version():
+    """Возвращает текущую версию ленты публичных привычек"""
+    version = cache.get(PUBLIC_FEED_VERSION_KEY)
+    if version is None:
+        cache.add(PUBLIC_FEED_VERSION_KEY, 1, timeout=None)
+        version = cache.get(PUBLIC_FEED_VERSION_KEY, 1)
+    return version
+
+
+def bump_public_feed_version():
+    """Сбрасывает все закэшированные страницы ленты, увеличивая ее версию (старые записи истекут сами)"""
+    if settings.CACHE_ENABLED:
+        _incr(PUBLIC_FEED_VERSION_KEY)
+
+
+def public_feed_cache_key(request):
+    """Возвращает ключ кэша страницы ленты: версия ленты + хэш полного URL с параметрами запроса"""
+    url_hash = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+    return f"{PUBLIC_FEED_PREFIX}:v{get_public_feed_version()}:{url_hash}"
+
+
+def get_public_feed_page(key):
+    """Возвращает закэшированную страницу ленты (или None) и учитывает попадание или промах"""
+    data = cache.get(key)
+    _incr(PUBLIC_FEED_HITS_KEY if data is not None else PUBLIC_FEED_MISSES_KEY)
+    return data
+
+
+def set_public_feed_page(key, data):
+    """Кэширует сериализованную страницу ленты"""
+    cache.set(key, data, timeout=settings.PUBLIC_FEED_CACHE_TIMEOUT)
+
+
+def get_public_feed_cache_stats():
+    """Возвращает счетчики попаданий и промахов кэша ленты публичных привычек"""
+    values = cache.get_many([PUBLIC_FEED_HITS_KEY, PUBLIC_FEED_MISSES_KEY, PUBLIC_FEED_VERSION_KEY])
+    hits = values.get(PUBLIC_FEED_HITS_KEY, 0)
+    misses = values.get(PUBLIC_FEED_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else 0.0,
+        "version": values.get(PUBLIC_FEED_VERSION_KEY, 1),
+    }
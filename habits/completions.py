@@ -0,0 +1,91 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from habits.models import Habit, HabitCompletion
+from habits.reminders import get_zoneinfo
+
+STREAK_FIELDS = ("current_streak", "longest_streak", "last_completed_date")
+
+
+def get_local_date(user, now=None):
+    """Текущая дата в часовом поясе пользователя"""
+    return (now or timezone.now()).astimezone(get_zoneinfo(user.timezone)).date()
+
+
+def continues_streak(habit, previous, day):
+    """Продолжает ли выполнение в день day серию, последнее выполнение которой было в день previous"""
+    return previous is not None and (day - previous).days <= habit.periodicity
+
+
+def get_current_streak(habit, today):
+    """
+    Текущая серия на дату today: сохраненная серия, если следующее выполнение еще не просрочено, иначе 0.
+    Не читает журнал выполнений
+    """
+    if habit.last_completed_date is None or not continues_streak(habit, habit.last_completed_date, today):
+        return 0
+    return habit.current_streak
+
+
+def extend_streak(habit, day):
+    """Учитывает выполнение в день day, более поздний, чем последнее выполнение (O(1))"""
+    if continues_streak(habit, habit.last_completed_date, day):
+        habit.current_streak += 1
+    else:
+        habit.current_streak = 1
+    habit.longest_streak = max(habit.longest_streak, habit.current_streak)
+    habit.last_completed_date = day
+
+
+def rebuild_streaks(habit):
+    """Пересчитывает серии по всему журналу выполнений привычки (когда выполнение записано задним числом)"""
+    habit.current_streak, habit.longest_streak, habit.last_completed_date = 0, 0, None
+    for day in HabitCompletion.objects.filter(habit=habit).order_by("date").values_list("date", flat=True):
+        extend_streak(habit, day)
+
+
+def record_completions(completions):
+    """
+    Записывает выполнения привычек пачкой [(id привычки, локальная дата), ...] и обновляет серии.
+    Привычки блокируются (select_for_update), поэтому параллельные записи не теряют выполнения в сериях.
+    Повторное выполнение за ту же дату не записывается. Серии продлеваются без чтения журнала;
+    журнал перечитывается, только если выполнение записано задним числом (раньше последнего выполнения).
+    Возвращает {id привычки: привычка} и множество записанных (id привычки, дата)
+    """
+    dates_by_habit = defaultdict(set)
+    for habit_id, day in completions:
+        dates_by_habit[habit_id].add(day)
+    if not dates_by_habit:
+        return {}, set()
+
+    with transaction.atomic():
+        habits = Habit.objects.select_for_update().order_by("id").in_bulk(dates_by_habit)
+        all_dates = set().union(*dates_by_habit.values())
+        existing = set(
+            HabitCompletion.objects.filter(habit_id__in=habits, date__in=all_dates).values_list("habit_id", "date")
+        )
+        created = {
+            (habit_id, day)
+            for habit_id in habits
+            for day in dates_by_habit[habit_id]
+            if (habit_id, day) not in existing
+        }
+        if not created:
+            return habits, created
+        HabitCompletion.objects.bulk_create(HabitCompletion(habit_id=habit_id, date=day) for habit_id, day in created)
+
+        changed = []
+        for habit_id, habit in habits.items():
+            days = sorted(day for day in dates_by_habit[habit_id] if (habit_id, day) in created)
+            if not days:
+                continue
+            if habit.last_completed_date is not None and days[0] <= habit.last_completed_date:
+                rebuild_streaks(habit)
+            else:
+                for day in days:
+                    extend_streak(habit, day)
+            changed.append(habit)
+        Habit.objects.bulk_update(changed, STREAK_FIELDS)
+    return habits, created
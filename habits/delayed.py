@@ -0,0 +1,120 @@
+import heapq
+import json
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+import redis
+
+from habits.bot import reminder_keyboard
+from habits.reminders import get_message_builder, get_zoneinfo
+
+# Забирает и удаляет наступившие элементы одной атомарной операцией: несколько диспетчеров не отправят одно
+# сообщение дважды. ZRANGEBYSCORE по индексу sorted set - O(log N + M), где M - количество наступивших элементов
+POP_DUE_SCRIPT = """
+local items = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, ARGV[2])
+if #items > 0 then
+    redis.call("ZREM", KEYS[1], unpack(items))
+end
+return items
+"""
+
+
+class RedisDelayedQueue:
+    """
+    Отложенные сообщения - sorted set в Redis со временем отправки (epoch, в секундах) в качестве score.
+    Диспетчер забирает только наступившие элементы, поэтому стоимость тика не зависит от числа отложенных сообщений
+    """
+
+    def __init__(self, url=None, key=None):
+        self.client = redis.Redis.from_url(url or settings.DELAYED_QUEUE_REDIS_URL, decode_responses=True)
+        self.key = key or settings.DELAYED_QUEUE_KEY
+        self.pop_script = self.client.register_script(POP_DUE_SCRIPT)
+
+    def add(self, items):
+        """Добавляет элементы [(время отправки, элемент), ...]"""
+        if items:
+            self.client.zadd(self.key, {member: due_at for due_at, member in items})
+
+    def pop_due(self, now, limit):
+        return self.pop_script(keys=[self.key], args=[now, limit])
+
+    def next_due(self):
+        """Время отправки ближайшего элемента или None"""
+        items = self.client.zrange(self.key, 0, 0, withscores=True)
+        return items[0][1] if items else None
+
+
+class MemoryDelayedQueue:
+    """Отложенные сообщения в памяти процесса - куча по времени отправки (для тестов и разработки без Redis)"""
+
+    def __init__(self):
+        self.items = []
+        self.lock = threading.Lock()
+
+    def add(self, items):
+        with self.lock:
+            for item in items:
+                heapq.heappush(self.items, item)
+
+    def pop_due(self, now, limit):
+        with self.lock:
+            due = []
+            while self.items and self.items[0][0] <= now and len(due) < limit:
+                due.append(heapq.heappop(self.items)[1])
+            return due
+
+    def next_due(self):
+        return self.items[0][0] if self.items else None
+
+
+DELAYED_QUEUES = {
+    "redis": RedisDelayedQueue,
+    "memory": MemoryDelayedQueue,
+}
+
+_queues = {}
+
+
+def get_delayed_queue():
+    """Возвращает общую для процесса очередь отложенных сообщений. Тип очереди задается настройкой DELAYED_QUEUE"""
+    mode = settings.DELAYED_QUEUE
+    if mode not in _queues:
+        _queues[mode] = DELAYED_QUEUES[mode]()
+    return _queues[mode]
+
+
+def schedule_messages(messages, delay=0, at=None, attempt=0):
+    """
+    Откладывает отправку сообщений [(chat_id, сообщение[, reply_markup]), ...] на delay секунд
+    (или до момента at, datetime). attempt - номер повторной попытки отправки
+    """
+    due_at = at.timestamp() if at is not None else time.time() + delay
+    get_delayed_queue().add(
+        [
+            (due_at, json.dumps({"id": uuid.uuid4().hex, "message": list(message), "attempt": attempt}))
+            for message in messages
+        ]
+    )
+
+
+def pop_due_messages(now=None, limit=None):
+    """
+    Забирает из очереди наступившие сообщения (не больше limit) и группирует их по номеру попытки:
+    {attempt: [(chat_id, сообщение[, reply_markup]), ...]}
+    """
+    items = get_delayed_queue().pop_due(now if now is not None else time.time(), limit or settings.TELEGRAM_BATCH_SIZE)
+    batches = {}
+    for item in items:
+        payload = json.loads(item)
+        batches.setdefault(payload["attempt"], []).append(tuple(payload["message"]))
+    return batches
+
+
+def schedule_reminder(habit, at):
+    """Откладывает разовое напоминание о привычке (с кнопками) на момент at; связанная привычка загружена заранее"""
+    day = at.astimezone(get_zoneinfo(habit.user.timezone)).date()
+    message = (habit.user.tg_chat_id, get_message_builder().build(habit), reminder_keyboard(habit, day))
+    schedule_messages([message], at=at)
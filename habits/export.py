@@ -0,0 +1,87 @@
+import csv
+import datetime
+from itertools import chain
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from rest_framework.exceptions import ValidationError
+
+from habits.models import Habit
+from habits.serializers import HabitsSerializer
+
+EXPORT_FIELDS = tuple(
+    field.name for field in Habit._meta.concrete_fields if field.name not in HabitsSerializer.Meta.exclude
+)
+EXPORT_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+}
+
+_encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+
+class _Echo:
+    """Файлоподобный объект для csv.writer: возвращает записанную строку, ничего не накапливая"""
+
+    def write(self, value):
+        return value
+
+
+def _rows(queryset, chunk_size):
+    """
+    Строки привычек кортежами значений в порядке id. iterator() читает выборку частями по chunk_size
+    (в PostgreSQL - через серверный курсор), поэтому память не зависит от количества строк
+    """
+    return queryset.order_by("id").values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def _chunked(lines, size):
+    """Склеивает строки в блоки по size строк, чтобы не отдавать ответ множеством мелких записей"""
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) >= size:
+            yield "".join(block)
+            block = []
+    if block:
+        yield "".join(block)
+
+
+def _csv_value(value):
+    """Время и дата-время в CSV - в том же ISO-формате, что и в JSON"""
+    if isinstance(value, (datetime.time, datetime.datetime)):
+        return _encoder.default(value)
+    return value
+
+
+def iter_ndjson(queryset, chunk_size):
+    """Привычки в формате NDJSON: по одному JSON-объекту на строку"""
+    lines = (_encoder.encode(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in _rows(queryset, chunk_size))
+    return _chunked(lines, chunk_size)
+
+
+def iter_csv(queryset, chunk_size):
+    """Привычки в формате CSV с заголовком"""
+    writer = csv.writer(_Echo())
+    rows = (writer.writerow([_csv_value(value) for value in row]) for row in _rows(queryset, chunk_size))
+    return _chunked(chain([writer.writerow(EXPORT_FIELDS)], rows), chunk_size)
+
+
+EXPORTERS = {
+    "ndjson": iter_ndjson,
+    "csv": iter_csv,
+}
+
+
+def export_response(queryset, export_format, filename):
+    """Потоковый ответ с выгрузкой привычек в формате export_format (ndjson или csv)"""
+    exporter = EXPORTERS.get(export_format)
+    if exporter is None:
+        raise ValidationError({"export_format": [f"Допустимые форматы: {', '.join(EXPORTERS)}"]})
+    response = StreamingHttpResponse(
+        exporter(queryset, settings.HABITS_EXPORT_CHUNK_SIZE), content_type=EXPORT_CONTENT_TYPES[export_format]
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{export_format}"'
+    return response
@@ -0,0 +1,323 @@
+import csv
+import io
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from habits.bulk import BulkResult, validate_items
+from habits.cache import bump_public_feed_version
+from habits.models import Habit
+
+logger = logging.getLogger(__name__)
+
+# Кроме полей привычки строка может содержать id привычки в файле (на него ссылается related_habit других строк)
+# и ссылку на приятную привычку пользователя по действию related_action и, при необходимости, месту related_place
+IMPORT_FIELDS = (
+    "action",
+    "place",
+    "habit_time",
+    "periodicity",
+    "duration",
+    "is_pleasant",
+    "related_habit",
+    "reward",
+    "is_public",
+)
+UNIQUE_FIELDS = ("user", "action", "place")
+ON_CONFLICT_CHOICES = ("update", "skip")
+
+INVALID_ROW_ERROR = "Строка не является JSON-объектом"
+RELATED_NOT_FOUND_ERROR = "Связанная привычка не найдена среди уже импортированных строк"
+RELATED_ACTION_NOT_FOUND_ERROR = "У пользователя нет приятной привычки с таким действием"
+WRITE_ERROR = "Не удалось записать часть файла"
+REFERENCED_PLEASANT_ERROR = "Привычка связана с другими привычками и должна оставаться приятной"
+
+
+def _read_csv(text):
+    for number, row in enumerate(csv.DictReader(text), start=1):
+        yield number, {name: value for name, value in row.items() if name and value not in ("", None)}
+
+
+def _read_ndjson(text):
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            item = None
+        yield number, item if isinstance(item, dict) else None
+
+
+READERS = {
+    "ndjson": _read_ndjson,
+    "csv": _read_csv,
+}
+
+
+def read_rows(file, import_format):
+    """
+    Читает файл (бинарный поток) построчно, не загружая его целиком.
+    Возвращает итератор (номер строки, словарь полей); словарь - None, если строку не удалось разобрать.
+    Пустые значения CSV считаются незаполненными полями
+    """
+    reader = READERS.get(import_format)
+    if reader is None:
+        raise ValueError(f"Допустимые форматы: {', '.join(READERS)}")
+    return reader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+
+
+def count_lines(file, block_size=1024 * 1024):
+    """Количество строк в файле (бинарный поток) без разбора; позиция в файле возвращается в начало"""
+    lines = last = 0
+    while block := file.read(block_size):
+        lines += block.count(b"\n")
+        last = block[-1:]
+    file.seek(0)
+    return lines + (1 if last and last != b"\n" else 0)
+
+
+@dataclass
+class ImportReport:
+    """Итоги импорта: обработанные строки, записанные привычки и ошибки по номерам строк"""
+
+    rows: int = 0
+    imported: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def add_error(self, row, detail):
+        self.failed += 1
+        if len(self.errors) < settings.HABITS_IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row, "errors": detail})
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "elapsed": round(self.elapsed, 3),
+        }
+
+
+class HabitImporter:
+    """
+    Импортирует привычки пользователя частями по chunk_size строк: каждая часть проверяется за один проход
+    (validate_items, правила - HabitsValidator.validate_many) и записывается одним bulk_create в своей транзакции.
+    Привычка с теми же (пользователь, действие, место) обновляется (on_conflict="update") или пропускается ("skip").
+    В памяти держится одна часть файла и соответствие id из файла созданным привычкам
+    """
+
+    def __init__(self, user, chunk_size=None, on_conflict="update", progress=None):
+        if on_conflict not in ON_CONFLICT_CHOICES:
+            raise ValueError(f"on_conflict: допустимые значения {', '.join(ON_CONFLICT_CHOICES)}")
+        self.user = user
+        self.chunk_size = chunk_size or settings.HABITS_IMPORT_CHUNK_SIZE
+        self.on_conflict = on_conflict
+        self.progress = progress
+        self.report = ImportReport()
+        # id привычки в файле -> id записанной привычки
+        self.source_ids = {}
+        # (действие, место) и действие приятной привычки пользователя -> id
+        self.pleasant_by_key = {}
+        self.pleasant_by_action = {}
+
+    def run(self, rows):
+        """
+        Импортирует строки из read_rows. Возвращает ImportReport.
+        Если строка ссылается на привычку из текущей, еще не записанной части, часть записывается раньше
+        """
+        started = time.monotonic()
+        chunk, pending_ids, pending_actions = [], set(), set()
+        for number, row in rows:
+            if row is not None and self._depends_on(row, pending_ids, pending_actions):
+                self._import_chunk(chunk)
+                chunk, pending_ids, pending_actions = [], set(), set()
+            chunk.append((number, row))
+            if row is not None:
+                pending_actions.add(row.get("action"))
+                if row.get("id") is not None:
+                    pending_ids.add(str(row["id"]))
+            if len(chunk) >= self.chunk_size:
+                self._import_chunk(chunk)
+                chunk, pending_ids, pending_actions = [], set(), set()
+        if chunk:
+            self._import_chunk(chunk)
+        if self.report.imported:
+            bump_public_feed_version()
+        self.report.elapsed = time.monotonic() - started
+        logger.info(
+            "Habits import: user=%s rows=%s imported=%s failed=%s elapsed=%.1fs",
+            self.user.id,
+            self.report.rows,
+            self.report.imported,
+            self.report.failed,
+            self.report.elapsed,
+        )
+        return self.report
+
+    @staticmethod
+    def _depends_on(row, pending_ids, pending_actions):
+        """Ссылается ли строка на привычку из еще не записанной части"""
+        if row.get("related_action"):
+            return row["related_action"] in pending_actions
+        return row.get("related_habit") is not None and str(row["related_habit"]) in pending_ids
+
+    def _import_chunk(self, chunk):
+        self.report.rows += len(chunk)
+        errors = []
+        items, numbers, source_ids = self._resolve(chunk, errors)
+        result = BulkResult()
+        valid = validate_items(items, {index: Habit(user=self.user) for index in range(len(items))}, result)
+        errors += [(numbers[error["index"]], error["errors"]) for error in result.errors]
+        valid = self._exclude_referenced_demotions(valid, numbers, errors)
+
+        # Повтор (действие, место) внутри части: как и между частями, побеждает последняя строка
+        by_key = {(habit.action, habit.place): habit for _, habit, _ in valid}
+        written = list(by_key.values())
+        if written:
+            try:
+                self._write(written)
+            except IntegrityError:
+                errors += [(numbers[index], {"non_field_errors": [WRITE_ERROR]}) for index, _, _ in valid]
+                valid, written = [], []
+        self._remember(written)
+        for index, habit, _ in valid:
+            if index in source_ids:
+                self.source_ids[source_ids[index]] = by_key[(habit.action, habit.place)].pk
+        for number, detail in sorted(errors, key=lambda error: error[0]):
+            self.report.add_error(number, detail)
+        self.report.imported += len(written)
+        if self.progress is not None:
+            self.progress(self.report)
+
+    def _exclude_referenced_demotions(self, valid, numbers, errors):
+        """
+        При on_conflict="update" строка перезаписывает существующую привычку без проверки правил для ссылающихся
+        на нее привычек. Отбрасывает строки, которые делают неприятной приятную привычку, на которую ссылаются
+        привычки в базе или в этой части файла (связанная привычка должна быть приятной)
+        """
+        if self.on_conflict != "update":
+            return valid
+        keys = {(habit.action, habit.place) for _, habit, _ in valid if not habit.is_pleasant}
+        if not keys:
+            return valid
+        existing = Habit.objects.filter(user=self.user, is_pleasant=True, action__in={action for action, _ in keys})
+        demoted = {
+            habit_id: (action, place)
+            for action, place, habit_id in existing.values_list("action", "place", "id")
+            if (action, place) in keys
+        }
+        if not demoted:
+            return valid
+        referenced = set(Habit.objects.filter(related_habit__in=demoted).values_list("related_habit_id", flat=True))
+        referenced |= {habit.related_habit_id for _, habit, _ in valid}
+        blocked = {demoted[habit_id] for habit_id in referenced & demoted.keys()}
+        kept = []
+        for index, habit, attrs in valid:
+            if not habit.is_pleasant and (habit.action, habit.place) in blocked:
+                errors.append((numbers[index], {"is_pleasant": [REFERENCED_PLEASANT_ERROR]}))
+            else:
+                kept.append((index, habit, attrs))
+        return kept
+
+    def _resolve(self, chunk, errors):
+        """
+        Разбирает строки части: отбрасывает неразобранные, заменяет ссылки на связанную привычку id из базы.
+        Ошибки строк добавляются в errors. Возвращает элементы для валидации, номера их строк
+        и {индекс элемента: id привычки в файле}
+        """
+        self._load_pleasant(
+            {row["related_action"] for _, row in chunk if row is not None and row.get("related_action")}
+        )
+        items, numbers, source_ids = [], [], {}
+        for number, row in chunk:
+            if row is None:
+                errors.append((number, {"non_field_errors": [INVALID_ROW_ERROR]}))
+                continue
+            item = {name: row[name] for name in IMPORT_FIELDS if name in row}
+            error = self._resolve_related(row, item)
+            if error is not None:
+                errors.append((number, error))
+                continue
+            if row.get("id") is not None:
+                source_ids[len(items)] = str(row["id"])
+            items.append(item)
+            numbers.append(number)
+        return items, numbers, source_ids
+
+    def _resolve_related(self, row, item):
+        """Подставляет в item id связанной привычки. Возвращает ошибку строки или None"""
+        related_action = row.get("related_action")
+        if related_action:
+            related_place = row.get("related_place")
+            if related_place:
+                related_id = self.pleasant_by_key.get((related_action, related_place))
+            else:
+                related_id = self.pleasant_by_action.get(related_action)
+            if related_id is None:
+                return {"related_action": [RELATED_ACTION_NOT_FOUND_ERROR]}
+            item["related_habit"] = related_id
+        elif item.get("related_habit") is not None:
+            related_id = self.source_ids.get(str(item["related_habit"]))
+            if related_id is None:
+                return {"related_habit": [RELATED_NOT_FOUND_ERROR]}
+            item["related_habit"] = related_id
+        return None
+
+    def _load_pleasant(self, actions):
+        """Загружает одним запросом приятные привычки пользователя с действиями, которых еще нет в памяти"""
+        missing = actions - self.pleasant_by_action.keys()
+        if not missing:
+            return
+        pleasant = Habit.objects.filter(user=self.user, is_pleasant=True, action__in=missing)
+        for action, place, habit_id in pleasant.values_list("action", "place", "id"):
+            self.pleasant_by_key[(action, place)] = habit_id
+            self.pleasant_by_action.setdefault(action, habit_id)
+
+    def _write(self, habits):
+        """Записывает часть одним bulk_create в отдельной транзакции"""
+        for habit in habits:
+            habit.reminder_minute = Habit.get_reminder_minute(habit.habit_time, self.user.timezone)
+        with transaction.atomic():
+            if self.on_conflict == "skip":
+                Habit.objects.bulk_create(habits, ignore_conflicts=True)
+            else:
+                Habit.objects.bulk_create(
+                    habits,
+                    update_conflicts=True,
+                    unique_fields=UNIQUE_FIELDS,
+                    update_fields=[name for name in IMPORT_FIELDS if name not in ("action", "place")]
+                    + ["reminder_minute", "updated_at"],
+                )
+
+    def _remember(self, written):
+        """Запоминает id записанных привычек и приятные привычки для ссылок из следующих строк файла"""
+        if any(habit.pk is None for habit in written):
+            # Пропущенные при конфликте привычки (ignore_conflicts) возвращаются без id
+            existing = Habit.objects.filter(
+                user=self.user,
+                action__in={habit.action for habit in written},
+                place__in={habit.place for habit in written},
+            )
+            ids = {
+                (action, place): habit_id for action, place, habit_id in existing.values_list("action", "place", "id")
+            }
+            for habit in written:
+                habit.pk = ids.get((habit.action, habit.place))
+        for habit in written:
+            if habit.is_pleasant:
+                self.pleasant_by_key[(habit.action, habit.place)] = habit.pk
+                self.pleasant_by_action.setdefault(habit.action, habit.pk)
+
+
+def import_habits(user, file, import_format, chunk_size=None, on_conflict="update", progress=None):
+    """Импортирует привычки пользователя из файла NDJSON или CSV. Возвращает ImportReport"""
+    importer = HabitImporter(user, chunk_size=chunk_size, on_conflict=on_conflict, progress=progress)
+    return importer.run(read_rows(file, import_format))
@@ -0,0 +1,235 @@
+import itertools
+import json
+import math
+import platform
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from habits.models import Habit
+from habits.tasks import send_habit_reminder
+from users.models import CustomUser
+
+
+def percentile(values, q):
+    """Возвращает перцентиль q (0-100) отсортированного списка методом ближайшего ранга"""
+    index = max(0, min(len(values) - 1, math.ceil(q / 100 * len(values)) - 1))
+    return values[index]
+
+
+def find_regressions(baseline, results, threshold, min_delta_ms=1.0, min_delta_kib=64):
+    """
+    Сравнивает результаты с базовой линией и возвращает список описаний регрессий.
+    Медианная задержка и пиковая память считаются регрессией, если выросли больше чем на threshold
+    и больше минимальной абсолютной разницы, количество запросов - при любом росте.
+    Хвосты (p95/p99) только сохраняются: на десятках замеров они слишком шумные для автоматической проверки
+    """
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if current["p50_ms"] > base["p50_ms"] * (1 + threshold) and current["p50_ms"] - base["p50_ms"] > min_delta_ms:
+            regressions.append(f"{key}: p50 {base['p50_ms']:.2f} -> {current['p50_ms']:.2f} ms")
+        if current["queries"] > base["queries"]:
+            regressions.append(f"{key}: запросов {base['queries']} -> {current['queries']}")
+        if (
+            current["peak_kib"] > base["peak_kib"] * (1 + threshold)
+            and current["peak_kib"] - base["peak_kib"] > min_delta_kib
+        ):
+            regressions.append(f"{key}: память {base['peak_kib']:.0f} -> {current['peak_kib']:.0f} KiB")
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        "Измеряет задержку (p50/p95/p99), количество запросов и пиковую память горячих путей API и рассылки "
+        "напоминаний на синтетических данных нескольких размеров. Данные создаются generate_load_data "
+        "в транзакции, которая откатывается после замеров. Результаты сохраняются в JSON (--save) "
+        "и сравниваются с базовой линией (--compare): при регрессии команда завершается с ошибкой"
+    )
+
+    scenarios = (
+        "habits_list",
+        "habits_list_cursor",
+        "habits_create",
+        "habits_bulk_create",
+        "habits_update",
+        "habits_public",
+        "users_list",
+        "users_retrieve",
+        "register",
+        "send_habit_reminder",
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000], help="Количество привычек")
+        parser.add_argument("--runs", type=int, default=30, help="Количество замеров на сценарий")
+        parser.add_argument("--warmup", type=int, default=3, help="Количество прогревочных прогонов")
+        parser.add_argument("--scenarios", nargs="+", choices=self.scenarios, help="Запускаемые сценарии")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--save", metavar="PATH", help="Сохранить результаты в JSON")
+        parser.add_argument("--compare", metavar="PATH", help="Сравнить результаты с базовой линией из JSON")
+        parser.add_argument(
+            "--threshold", type=float, default=0.2, help="Допустимый относительный рост метрик (0.2 = 20%%)"
+        )
+
+    def handle(self, *args, **options):
+        self.counter = itertools.count()
+        scenarios = options["scenarios"] or self.scenarios
+        results = {}
+
+        self.stdout.write(
+            f"{'scenario':<32} {'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9} {'queries':>8} {'peak, KiB':>10}"
+        )
+        # Кэш ленты отключен, чтобы измерять путь до базы, а не попадания в кэш
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"], CACHE_ENABLED=False):
+            for size in options["sizes"]:
+                with transaction.atomic():
+                    self.prepare(size, options["seed"])
+                    for name in scenarios:
+                        key = f"{name}@{size}"
+                        results[key] = self.measure(getattr(self, f"bench_{name}"), options["runs"], options["warmup"])
+                        self.write_row(key, results[key])
+                    transaction.set_rollback(True)
+
+        report = {
+            "meta": {
+                "created": datetime.now(dt_timezone.utc).isoformat(timespec="seconds"),
+                "vendor": connection.vendor,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "runs": options["runs"],
+            },
+            "results": results,
+        }
+        if options["save"]:
+            with open(options["save"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Результаты сохранены в {options['save']}")
+
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as file:
+                baseline = json.load(file)["results"]
+            regressions = find_regressions(baseline, results, options["threshold"])
+            if regressions:
+                raise CommandError("Регрессия производительности:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("Регрессий относительно базовой линии нет"))
+
+    def prepare(self, size, seed):
+        """Создает данные заданного размера и клиентов API для сценариев"""
+        call_command("generate_load_data", users=max(1, size // 50), habits=size, seed=seed, stdout=StringIO())
+        owner = Habit.objects.values_list("user_id", flat=True).order_by("user_id").first()
+        self.user = CustomUser.objects.get(pk=owner)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.anonymous = APIClient()
+        self.reminder_now = datetime(2025, 6, 1, 4, 0, tzinfo=dt_timezone.utc)
+
+    def measure(self, run, runs, warmup):
+        """
+        Выполняет сценарий warmup + runs раз и возвращает перцентили задержки и количество запросов,
+        затем один раз под tracemalloc - пиковую память (трассировка замедляет выполнение и не смешивается с замерами)
+        """
+        for _ in range(warmup):
+            run()
+
+        timings = []
+        queries = 0
+        for _ in range(runs):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = max(queries, len(context.captured_queries))
+        timings.sort()
+
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+            "queries": queries,
+            "peak_kib": round(peak / 1024, 1),
+        }
+
+    def write_row(self, key, result):
+        """Печатает строку таблицы результатов"""
+        self.stdout.write(
+            f"{key:<32} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+            f"{result['queries']:>8} {result['peak_kib']:>10.1f}"
+        )
+
+    def check(self, response, status_code=200):
+        """Проверяет код ответа, чтобы не замерять ошибки вместо рабочего пути"""
+        if response.status_code != status_code:
+            raise CommandError(f"{response.request['PATH_INFO']}: {response.status_code} {response.content[:200]}")
+
+    def bench_habits_list(self):
+        self.check(self.client.get(reverse("habits:habits-list")))
+
+    def bench_habits_list_cursor(self):
+        self.check(self.client.get(reverse("habits:habits-list"), {"pagination": "cursor"}))
+
+    def bench_habits_create(self):
+        data = {
+            "action": f"bench action {next(self.counter)}",
+            "place": "дома",
+            "habit_time": "08:00",
+            "reward": "чай",
+        }
+        self.check(self.client.post(reverse("habits:habits-list"), data), 201)
+
+    def bench_habits_bulk_create(self):
+        data = [
+            {"action": f"bench action {next(self.counter)}", "place": "дома", "habit_time": "08:00", "reward": "чай"}
+            for _ in range(50)
+        ]
+        self.check(self.client.post(reverse("habits:habits-bulk"), data, format="json"), 201)
+
+    def bench_habits_update(self):
+        habit = self.user.habits.filter(is_pleasant=False).order_by("id").first()
+        data = {"habit_time": f"{next(self.counter) % 24:02}:00", "reward": "чай", "related_habit": None}
+        self.check(self.client.patch(reverse("habits:habits-detail", args=[habit.pk]), data, format="json"))
+
+    def bench_habits_public(self):
+        self.check(self.client.get(reverse("habits:habits-public-habits")))
+
+    def bench_users_list(self):
+        self.check(self.client.get(reverse("users:users-list")))
+
+    def bench_users_retrieve(self):
+        self.check(self.client.get(reverse("users:users-detail", args=[self.user.pk])))
+
+    def bench_register(self):
+        number = next(self.counter)
+        data = {"username": f"bench_{number}", "email": f"bench_{number}@bench.test", "password": "bench-password"}
+        with mock.patch("users.serializers.send_activation_email.delay"):
+            self.check(self.anonymous.post(reverse("users:user_register"), data, format="json"), 201)
+
+    def bench_send_habit_reminder(self):
+        """Каждый прогон - новые сутки, чтобы журнал доставок не отбрасывал напоминания как уже отправленные"""
+        self.reminder_now += timedelta(days=1)
+        with (
+            mock.patch("habits.tasks.timezone.now", return_value=self.reminder_now),
+            mock.patch("habits.tasks.send_telegram_batch.delay"),
+        ):
+            send_habit_reminder()
@@ -0,0 +1,50 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+
+from habits.reminders import select_due_habits
+from habits.tests.reminder_helpers import HabitStub, UserStub, legacy_select_due_habits
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Измеряет процессорное время одного тика отбора напоминаний на синтетических привычках"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument("--repeat", type=int, default=3, help="Количество прогонов (берется лучший)")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        users = [UserStub(tz_name) for tz_name, _ in CustomUser.TIMEZONES]
+        now_utc = datetime(2025, 6, 1, 7, 0, tzinfo=dt_timezone.utc)
+
+        self.stdout.write(f"{'habits':>10} {'legacy, ms':>12} {'grouped, ms':>12} {'speedup':>8} {'due':>8}")
+        for size in options["sizes"]:
+            habits = [
+                HabitStub(
+                    rng.choice(users), now_utc - timedelta(seconds=rng.randrange(365 * 86400)), rng.randint(1, 7)
+                )
+                for _ in range(size)
+            ]
+            legacy, legacy_due = self._measure(legacy_select_due_habits, habits, now_utc, options["repeat"])
+            grouped, grouped_due = self._measure(select_due_habits, habits, now_utc, options["repeat"])
+            if legacy_due != grouped_due:
+                self.stdout.write(self.style.ERROR(f"Результаты отбора различаются: {legacy_due} != {grouped_due}"))
+            self.stdout.write(
+                f"{size:>10} {legacy * 1000:>12.1f} {grouped * 1000:>12.1f} {legacy / grouped:>7.1f}x {grouped_due:>8}"
+            )
+
+    @staticmethod
+    def _measure(select, habits, now_utc, repeat):
+        """Возвращает лучшее процессорное время прогона и количество отобранных привычек"""
+        best, due = None, None
+        for _ in range(repeat):
+            started = time.process_time()
+            due = len(select(habits, now_utc))
+            elapsed = time.process_time() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, due
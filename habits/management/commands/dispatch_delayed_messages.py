@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from habits.delayed import get_delayed_queue
+from habits.tasks import dispatch_delayed_messages
+
+
+class Command(BaseCommand):
+    help = (
+        "Диспетчер отложенных сообщений (отложенные и разовые напоминания, повторы после ошибок): "
+        "забирает из очереди только наступившие сообщения и ставит их отправку, "
+        "между тиками спит до ближайшего сообщения, но не дольше --interval секунд"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=settings.DELAYED_QUEUE_POLL_INTERVAL)
+        parser.add_argument("--once", action="store_true", help="Выполнить один тик и выйти")
+
+    def handle(self, *args, **options):
+        queue = get_delayed_queue()
+        interval = options["interval"]
+        while True:
+            dispatched = dispatch_delayed_messages()
+            if dispatched:
+                self.stdout.write(f"Отправлено отложенных сообщений: {dispatched}")
+            if options["once"]:
+                return
+            next_due = queue.next_due()
+            wait = interval if next_due is None else min(interval, max(next_due - time.time(), 0))
+            time.sleep(wait)
@@ -0,0 +1,124 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F, Q, Value
+from django.db.models.functions import Mod
+
+from habits.models import Habit, ReminderDelivery
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверяет планы выполнения (EXPLAIN) и задержку горячих запросов к привычкам: "
+        "для каждого запроса ожидается использование своего индекса. "
+        "Запускайте на заполненной базе (например, после generate_load_data на миллион привычек)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=20, help="Количество замеров задержки на запрос")
+        parser.add_argument("--analyze", action="store_true", help="EXPLAIN ANALYZE (только PostgreSQL)")
+        parser.add_argument("--strict", action="store_true", help="Завершиться с ошибкой, если индекс не используется")
+        parser.add_argument("--verbose-plans", action="store_true", help="Печатать планы целиком")
+
+    def get_hot_queries(self):
+        """Возвращает горячие запросы проекта: (название, queryset, индексы, любой из которых ожидается в плане)"""
+        sample = Habit.objects.filter(reminder_minute__isnull=False).order_by("id").first()
+        if sample is None:
+            raise CommandError("В базе нет привычек: сначала заполните ее (generate_load_data)")
+        user_id, minute = sample.user_id, sample.reminder_minute
+        public = Habit.objects.filter(is_public=True)
+        own_or_public = Habit.objects.filter(Q(user_id=user_id) | Q(is_public=True))
+
+        return [
+            (
+                "public_feed_page",
+                public.order_by("action", "habit_time", "place")[:5],
+                ("habit_public_feed_idx",),
+            ),
+            ("public_feed_count", public.order_by().values("id"), ("habit_public_feed_idx",)),
+            (
+                "public_feed_cursor",
+                public.filter(action__gt=sample.action).order_by("action", "habit_time", "place", "id")[:6],
+                ("habit_public_feed_idx",),
+            ),
+            (
+                "own_list_page",
+                own_or_public.order_by("periodicity", "habit_time")[:5],
+                ("habit_order_idx", "habit_user_visibility_idx", "habit_public_feed_idx"),
+            ),
+            (
+                "own_list_cursor",
+                own_or_public.filter(periodicity__gte=sample.periodicity).order_by(
+                    "periodicity", F("habit_time").asc(nulls_last=True), "id"
+                )[:6],
+                ("habit_order_idx", "habit_user_visibility_idx", "habit_public_feed_idx"),
+            ),
+            (
+                "profile_all_habits",
+                Habit.objects.filter(user_id__in=[user_id]),
+                ("habit_user_visibility_idx", "_uniq"),
+            ),
+            (
+                "profile_public_habits",
+                Habit.objects.filter(user_id__in=[user_id], is_public=True),
+                ("habit_user_visibility_idx",),
+            ),
+            (
+                "profile_pleasant_habits",
+                Habit.objects.filter(user_id=user_id, is_public=True, is_pleasant=True),
+                ("habit_user_visibility_idx",),
+            ),
+            (
+                "reminder_bucket",
+                Habit.objects.filter(reminder_minute=minute, user__tg_chat_id__isnull=False).select_related(
+                    "user", "related_habit"
+                ),
+                ("habit_reminder_idx",),
+            ),
+            (
+                "reminder_shard",
+                Habit.objects.filter(reminder_minute=minute)
+                .annotate(shard=Mod("user_id", Value(4)))
+                .filter(shard=user_id % 4),
+                ("habit_reminder_idx",),
+            ),
+            (
+                "unique_check",
+                Habit.objects.filter(user_id=user_id, action=sample.action, place=sample.place),
+                ("_uniq",),
+            ),
+            ("delivery_claim", ReminderDelivery.objects.filter(run_id="0" * 32), ("run_id",)),
+        ]
+
+    def handle(self, *args, **options):
+        analyze = options["analyze"] and connection.vendor == "postgresql"
+        self.stdout.write(f"База: {connection.vendor}, привычек: {Habit.objects.count()}")
+        self.stdout.write(f"{'query':<26} {'index':<6} {'p50, ms':>9} {'p95, ms':>9} {'max, ms':>9}")
+
+        missing = []
+        for name, queryset, expected in self.get_hot_queries():
+            plan = queryset.explain(analyze=True) if analyze else queryset.explain()
+            uses_index = any(index in plan for index in expected)
+            if not uses_index:
+                missing.append(name)
+
+            timings = []
+            for _ in range(options["runs"]):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+            status = self.style.SUCCESS("yes") if uses_index else self.style.WARNING("NO")
+            self.stdout.write(
+                f"{name:<26} {status:<6} {statistics.median(timings):>9.2f} {p95:>9.2f} {timings[-1]:>9.2f}"
+            )
+            if options["verbose_plans"] or not uses_index:
+                self.stdout.write(f"  ожидался индекс: {', '.join(expected)}")
+                self.stdout.write("  " + plan.replace("\n", "\n  "))
+
+        if missing and options["strict"]:
+            raise CommandError(f"Запросы без ожидаемого индекса: {', '.join(missing)}")
@@ -0,0 +1,61 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from habits.importer import ON_CONFLICT_CHOICES, READERS, import_habits
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Импортирует привычки пользователя из файла NDJSON или CSV (например, выгрузки /habits/habits/export/): "
+        "файл читается построчно, привычки проверяются и записываются частями (chunked bulk_create)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к файлу")
+        parser.add_argument("--user", required=True, help="Email пользователя-владельца привычек")
+        parser.add_argument("--format", choices=list(READERS), help="Формат файла (по умолчанию - по расширению)")
+        parser.add_argument("--chunk-size", type=int, default=settings.HABITS_IMPORT_CHUNK_SIZE)
+        parser.add_argument(
+            "--on-conflict",
+            choices=ON_CONFLICT_CHOICES,
+            default="update",
+            help="Что делать с привычкой, у которой уже есть такие действие и место",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(email=options["user"])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"Пользователь {options['user']} не найден")
+        import_format = options["format"] or os.path.splitext(options["path"])[1].lstrip(".").lower()
+        if import_format not in READERS:
+            raise CommandError(f"Укажите --format: {', '.join(READERS)}")
+
+        with open(options["path"], "rb") as file:
+            report = import_habits(
+                user,
+                file,
+                import_format,
+                chunk_size=options["chunk_size"],
+                on_conflict=options["on_conflict"],
+                progress=self.write_progress,
+            )
+
+        for error in report.errors:
+            detail = json.dumps(error["errors"], ensure_ascii=False)
+            self.stdout.write(self.style.ERROR(f"Строка {error['row']}: {detail}"))
+        rate = report.rows / report.elapsed if report.elapsed else 0
+        style = self.style.SUCCESS if not report.failed else self.style.WARNING
+        self.stdout.write(
+            style(
+                f"Строк: {report.rows}, импортировано: {report.imported}, ошибок: {report.failed} "
+                f"за {report.elapsed:.1f} с ({rate:.0f} строк/с)"
+            )
+        )
+
+    def write_progress(self, report):
+        self.stdout.write(f"Строк: {report.rows}, импортировано: {report.imported}, ошибок: {report.failed}")
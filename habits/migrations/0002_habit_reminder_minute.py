@@ -0,0 +1,41 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:32
+
+from zoneinfo import ZoneInfo
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_reminder_minute(apps, schema_editor):
+    Habit = apps.get_model("habits", "Habit")
+    now = timezone.now()
+    habits = Habit.objects.filter(habit_time__isnull=False).select_related("user")
+    for habit in habits.iterator(chunk_size=2000):
+        offset = now.astimezone(ZoneInfo(habit.user.timezone)).utcoffset()
+        local_minute = habit.habit_time.hour * 60 + habit.habit_time.minute
+        habit.reminder_minute = (local_minute - int(offset.total_seconds()) // 60) % 1440
+        habit.save(update_fields=["reminder_minute"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0001_initial"),
+        ("users", "0006_alter_customuser_timezone"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="reminder_minute",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Минута суток по UTC, в которую отправляется напоминание (вычисляется автоматически)",
+                null=True,
+                verbose_name="Минута напоминания (UTC)",
+            ),
+        ),
+        migrations.RunPython(fill_reminder_minute, migrations.RunPython.noop),
+    ]
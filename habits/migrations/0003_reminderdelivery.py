@@ -0,0 +1,43 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0002_habit_reminder_minute"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReminderDelivery",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("local_date", models.DateField(verbose_name="Локальная дата напоминания")),
+                ("minute", models.PositiveSmallIntegerField(verbose_name="Локальная минута суток напоминания")),
+                (
+                    "run_id",
+                    models.CharField(db_index=True, max_length=32, verbose_name="Идентификатор запуска рассылки"),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Дата отправки")),
+                (
+                    "habit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reminder_deliveries",
+                        to="habits.habit",
+                        verbose_name="Привычка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "отправленное напоминание",
+                "verbose_name_plural": "отправленные напоминания",
+                "constraints": [
+                    models.UniqueConstraint(fields=("habit", "local_date", "minute"), name="unique_reminder_delivery")
+                ],
+            },
+        ),
+    ]
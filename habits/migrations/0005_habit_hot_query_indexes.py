@@ -0,0 +1,38 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0004_habit_cursor_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="habit",
+            name="reminder_minute",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                editable=False,
+                help_text="Минута суток по UTC, в которую отправляется напоминание (вычисляется автоматически)",
+                null=True,
+                verbose_name="Минута напоминания (UTC)",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(
+                condition=models.Q(("reminder_minute__isnull", False)),
+                fields=["reminder_minute", "user"],
+                name="habit_reminder_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="habit",
+            index=models.Index(fields=["user", "is_public", "is_pleasant"], name="habit_user_visibility_idx"),
+        ),
+    ]
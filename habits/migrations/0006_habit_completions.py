@@ -0,0 +1,60 @@
+# Generated by Django 5.2.9 on 2026-10-18 12:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0005_habit_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="habit",
+            name="current_streak",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Сколько раз подряд привычка выполнена с заданной периодичностью (на дату последнего выполнения)",
+                verbose_name="Текущая серия выполнений",
+            ),
+        ),
+        migrations.AddField(
+            model_name="habit",
+            name="last_completed_date",
+            field=models.DateField(
+                blank=True, editable=False, null=True, verbose_name="Локальная дата последнего выполнения"
+            ),
+        ),
+        migrations.AddField(
+            model_name="habit",
+            name="longest_streak",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Самая длинная серия выполнений"
+            ),
+        ),
+        migrations.CreateModel(
+            name="HabitCompletion",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("date", models.DateField(verbose_name="Локальная дата выполнения")),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="Дата записи")),
+                (
+                    "habit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="completions",
+                        to="habits.habit",
+                        verbose_name="Привычка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "выполнение привычки",
+                "verbose_name_plural": "выполнения привычек",
+                "constraints": [models.UniqueConstraint(fields=("habit", "date"), name="unique_habit_completion")],
+            },
+        ),
+    ]
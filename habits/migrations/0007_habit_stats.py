@@ -0,0 +1,91 @@
+# Generated by Django 5.2.9 on 2026-10-18 12:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+import habits.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("habits", "0006_habit_completions"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=50, unique=True, verbose_name="Роллап")),
+                (
+                    "last_id",
+                    models.PositiveBigIntegerField(default=0, verbose_name="id последней учтенной записи журнала"),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="Дата обновления")),
+            ],
+            options={
+                "verbose_name": "позиция роллапа",
+                "verbose_name_plural": "позиции роллапов",
+            },
+        ),
+        migrations.CreateModel(
+            name="HabitStats",
+            fields=[
+                (
+                    "habit",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="habits.habit",
+                        verbose_name="Привычка",
+                    ),
+                ),
+                ("completions", models.PositiveIntegerField(default=0, verbose_name="Всего выполнений")),
+                (
+                    "weekday_completions",
+                    models.JSONField(
+                        default=habits.models.default_weekday_completions,
+                        verbose_name="Выполнения по дням недели (с понедельника)",
+                    ),
+                ),
+                (
+                    "recent_completions",
+                    models.JSONField(
+                        default=list,
+                        help_text="Не старше HABIT_STATS_KEEP_DAYS",
+                        verbose_name="Даты выполнений за последние дни",
+                    ),
+                ),
+                (
+                    "delay_minutes_total",
+                    models.IntegerField(
+                        default=0,
+                        verbose_name="Суммарное опоздание выполнений относительно времени привычки (в минутах)",
+                    ),
+                ),
+                (
+                    "delay_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Количество выполнений с опозданием в сумме"),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="Дата обновления")),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="habit_stats",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "статистика привычки",
+                "verbose_name_plural": "статистика привычек",
+            },
+        ),
+    ]
@@ -1,7 +1,12 @@
+from zoneinfo import ZoneInfo
+
 from django.db import models
+from django.utils import timezone
 
 from rest_framework.exceptions import ValidationError
 
+from habits.validators import HabitValues, check_habit_rules
+
 
 class Habit(models.Model):
     """Модель атомной привычки"""
@@ -50,34 +55,69 @@ class Habit(models.Model):
     is_public = models.BooleanField(
         default=False, verbose_name="Публичная привычка", help_text="Сделать привычку видимой для других пользователей"
     )
+    reminder_minute = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Минута напоминания (UTC)",
+        help_text="Минута суток по UTC, в которую отправляется напоминание (вычисляется автоматически)",
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата последнего изменения")
+    # Серии выполнений обновляются при записи выполнения (habits.completions.record_completions)
+    current_streak = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Текущая серия выполнений",
+        help_text="Сколько раз подряд привычка выполнена с заданной периодичностью (на дату последнего выполнения)",
+    )
+    longest_streak = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Самая длинная серия выполнений"
+    )
+    last_completed_date = models.DateField(
+        null=True, blank=True, editable=False, verbose_name="Локальная дата последнего выполнения"
+    )
 
     def __str__(self):
         """Строковое отображение урока"""
         return f"{self.action} в {self.habit_time} {self.place}"
 
-    def clean(self):
-        """Валидация полей модели"""
-        if self.reward and self.related_habit:
-            raise ValidationError("Нельзя указывать и вознаграждение, и связанную привычку одновременно")
-
-        if self.related_habit and not self.related_habit.is_pleasant:
-            raise ValidationError("Связанная привычка должна быть приятной")
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает загруженный из базы признак публичности, чтобы сбросить кэш ленты при его изменении"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_is_public = instance.__dict__.get("is_public", False)
+        return instance
 
-        if self.is_pleasant:
-            if self.related_habit or self.reward:
-                raise ValidationError("Приятная привычка не может иметь вознаграждение или связанную привычку")
-
-        if self.duration > 120:
-            raise ValidationError("Время выполнения должно быть не больше 120 секунд")
+    def clean(self):
+        """Валидация полей модели: правила HABIT_RULES за один проход (те же, что проверяет HabitsValidator)"""
+        errors = check_habit_rules(HabitValues.from_instance(self))
+        if errors:
+            raise ValidationError(errors)
 
-        if not (1 <= self.periodicity <= 7):
-            raise ValidationError("Периодичность должна быть от 1 до 7 дней")
+    @staticmethod
+    def get_reminder_minute(habit_time, tz_name):
+        """
+        Переводит локальное время привычки в минуту суток по UTC.
+        Часовые пояса пользователей не переходят на летнее время, поэтому смещение берется на текущий момент
+        """
+        if habit_time is None:
+            return None
+        offset = timezone.now().astimezone(ZoneInfo(tz_name)).utcoffset()
+        local_minute = habit_time.hour * 60 + habit_time.minute
+        return (local_minute - int(offset.total_seconds()) // 60) % 1440
 
-    def save(self, *args, **kwargs):
-        """При успешной валидации сохраняет данные в базу данных"""
-        self.full_clean()
+    def save(self, *args, validate=True, **kwargs):
+        """
+        При успешной валидации пересчитывает минуту напоминания и сохраняет данные в базу данных.
+        validate=False - для данных, уже проверенных сериализатором по тем же правилам (HabitsSerializer)
+        """
+        if validate:
+            self.full_clean()
+        self.reminder_minute = self.get_reminder_minute(self.habit_time, self.user.timezone)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "habit_time" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "reminder_minute"}
         super().save(*args, **kwargs)
 
     class Meta:
@@ -85,3 +125,118 @@ class Habit(models.Model):
         verbose_name = "привычка"
         verbose_name_plural = "привычки"
         ordering = ["periodicity", "habit_time"]
+        indexes = [
+            # Рассылка напоминаний: привычки текущей минуты, шардирование по user_id
+            models.Index(
+                fields=["reminder_minute", "user"],
+                name="habit_reminder_idx",
+                condition=models.Q(reminder_minute__isnull=False),
+            ),
+            # Привычки пользователя в профиле (все или только публичные) и фильтры по признаку приятной привычки
+            models.Index(fields=["user", "is_public", "is_pleasant"], name="habit_user_visibility_idx"),
+            # Сортировка списка по умолчанию и курсорная пагинация списка
+            models.Index(fields=["periodicity", "habit_time", "id"], name="habit_order_idx"),
+            # Лента публичных привычек: фильтр is_public, сортировка и курсорная пагинация
+            models.Index(
+                fields=["action", "habit_time", "place", "id"],
+                name="habit_public_feed_idx",
+                condition=models.Q(is_public=True),
+            ),
+        ]
+
+
+class ReminderDelivery(models.Model):
+    """Журнал отправленных напоминаний: одно напоминание о привычке за локальные дату и минуту отправляется один раз"""
+
+    habit = models.ForeignKey(
+        to=Habit, on_delete=models.CASCADE, verbose_name="Привычка", related_name="reminder_deliveries"
+    )
+    local_date = models.DateField(verbose_name="Локальная дата напоминания")
+    minute = models.PositiveSmallIntegerField(verbose_name="Локальная минута суток напоминания")
+    run_id = models.CharField(max_length=32, db_index=True, verbose_name="Идентификатор запуска рассылки")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Дата отправки")
+
+    def __str__(self):
+        """Строковое отображение записи журнала"""
+        return f"{self.habit_id} {self.local_date} {self.minute // 60:02}:{self.minute % 60:02}"
+
+    class Meta:
+        verbose_name = "отправленное напоминание"
+        verbose_name_plural = "отправленные напоминания"
+        constraints = [
+            models.UniqueConstraint(fields=["habit", "local_date", "minute"], name="unique_reminder_delivery"),
+        ]
+
+
+class HabitCompletion(models.Model):
+    """Журнал выполнений привычек (записи только добавляются): одно выполнение привычки за локальную дату"""
+
+    habit = models.ForeignKey(to=Habit, on_delete=models.CASCADE, verbose_name="Привычка", related_name="completions")
+    date = models.DateField(verbose_name="Локальная дата выполнения")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата записи")
+
+    def __str__(self):
+        """Строковое отображение записи журнала"""
+        return f"{self.habit_id} {self.date}"
+
+    class Meta:
+        verbose_name = "выполнение привычки"
+        verbose_name_plural = "выполнения привычек"
+        constraints = [
+            # Индекс (привычка, дата) - выборка истории привычки по диапазону дат и защита от повторной записи
+            models.UniqueConstraint(fields=["habit", "date"], name="unique_habit_completion"),
+        ]
+
+
+def default_weekday_completions():
+    return [0] * 7
+
+
+class HabitStats(models.Model):
+    """
+    Роллап журнала выполнений по привычке: накопленные счетчики и даты выполнений за последние дни.
+    Обновляется задачей refresh_habit_stats только по новым записям журнала (после RollupWatermark)
+    """
+
+    habit = models.OneToOneField(
+        to=Habit, on_delete=models.CASCADE, primary_key=True, verbose_name="Привычка", related_name="stats"
+    )
+    user = models.ForeignKey(
+        to="users.CustomUser", on_delete=models.CASCADE, verbose_name="Пользователь", related_name="habit_stats"
+    )
+    completions = models.PositiveIntegerField(default=0, verbose_name="Всего выполнений")
+    weekday_completions = models.JSONField(
+        default=default_weekday_completions, verbose_name="Выполнения по дням недели (с понедельника)"
+    )
+    recent_completions = models.JSONField(
+        default=list, verbose_name="Даты выполнений за последние дни", help_text="Не старше HABIT_STATS_KEEP_DAYS"
+    )
+    delay_minutes_total = models.IntegerField(
+        default=0, verbose_name="Суммарное опоздание выполнений относительно времени привычки (в минутах)"
+    )
+    delay_count = models.PositiveIntegerField(default=0, verbose_name="Количество выполнений с опозданием в сумме")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    def __str__(self):
+        """Строковое отображение статистики"""
+        return f"{self.habit_id}: {self.completions}"
+
+    class Meta:
+        verbose_name = "статистика привычки"
+        verbose_name_plural = "статистика привычек"
+
+
+class RollupWatermark(models.Model):
+    """Позиция роллапа в журнале: id последней учтенной записи"""
+
+    name = models.CharField(max_length=50, unique=True, verbose_name="Роллап")
+    last_id = models.PositiveBigIntegerField(default=0, verbose_name="id последней учтенной записи журнала")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    def __str__(self):
+        """Строковое отображение позиции"""
+        return f"{self.name}: {self.last_id}"
+
+    class Meta:
+        verbose_name = "позиция роллапа"
+        verbose_name_plural = "позиции роллапов"
@@ -1,4 +1,16 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Field, Func, Q, Value
+from django.db.models.lookups import GreaterThan
+
+from rest_framework.exceptions import NotFound, ValidationError as DRFValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class HabitsPaginator(PageNumberPagination):
@@ -7,3 +19,137 @@ class HabitsPaginator(PageNumberPagination):
     page_size = 5
     page_size_query_param = "page_size"
     max_page_size = 10
+
+
+class Row(Func):
+    """Значение-строка (a, b, c) для сравнения строк целиком"""
+
+    template = "(%(expressions)s)"
+    output_field = Field()
+
+
+class HabitsCursorPaginator(BasePagination):
+    """
+    Курсорная (keyset) пагинация списка привычек: следующая страница выбирается условием
+    "после последней строки" по всем полям сортировки, без COUNT(*) и OFFSET.
+    Курсор - непрозрачный токен со значениями полей сортировки последней строки страницы.
+    Порядок задает пагинатор, поэтому параметр ordering с курсорной пагинацией не принимается
+    """
+
+    page_size = 5
+    page_size_query_param = "page_size"
+    max_page_size = 10
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Неверный курсор"
+    ordering_query_param = "ordering"
+    ordering_not_supported_message = "Курсорная пагинация не поддерживает сортировку: порядок задан пагинатором"
+    ordering = ("periodicity", "habit_time", "id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Возвращает страницу привычек после позиции из курсора"""
+        self.request = request
+        if self.ordering_query_param in request.query_params:
+            raise DRFValidationError({self.ordering_query_param: [self.ordering_not_supported_message]})
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        queryset = queryset.order_by(*(F(name).asc(nulls_last=True) for name in self.ordering))
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.get_position_filter(position))
+
+        page = list(queryset[: self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[: self.page_size]
+        self.next_position = self.get_position(page[-1]) if self.has_next else None
+        return page
+
+    def get_page_size(self, request):
+        """Возвращает размер страницы из параметра запроса (не больше max_page_size)"""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_position(self, instance):
+        """Возвращает значения полей сортировки строки"""
+        return [getattr(instance, name) for name in self.ordering]
+
+    def get_position_filter(self, position):
+        """
+        Строит условие "после позиции" одним сравнением строк (a, b, c) > (x, y, z), которое проходит
+        по составному индексу полей сортировки. Сравнение с NULL не определено, поэтому строки с NULL в допускающем
+        его поле (сортировка NULLS LAST, поля после него NULL не допускают) добавляются отдельным условием
+        """
+        names = list(self.ordering)
+        nullable = [index for index, name in enumerate(names) if self.model._meta.get_field(name).null]
+        if not nullable:
+            return self.row_greater(names, position)
+        index = nullable[0]
+        equal = Q(**dict(zip(names[:index], position[:index])), **{f"{names[index]}__isnull": True})
+        if position[index] is not None:
+            return self.row_greater(names, position) | equal
+        after = equal & self.row_greater(names[index + 1 :], position[index + 1 :])
+        return self.row_greater(names[:index], position[:index]) | after if index else after
+
+    def row_greater(self, names, values):
+        """Условие (a, b, ...) > (x, y, ...)"""
+        fields = [self.model._meta.get_field(name) for name in names]
+        return Q(
+            GreaterThan(
+                Row(*(F(name) for name in names)),
+                Row(*(Value(value, output_field=field) for value, field in zip(values, fields))),
+            )
+        )
+
+    def encode_cursor(self, position):
+        """Кодирует позицию в непрозрачный токен"""
+        values = [value.isoformat() if hasattr(value, "isoformat") else value for value in position]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, request):
+        """Декодирует позицию из токена курсора"""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(token.encode()))
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                None if value is None else self.model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        """Возвращает ссылку на следующую страницу"""
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        """Возвращает страницу без общего количества записей"""
+        return Response(OrderedDict([("next", self.get_next_link()), ("results", data)]))
+
+    def get_paginated_response_schema(self, schema):
+        """Описывает ответ курсорной пагинации для документации API"""
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class PublicHabitsCursorPaginator(HabitsCursorPaginator):
+    """Курсорная пагинация ленты публичных привычек"""
+
+    ordering = ("action", "habit_time", "place", "id")
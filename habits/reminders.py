@@ -0,0 +1,74 @@
+from collections import defaultdict
+from datetime import date
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+
+REMINDER_TEMPLATES = {
+    "ru": {
+        "base": "Время выполнить привычку: {action}. Это займет всего 2 минуты — ты справишься!",
+        "reward": " После выполнения ты получишь награду: {reward}",
+        "related_habit": " А ещё тебя ждёт приятная привычка: {action}",
+    },
+}
+
+SECONDS_PER_DAY = 86400
+UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=None)
+def get_zoneinfo(tz_name):
+    """Возвращает кэшированный ZoneInfo: часовых поясов у пользователей всего несколько"""
+    return ZoneInfo(tz_name)
+
+
+def select_due_habits(habits, now_utc):
+    """
+    Отбирает привычки, напоминание о которых нужно отправить сейчас, с учетом периодичности.
+    Привычки группируются по часовому поясу пользователя: локальные время, дата и смещение вычисляются
+    один раз на пояс, а дни с момента создания считаются арифметикой над timestamp без astimezone на строку.
+    Часовые пояса пользователей не переходят на летнее время, поэтому для даты создания берется текущее смещение.
+    Возвращает список [(habit, user_now), ...]
+    """
+    groups = defaultdict(list)
+    for habit in habits:
+        groups[habit.user.timezone].append(habit)
+
+    due = []
+    for tz_name, group in groups.items():
+        user_now = now_utc.astimezone(get_zoneinfo(tz_name))
+        offset = user_now.utcoffset().total_seconds()
+        today = user_now.date().toordinal() - UNIX_EPOCH_ORDINAL
+        timestamps = [habit.created_at.timestamp() for habit in group]
+        due.extend(
+            (habit, user_now)
+            for habit, ts in zip(group, timestamps)
+            if ts // SECONDS_PER_DAY == today or (today - (ts + offset) // SECONDS_PER_DAY) % habit.periodicity == 0
+        )
+    return due
+
+
+class ReminderMessageBuilder:
+    """Собирает текст напоминания по заранее подготовленным шаблонам одного языка"""
+
+    def __init__(self, templates):
+        self.base = templates["base"].format
+        self.reward = templates["reward"].format
+        self.related_habit = templates["related_habit"].format
+
+    def build(self, habit):
+        """Возвращает текст напоминания о привычке (связанная привычка должна быть загружена заранее)"""
+        parts = [self.base(action=habit.action)]
+        if habit.reward:
+            parts.append(self.reward(reward=habit.reward))
+        if habit.related_habit_id:
+            parts.append(self.related_habit(action=habit.related_habit.action))
+        return "".join(parts)
+
+
+@lru_cache(maxsize=None)
+def get_message_builder(language=None):
+    """Возвращает кэшированный сборщик сообщений для языка (по умолчанию - язык проекта)"""
+    language = language or settings.LANGUAGE_CODE
+    return ReminderMessageBuilder(REMINDER_TEMPLATES.get(language, REMINDER_TEMPLATES["ru"]))
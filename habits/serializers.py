@@ -1,14 +1,138 @@
+from django.conf import settings
+from django.utils import timezone
+
 from rest_framework import serializers
 
+from habits.completions import get_current_streak
 from habits.models import Habit
 from habits.validators import HabitsValidator
 
+UNIQUE_ERROR = "Привычка с таким действием и местом у пользователя уже есть"
+
 
 class HabitsSerializer(serializers.ModelSerializer):
-    """Сериализатор привычек"""
+    """
+    Сериализатор привычек. Проверяет правила привычки (HabitsValidator, те же правила, что в Habit.clean)
+    и уникальность действия и места с учетом сохраненных значений, поэтому сохраняет привычку
+    без повторной валидации (Habit.save(validate=False))
+    """
 
     class Meta:
         model = Habit
-        fields = "__all__"
+        # Серии выполнений отдаются отдельно (/habits/habits/streaks/), чтобы выполнение не меняло кэшируемую ленту
+        exclude = ("reminder_minute", "current_streak", "longest_streak", "last_completed_date")
         read_only_fields = ("user",)
         validators = [HabitsValidator()]
+
+    def validate(self, attrs):
+        """Проверяет уникальность действия и места"""
+        self.validate_unique_together(attrs)
+        return attrs
+
+    def validate_unique_together(self, attrs):
+        """
+        Проверяет уникальность (пользователь, действие, место) одним запросом, если действие или место изменились.
+        Владелец новой привычки - текущий пользователь (см. HabitsViewSet.perform_create); без запроса в контексте
+        владельца определить нельзя, и проверка не пропускается, а завершается ошибкой
+        """
+        action = attrs.get("action", getattr(self.instance, "action", None))
+        place = attrs.get("place", getattr(self.instance, "place", None))
+        if self.instance is not None:
+            if (action, place) == (self.instance.action, self.instance.place):
+                return
+            user_id = self.instance.user_id
+        else:
+            request = self.context.get("request")
+            if request is None:
+                raise ValueError("Для проверки уникальности новой привычки нужен запрос в контексте сериализатора")
+            user_id = request.user.id
+        duplicates = Habit.objects.filter(user_id=user_id, action=action, place=place)
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise serializers.ValidationError(UNIQUE_ERROR)
+
+    def create(self, validated_data):
+        """Создает привычку без повторной валидации моделью"""
+        habit = Habit(**validated_data)
+        habit.save(validate=False)
+        return habit
+
+    def update(self, instance, validated_data):
+        """
+        Обновляет привычку без повторной валидации моделью. Записываются только переданные поля:
+        серии выполнений меняются параллельно (record_completions) и не должны перезаписываться прочитанными ранее
+        """
+        for name, value in validated_data.items():
+            setattr(instance, name, value)
+        instance.save(validate=False, update_fields={*validated_data, "updated_at"})
+        return instance
+
+
+class RelatedHabitFromContextField(serializers.PrimaryKeyRelatedField):
+    """Связанная привычка, заранее загруженная для всей пачки (context["related_habits"]: {id: привычка})"""
+
+    def to_internal_value(self, data):
+        try:
+            habit = self.context["related_habits"].get(int(data))
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if habit is None:
+            self.fail("does_not_exist", pk_value=data)
+        return habit
+
+
+class BulkHabitsSerializer(HabitsSerializer):
+    """Сериализатор элемента пакетной операции: связанные привычки берутся из общей для пачки выборки"""
+
+    related_habit = RelatedHabitFromContextField(queryset=Habit.objects.all(), allow_null=True, required=False)
+
+    def get_validators(self):
+        """Правила привычки проверяются для всей пачки сразу (см. HabitsValidator.validate_many)"""
+        return []
+
+    def validate(self, attrs):
+        """Уникальность проверяется для всей пачки одним запросом (см. habits.bulk)"""
+        return attrs
+
+
+class HabitCompletionSerializer(serializers.Serializer):
+    """Выполнение привычки: локальная дата пользователя (по умолчанию - сегодня)"""
+
+    date = serializers.DateField(required=False)
+
+    def validate_date(self, value):
+        """Проверяет, что дата выполнения не в будущем"""
+        if value > self.context["today"]:
+            raise serializers.ValidationError("Нельзя отметить выполнение в будущем")
+        return value
+
+
+class HabitReminderSerializer(serializers.Serializer):
+    """Разовое напоминание о привычке в момент remind_at"""
+
+    remind_at = serializers.DateTimeField()
+
+    def validate_remind_at(self, value):
+        """Проверяет, что момент напоминания в будущем и не дальше ONE_OFF_REMINDER_MAX_AHEAD"""
+        now = timezone.now()
+        if value <= now:
+            raise serializers.ValidationError("Момент напоминания должен быть в будущем")
+        if value > now + settings.ONE_OFF_REMINDER_MAX_AHEAD:
+            raise serializers.ValidationError(
+                f"Напоминание можно запланировать не дальше чем на {settings.ONE_OFF_REMINDER_MAX_AHEAD.days} дней"
+            )
+        return value
+
+
+class HabitStreakSerializer(serializers.ModelSerializer):
+    """Серии выполнений привычки; текущая серия - на сегодняшнюю дату пользователя (context["today"])"""
+
+    current_streak = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Habit
+        fields = ("id", "action", "current_streak", "longest_streak", "last_completed_date")
+
+    def get_current_streak(self, habit):
+        return get_current_streak(habit, self.context["today"])
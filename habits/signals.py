@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from habits.cache import bump_public_feed_version
+from habits.models import Habit
+
+
+@receiver(post_save, sender=Habit)
+def invalidate_public_feed_on_save(sender, instance, **kwargs):
+    """Сбрасывает кэш ленты, если привычка публичная или перестала быть публичной"""
+    if instance.is_public or getattr(instance, "_loaded_is_public", False):
+        bump_public_feed_version()
+    instance._loaded_is_public = instance.is_public
+
+
+@receiver(post_delete, sender=Habit)
+def invalidate_public_feed_on_delete(sender, instance, **kwargs):
+    """Сбрасывает кэш ленты при удалении публичной привычки"""
+    if instance.is_public:
+        bump_public_feed_version()
@@ -0,0 +1,148 @@
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from habits.models import HabitCompletion, HabitStats, RollupWatermark
+from habits.reminders import get_zoneinfo
+
+STATS_WINDOWS = (7, 30, 90)
+WATERMARK_NAME = "habit_stats"
+ROLLUP_FIELDS = (
+    "completions",
+    "weekday_completions",
+    "recent_completions",
+    "delay_minutes_total",
+    "delay_count",
+    "updated_at",
+)
+
+
+def get_delay_minutes(habit_time, recorded_at, day, tz_name):
+    """
+    Опоздание выполнения относительно времени привычки в минутах (отрицательное - раньше времени).
+    None, если время привычки не задано или выполнение отмечено не в тот же день (задним числом)
+    """
+    if habit_time is None:
+        return None
+    local = recorded_at.astimezone(get_zoneinfo(tz_name))
+    if local.date() != day:
+        return None
+    return local.hour * 60 + local.minute - (habit_time.hour * 60 + habit_time.minute)
+
+
+def apply_completion(stats, day, delay, keep_after):
+    """Учитывает в роллапе одно выполнение; даты выполнений не старше keep_after"""
+    stats.completions += 1
+    stats.weekday_completions[day.weekday()] += 1
+    if day >= keep_after:
+        stats.recent_completions = sorted(
+            {value for value in stats.recent_completions if value >= keep_after.isoformat()} | {day.isoformat()}
+        )
+    if delay is not None:
+        stats.delay_minutes_total += delay
+        stats.delay_count += 1
+
+
+def refresh_habit_stats(batch_size=None, lag=None, max_batches=100):
+    """
+    Применяет к роллапу HabitStats записи журнала выполнений после позиции RollupWatermark пачками по batch_size:
+    одна выборка новых записей, одна выборка роллапов их привычек и запись bulk_create/bulk_update в одной транзакции
+    с позицией. Записи моложе lag не берутся: транзакция, получившая меньший id, могла еще не зафиксироваться.
+    Полный пересчет журнала не нужен. Возвращает количество учтенных записей
+    """
+    batch_size = batch_size or settings.HABIT_STATS_BATCH_SIZE
+    lag = settings.HABIT_STATS_LAG if lag is None else lag
+    applied = 0
+    for _ in range(max_batches):
+        count = _refresh_batch(batch_size, timezone.now() - lag)
+        applied += count
+        if count < batch_size:
+            break
+    return applied
+
+
+def _refresh_batch(batch_size, cutoff):
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+        rows = (
+            HabitCompletion.objects.filter(id__gt=watermark.last_id)
+            .order_by("id")
+            .values_list(
+                "id", "habit_id", "date", "created_at", "habit__habit_time", "habit__user_id", "habit__user__timezone"
+            )
+        )
+        events = []
+        for row in rows[:batch_size]:
+            if row[3] > cutoff:
+                break
+            events.append(row)
+        if not events:
+            return 0
+
+        stats = HabitStats.objects.in_bulk({event[1] for event in events})
+        created = {}
+        now = timezone.now()
+        keep_after = now.date() - timedelta(days=settings.HABIT_STATS_KEEP_DAYS)
+        for _, habit_id, day, recorded_at, habit_time, user_id, tz_name in events:
+            habit_stats = stats.get(habit_id) or created.get(habit_id)
+            if habit_stats is None:
+                habit_stats = created[habit_id] = HabitStats(habit_id=habit_id, user_id=user_id)
+            apply_completion(habit_stats, day, get_delay_minutes(habit_time, recorded_at, day, tz_name), keep_after)
+
+        HabitStats.objects.bulk_create(created.values())
+        for habit_stats in stats.values():
+            habit_stats.updated_at = now
+        HabitStats.objects.bulk_update(stats.values(), ROLLUP_FIELDS)
+        watermark.last_id = events[-1][0]
+        watermark.save(update_fields=["last_id", "updated_at"])
+    return len(events)
+
+
+def _get_rollup(habit):
+    try:
+        return habit.stats
+    except HabitStats.DoesNotExist:
+        return None
+
+
+def build_stats(habits, today, tz_name):
+    """
+    Статистика набора привычек одного пользователя (одной привычки или всех) по их роллапам, без чтения журнала:
+    доля выполнений за последние 7, 30 и 90 дней (от ожидаемого по периодичности с даты создания привычки),
+    лучший день недели (0 - понедельник) и среднее опоздание выполнения относительно времени привычки.
+    Роллапы загружаются вместе с привычками (select_related("stats"))
+    """
+    tz = get_zoneinfo(tz_name)
+    done = dict.fromkeys(STATS_WINDOWS, 0)
+    expected = dict.fromkeys(STATS_WINDOWS, 0)
+    weekdays = [0] * 7
+    completions = delay_total = delay_count = 0
+    starts = {window: (today - timedelta(days=window - 1)).isoformat() for window in STATS_WINDOWS}
+    end = today.isoformat()
+
+    for habit in habits:
+        days_since_created = (today - habit.created_at.astimezone(tz).date()).days + 1
+        for window in STATS_WINDOWS:
+            expected[window] += math.ceil(max(min(window, days_since_created), 0) / habit.periodicity)
+        rollup = _get_rollup(habit)
+        if rollup is None:
+            continue
+        completions += rollup.completions
+        weekdays = [total + count for total, count in zip(weekdays, rollup.weekday_completions)]
+        delay_total += rollup.delay_minutes_total
+        delay_count += rollup.delay_count
+        for window in STATS_WINDOWS:
+            done[window] += sum(1 for day in rollup.recent_completions if starts[window] <= day <= end)
+
+    return {
+        "completions": completions,
+        "completion_rate": {
+            str(window): round(min(done[window] / expected[window], 1), 3) if expected[window] else None
+            for window in STATS_WINDOWS
+        },
+        "best_weekday": weekdays.index(max(weekdays)) if completions else None,
+        "average_delay_minutes": round(delay_total / delay_count, 1) if delay_count else None,
+    }
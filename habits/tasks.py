@@ -1,45 +1,276 @@
-from zoneinfo import ZoneInfo
+import logging
+import time
+import uuid
+from datetime import datetime
 
+from django.conf import settings
+from django.db.models import Value
+from django.db.models.functions import Mod
 from django.utils import timezone
 
-import requests
-from celery import shared_task
+from celery import chord, group, shared_task
 
-from config.settings import TELEGRAM_TOKEN, TELEGRAM_URL
-from habits.models import Habit
+from habits import stats
+from habits.bot import flush_completions, get_update_queue, process_updates, reminder_keyboard
+from habits.delayed import pop_due_messages, schedule_messages
+from habits.models import Habit, ReminderDelivery
+from habits.reminders import get_message_builder, select_due_habits
+from habits.telegram import get_telegram_sender
+from monitoring.metrics import REMINDER_DUE_HABITS, REMINDER_LAG_SECONDS, REMINDER_TICK_SECONDS
+
+logger = logging.getLogger(__name__)
 
 
 @shared_task
 def send_telegram_message(chat_id: int, message: str):
-    """Отправляет сообщение в Телеграм"""
-    params = {
-        "text": message,
-        "chat_id": chat_id,
-    }
-    url = f"{TELEGRAM_URL}{TELEGRAM_TOKEN}/sendMessage"
-    response = requests.post(url, params=params)
-    if response.status_code != 200:
-        print("Telegram error:", response.text)
+    """Отправляет одно сообщение в Телеграм"""
+    error = get_telegram_sender().send(chat_id, message)
+    if error is not None:
+        logger.warning("Telegram error: %s", error)
+
+
+@shared_task
+def send_telegram_batch(messages: list, attempt: int = 0):
+    """
+    Отправляет пачку сообщений [(chat_id, message[, reply_markup]), ...] в Телеграм и возвращает статистику отправки.
+    Неотправленные сообщения с временной ошибкой (сеть, 429, 5xx) откладываются на повторную попытку через очередь
+    отложенных сообщений (задержки - TELEGRAM_RETRY_DELAYS); постоянные ошибки (400, 403) не повторяются
+    """
+    report = get_telegram_sender().send_batch(messages).as_dict()
+    delays = settings.TELEGRAM_RETRY_DELAYS
+    retry = [messages[error["index"]] for error in report["errors"] if error["retryable"]]
+    if retry and attempt < len(delays):
+        schedule_messages(retry, delay=delays[attempt], attempt=attempt + 1)
+        report["retried"] = len(retry)
+    return report
 
 
 @shared_task
 def send_habit_reminder():
-    """Отправляет пользователю напоминание о привычке с учетом его часового пояса"""
-    now_utc = timezone.now()
-    habits = Habit.objects.filter(user__tg_chat_id__isnull=False).select_related("user")
-
-    for habit in habits:
-        user_tz = ZoneInfo(habit.user.timezone)
-        user_now = now_utc.astimezone(user_tz)
-        if (user_now.hour, user_now.minute) != (habit.habit_time.hour, habit.habit_time.minute):
-            continue
-
-        created_local = habit.created_at.astimezone(user_tz).date()
-        days_passed = (user_now.date() - created_local).days
-        if habit.created_at.date() == user_now.date() or days_passed % habit.periodicity == 0:
-            message = f"Время выполнить привычку: {habit.action}. Это займет всего 2 минуты — ты справишься!"
-            if habit.reward:
-                message += f" После выполнения ты получишь награду: {habit.reward}"
-            if habit.related_habit:
-                message += f" А ещё тебя ждёт приятная привычка: {habit.related_habit.action}"
-            send_telegram_message.delay(habit.user.tg_chat_id, message)
+    """
+    Координирует рассылку напоминаний текущей минуты: делит привычки на REMINDER_SHARDS шардов по user_id
+    и запускает их параллельно группой задач, после чего собирает статистику по шардам
+    """
+    now = timezone.now().isoformat()
+    shard_count = settings.REMINDER_SHARDS
+    if shard_count <= 1:
+        return collect_reminder_stats([send_habit_reminder_shard(now, 0, 1)], now)
+
+    header = group(send_habit_reminder_shard.s(now, shard, shard_count) for shard in range(shard_count))
+    return chord(header)(collect_reminder_stats.s(now)).id
+
+
+@shared_task
+def send_habit_reminder_shard(now: str, shard: int, shard_count: int):
+    """Отправляет напоминания о привычках пользователей своего шарда (user_id % shard_count == shard)"""
+    started = time.monotonic()
+    now_utc = datetime.fromisoformat(now)
+    reminder_minute = now_utc.hour * 60 + now_utc.minute
+    habits = (
+        Habit.objects.filter(reminder_minute=reminder_minute, user__tg_chat_id__isnull=False)
+        .select_related("user", "related_habit")
+        .only(
+            "user",
+            "related_habit",
+            "action",
+            "reward",
+            "periodicity",
+            "created_at",
+            "user__timezone",
+            "user__tg_chat_id",
+            "related_habit__action",
+        )
+    )
+    if shard_count > 1:
+        habits = habits.annotate(shard=Mod("user_id", Value(shard_count))).filter(shard=shard)
+
+    due = select_due_habits(habits, now_utc)
+
+    builder = get_message_builder()
+    days = {habit.id: user_now.date() for habit, user_now in due}
+    run_id = uuid.uuid4().hex
+    claimed = claim_reminder_deliveries(due, run_id)
+
+    batch_size = settings.TELEGRAM_BATCH_SIZE
+    messages = []
+    for start in range(0, len(claimed), batch_size):
+        batch = claimed[start : start + batch_size]
+        try:
+            batch_messages = [
+                (habit.user.tg_chat_id, builder.build(habit), reminder_keyboard(habit, days[habit.id]))
+                for habit in batch
+            ]
+            send_telegram_batch.delay(batch_messages)
+        except Exception:
+            release_reminder_deliveries(run_id, [habit.id for habit in claimed[start:]])
+            raise
+        messages += batch_messages
+
+    elapsed = time.monotonic() - started
+    REMINDER_TICK_SECONDS.observe(elapsed, shard=shard)
+    minute_started = now_utc.replace(second=0, microsecond=0)
+    REMINDER_LAG_SECONDS.observe((timezone.now() - minute_started).total_seconds(), shard=shard)
+    return {"shard": shard, "due": len(messages), "elapsed": round(elapsed, 3)}
+
+
+def claim_reminder_deliveries(due, run_id):
+    """
+    Записывает в журнал напоминания [(habit, user_now), ...] одной вставкой и возвращает только те привычки,
+    запись о которых сделал запуск run_id. Напоминания, уже отправленные пересекающимся запуском или при повторе
+    задачи, отбрасываются уникальным ограничением (habit, local_date, minute).
+    Запись делается до отправки, поэтому доставка - не более одного раза: если пачку не удалось поставить
+    в очередь отправки, записи снимаются (release_reminder_deliveries) и повтор задачи отправит напоминания;
+    временные ошибки Telegram повторяет send_telegram_batch, а напоминание с постоянной ошибкой (400, 403) теряется
+    """
+    if not due:
+        return []
+    ReminderDelivery.objects.bulk_create(
+        [
+            ReminderDelivery(
+                habit=habit, local_date=user_now.date(), minute=user_now.hour * 60 + user_now.minute, run_id=run_id
+            )
+            for habit, user_now in due
+        ],
+        ignore_conflicts=True,
+    )
+    claimed = set(ReminderDelivery.objects.filter(run_id=run_id).values_list("habit_id", flat=True))
+    return [habit for habit, _ in due if habit.id in claimed]
+
+
+def release_reminder_deliveries(run_id, habit_ids):
+    """Снимает записи журнала о напоминаниях запуска run_id, которые не были поставлены в очередь отправки"""
+    ReminderDelivery.objects.filter(run_id=run_id, habit_id__in=habit_ids).delete()
+
+
+@shared_task
+def collect_reminder_stats(results: list, now: str):
+    """Собирает статистику шардов одной минуты рассылки: количество напоминаний и время работы каждого шарда"""
+    stats = {
+        "now": now,
+        "shards": len(results),
+        "due": sum(result["due"] for result in results),
+        "max_elapsed": max((result["elapsed"] for result in results), default=0),
+        "shard_timings": {result["shard"]: result["elapsed"] for result in results},
+    }
+    REMINDER_DUE_HABITS.observe(stats["due"])
+    logger.info(
+        "Habit reminders %s: due=%s shards=%s slowest shard=%.3fs",
+        now,
+        stats["due"],
+        stats["shards"],
+        stats["max_elapsed"],
+    )
+    return stats
+
+
+@shared_task
+def cleanup_reminder_deliveries():
+    """Удаляет из журнала отправленных напоминаний записи старше REMINDER_DELIVERY_TTL"""
+    deleted, _ = ReminderDelivery.objects.filter(
+        created_at__lt=timezone.now() - settings.REMINDER_DELIVERY_TTL
+    ).delete()
+    return deleted
+
+
+@shared_task
+def refresh_habit_stats():
+    """Применяет к роллапу статистики новые записи журнала выполнений"""
+    return stats.refresh_habit_stats()
+
+
+@shared_task
+def process_telegram_updates():
+    """
+    Обрабатывает накопленные входящие обновления бота пачками по TELEGRAM_UPDATES_BATCH_SIZE.
+    Флаг обработки снимается до чтения очереди: обновление, пришедшее во время работы, запланирует новую задачу.
+    Отложенные напоминания ставятся в очередь отложенных сообщений на TELEGRAM_SNOOZE_MINUTES минут.
+    Если обработка пачки не удалась, пачка возвращается в начало очереди и обрабатывается повторно
+    (привязка чата повторяется без последствий, ответ может уйти дважды)
+    """
+    queue = get_update_queue()
+    queue.release()
+    totals = {"updates": 0, "linked": 0, "snoozed": 0}
+    batch_size = settings.TELEGRAM_BATCH_SIZE
+    while batch := queue.pop_batch(settings.TELEGRAM_UPDATES_BATCH_SIZE):
+        try:
+            report = process_updates(batch)
+            for start in range(0, len(report.replies), batch_size):
+                send_telegram_batch.delay(report.replies[start : start + batch_size])
+            schedule_messages(report.snoozed, delay=settings.TELEGRAM_SNOOZE_MINUTES * 60)
+        except Exception:
+            queue.requeue(batch)
+            raise
+        totals["updates"] += report.updates
+        totals["linked"] += report.linked
+        totals["snoozed"] += len(report.snoozed)
+    return totals
+
+
+@shared_task
+def flush_telegram_completions():
+    """
+    Записывает в базу нажатия "Выполнено", накопленные с прошлого запуска, пачками по TELEGRAM_UPDATES_BATCH_SIZE.
+    Если пачку записать не удалось, нажатия записываются по одному (см. _flush_completions_one_by_one)
+    """
+    queue = get_update_queue()
+    completed = 0
+    while members := queue.pop_completions(settings.TELEGRAM_UPDATES_BATCH_SIZE):
+        try:
+            completed += flush_completions(members)
+        except Exception:
+            logger.exception("Не удалось записать пачку нажатий (%s), запись по одному", len(members))
+            completed += _flush_completions_one_by_one(queue, members)
+    return completed
+
+
+def _flush_completions_one_by_one(queue, members):
+    """
+    Записывает нажатия по одному, чтобы одно испорченное нажатие не блокировало остальные.
+    Неразбираемые нажатия и нажатия, которые не записались, хотя другие записались, откладываются в dead-letter.
+    Если не записалось ни одно нажатие (например, база недоступна), они возвращаются в очередь и ошибка пробрасывается
+    """
+    completed = 0
+    invalid, failed, error = [], [], None
+    for member in members:
+        try:
+            completed += flush_completions([member])
+        except ValueError:
+            invalid.append(member)
+        except Exception as e:
+            failed.append(member)
+            error = e
+    if failed and len(failed) + len(invalid) == len(members):
+        queue.dead_letter_completions(invalid)
+        queue.add_completions(failed)
+        raise error
+    if invalid or failed:
+        logger.error("Нажатия не записаны и отложены в dead-letter: %s", invalid + failed)
+        queue.dead_letter_completions(invalid + failed)
+    return completed
+
+
+@shared_task
+def dispatch_delayed_messages():
+    """
+    Отправляет наступившие отложенные сообщения (отложенные и разовые напоминания, повторы после ошибок):
+    забирает из очереди только их, пачками по TELEGRAM_BATCH_SIZE, и передает в send_telegram_batch.
+    Вызывается диспетчером (команда dispatch_delayed_messages). Возвращает количество сообщений.
+    Если пачку не удалось поставить в очередь отправки (например, брокер недоступен), она и еще не поставленные
+    пачки возвращаются в очередь отложенных сообщений
+    """
+    batch_size = settings.TELEGRAM_BATCH_SIZE
+    dispatched = 0
+    while True:
+        batches = pop_due_messages(limit=batch_size)
+        items = list(batches.items())
+        for index, (attempt, messages) in enumerate(items):
+            try:
+                send_telegram_batch.delay(messages, attempt)
+            except Exception:
+                for pending_attempt, pending in items[index:]:
+                    schedule_messages(pending, attempt=pending_attempt)
+                raise
+        count = sum(len(messages) for messages in batches.values())
+        dispatched += count
+        if count < batch_size:
+            return dispatched
@@ -0,0 +1,355 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from monitoring.metrics import TELEGRAM_MESSAGES, TELEGRAM_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def message_data(chat_id, message, reply_markup=None):
+    """Параметры sendMessage; reply_markup (например, inline-клавиатура) передается в Bot API строкой JSON"""
+    data = {"chat_id": chat_id, "text": message}
+    if reply_markup:
+        data["reply_markup"] = json.dumps(reply_markup, ensure_ascii=False)
+    return data
+
+
+def is_retryable(status_code):
+    """
+    Можно ли повторить отправку позже: сетевая ошибка (status_code None), 429 или ошибка сервера.
+    Остальные ошибки (400 "chat not found", 403 "bot was blocked") постоянные
+    """
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+class TokenBucket:
+    """Ограничитель частоты запросов по алгоритму token bucket"""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated_at = clock()
+
+    def _refill(self):
+        """Пополняет запас токенов пропорционально прошедшему времени"""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def consume(self, tokens=1):
+        """Забирает токены, если их достаточно. Возвращает 0 или время ожидания (в секундах) до появления токенов"""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0
+        return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens=1, sleep=time.sleep):
+        """Ждет, пока не появятся токены, и забирает их"""
+        wait = self.consume(tokens)
+        while wait:
+            sleep(wait)
+            wait = self.consume(tokens)
+
+
+@dataclass
+class DeliveryReport:
+    """Итоги отправки пачки сообщений"""
+
+    sent: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    errors: list = field(default_factory=list)
+
+    @property
+    def throughput(self):
+        """Количество отправленных сообщений в секунду"""
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, index, chat_id, error, status_code):
+        """Учитывает неотправленное сообщение с номером index в пачке"""
+        self.failed += 1
+        self.errors.append(
+            {"index": index, "chat_id": chat_id, "error": error, "retryable": is_retryable(status_code)}
+        )
+
+    def as_dict(self):
+        """Возвращает итоги в виде словаря (для результата Celery-задачи)"""
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "elapsed": round(self.elapsed, 3),
+            "throughput": round(self.throughput, 2),
+            "errors": self.errors,
+        }
+
+
+class TelegramSender:
+    """
+    Отправляет сообщения в Telegram через общую keep-alive сессию с пулом соединений,
+    таймаутом и повторами при ошибке соединения, соблюдая глобальный лимит и лимит на один чат
+    """
+
+    def __init__(
+        self,
+        base_url=None,
+        token=None,
+        timeout=None,
+        global_rate=None,
+        per_chat_rate=None,
+        pool_size=None,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.url = f"{base_url or settings.TELEGRAM_URL}{token or settings.TELEGRAM_TOKEN}/sendMessage"
+        self.timeout = timeout or settings.TELEGRAM_TIMEOUT
+        self.per_chat_rate = per_chat_rate or settings.TELEGRAM_PER_CHAT_RATE
+        self.clock = clock
+        self.sleep = sleep
+        self.global_bucket = TokenBucket(global_rate or settings.TELEGRAM_GLOBAL_RATE, clock=clock)
+        self.session = self._build_session(pool_size or settings.TELEGRAM_POOL_SIZE)
+
+    @staticmethod
+    def _build_session(pool_size):
+        """
+        Создает сессию с пулом соединений и повторами только при ошибке соединения: запрос еще не дошел до Telegram.
+        Таймаут чтения не повторяется (сообщение могло быть принято, повтор его продублирует), а 429 и 5xx
+        повторяет send_telegram_batch через очередь отложенных сообщений, не занимая воркер ожиданием
+        """
+        retry = Retry(
+            total=3,
+            connect=3,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=0.5,
+            allowed_methods=frozenset({"POST"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _post(self, chat_id, message, reply_markup=None):
+        """Отправляет одно сообщение. Возвращает (None, 200) при успехе или (текст ошибки, статус ответа или None)"""
+        try:
+            with TELEGRAM_REQUEST_SECONDS.time(sender="sync"):
+                response = self.session.post(
+                    self.url, data=message_data(chat_id, message, reply_markup), timeout=self.timeout
+                )
+        except requests.RequestException as e:
+            TELEGRAM_MESSAGES.inc(status="failed")
+            return str(e), None
+        if response.status_code != 200:
+            TELEGRAM_MESSAGES.inc(status="failed")
+            return response.text, response.status_code
+        TELEGRAM_MESSAGES.inc(status="sent")
+        return None, 200
+
+    def send(self, chat_id, message, reply_markup=None):
+        """Отправляет одно сообщение. Возвращает None при успехе или текст ошибки"""
+        return self._post(chat_id, message, reply_markup)[0]
+
+    def send_batch(self, messages):
+        """
+        Отправляет пачку сообщений [(chat_id, message), ...] или [(chat_id, message, reply_markup), ...].
+        Сообщения в чат, исчерпавший свой лимит, откладываются в конец очереди, чтобы не блокировать остальные.
+        Ошибки в отчете содержат номер сообщения в пачке и признак, можно ли повторить отправку
+        """
+        report = DeliveryReport()
+        started = self.clock()
+        chat_buckets = {}
+        pending = deque(enumerate(messages))
+        deferred = 0
+
+        while pending:
+            index, item = pending.popleft()
+            chat_id = item[0]
+            bucket = chat_buckets.setdefault(chat_id, TokenBucket(self.per_chat_rate, capacity=1, clock=self.clock))
+            wait = bucket.consume()
+            if wait:
+                pending.append((index, item))
+                deferred += 1
+                if deferred >= len(pending):
+                    self.sleep(wait)
+                    deferred = 0
+                continue
+            deferred = 0
+
+            self.global_bucket.acquire(sleep=self.sleep)
+            error, status_code = self._post(*item)
+            if error is None:
+                report.sent += 1
+            else:
+                report.add_error(index, chat_id, error, status_code)
+
+        report.elapsed = self.clock() - started
+        logger.info(
+            "Telegram batch: sent=%s failed=%s elapsed=%.3fs throughput=%.1f msg/s",
+            report.sent,
+            report.failed,
+            report.elapsed,
+            report.throughput,
+        )
+        return report
+
+
+class AsyncTelegramSender:
+    """
+    Асинхронно отправляет пачку сообщений в Telegram: до concurrency запросов одновременно
+    через общий httpx-клиент с keep-alive (или HTTP/2) соединениями, соблюдая лимиты Bot API
+    """
+
+    def __init__(
+        self,
+        base_url=None,
+        token=None,
+        timeout=None,
+        concurrency=None,
+        global_rate=None,
+        per_chat_rate=None,
+        http2=None,
+    ):
+        self.url = f"{base_url or settings.TELEGRAM_URL}{token or settings.TELEGRAM_TOKEN}/sendMessage"
+        self.timeout = timeout or settings.TELEGRAM_TIMEOUT
+        self.concurrency = concurrency or settings.TELEGRAM_ASYNC_CONCURRENCY
+        self.global_rate = global_rate or settings.TELEGRAM_GLOBAL_RATE
+        self.per_chat_rate = per_chat_rate or settings.TELEGRAM_PER_CHAT_RATE
+        self.http2 = settings.TELEGRAM_HTTP2 if http2 is None else http2
+
+    @staticmethod
+    async def _acquire(bucket):
+        """Ждет токен из ведра, не блокируя цикл событий"""
+        wait = bucket.consume()
+        while wait:
+            await asyncio.sleep(wait)
+            wait = bucket.consume()
+
+    @staticmethod
+    def _retry_after(response):
+        """
+        Пауза перед повтором после 429: parameters.retry_after из ответа Bot API, иначе заголовок Retry-After,
+        иначе 1 секунда (ответ может быть не JSON, например страница ошибки прокси)
+        """
+        try:
+            return float(response.json()["parameters"]["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            pass
+        try:
+            return float(response.headers.get("Retry-After", 1))
+        except ValueError:
+            return 1
+
+    async def _send(self, client, semaphore, global_bucket, chat_lock, chat_bucket, index, item, report):
+        """
+        Отправляет сообщение номер index пачки с учетом лимитов; при ответе 429 ждет retry_after и повторяет один раз
+        """
+        chat_id = item[0]
+        async with chat_lock:
+            await self._acquire(chat_bucket)
+            async with semaphore:
+                await self._acquire(global_bucket)
+                error = status_code = None
+                for attempt in range(2):
+                    try:
+                        with TELEGRAM_REQUEST_SECONDS.time(sender="async"):
+                            response = await client.post(self.url, data=message_data(*item))
+                    except httpx.HTTPError as e:
+                        error, status_code = str(e) or e.__class__.__name__, None
+                        break
+                    status_code = response.status_code
+                    if response.status_code == 429 and attempt == 0:
+                        await asyncio.sleep(self._retry_after(response))
+                        continue
+                    error = None if response.status_code == 200 else response.text
+                    break
+        if error is None:
+            report.sent += 1
+            TELEGRAM_MESSAGES.inc(status="sent")
+        else:
+            report.add_error(index, chat_id, error, status_code)
+            TELEGRAM_MESSAGES.inc(status="failed")
+
+    async def send_batch_async(self, messages):
+        """Отправляет пачку сообщений [(chat_id, message[, reply_markup]), ...] конкурентно"""
+        report = DeliveryReport()
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        global_bucket = TokenBucket(self.global_rate)
+        chat_locks, chat_buckets = {}, {}
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        transport = httpx.AsyncHTTPTransport(retries=2, http2=self.http2, limits=limits)
+
+        async with httpx.AsyncClient(transport=transport, timeout=self.timeout) as client:
+            await asyncio.gather(
+                *(
+                    self._send(
+                        client,
+                        semaphore,
+                        global_bucket,
+                        chat_locks.setdefault(item[0], asyncio.Lock()),
+                        chat_buckets.setdefault(item[0], TokenBucket(self.per_chat_rate, capacity=1)),
+                        index,
+                        item,
+                        report,
+                    )
+                    for index, item in enumerate(messages)
+                )
+            )
+
+        report.elapsed = time.monotonic() - started
+        logger.info(
+            "Telegram async batch: sent=%s failed=%s elapsed=%.3fs throughput=%.1f msg/s concurrency=%s",
+            report.sent,
+            report.failed,
+            report.elapsed,
+            report.throughput,
+            self.concurrency,
+        )
+        return report
+
+    def send_batch(self, messages):
+        """Запускает асинхронную отправку пачки в отдельном цикле событий (внутри обычной Celery-задачи)"""
+        return asyncio.run(self.send_batch_async(messages))
+
+    def send(self, chat_id, message, reply_markup=None):
+        """Отправляет одно сообщение. Возвращает None при успехе или текст ошибки"""
+        report = self.send_batch([(chat_id, message, reply_markup)])
+        return report.errors[0]["error"] if report.failed else None
+
+
+SENDERS = {
+    "sync": TelegramSender,
+    "async": AsyncTelegramSender,
+}
+
+_local = threading.local()
+
+
+def get_telegram_sender():
+    """
+    Возвращает общий для процесса (потока) отправитель, чтобы переиспользовать пул соединений.
+    Режим отправки задается настройкой TELEGRAM_SENDER: "sync" или "async"
+    """
+    mode = settings.TELEGRAM_SENDER
+    sender = getattr(_local, "sender", None)
+    if sender is None or getattr(_local, "mode", None) != mode:
+        sender = _local.sender = SENDERS[mode]()
+        _local.mode = mode
+    return sender
@@ -0,0 +1,34 @@
+from zoneinfo import ZoneInfo
+
+
+class UserStub:
+    """Пользователь без базы данных: только часовой пояс"""
+
+    __slots__ = ("timezone",)
+
+    def __init__(self, tz_name):
+        self.timezone = tz_name
+
+
+class HabitStub:
+    """Привычка без базы данных: только поля, нужные для отбора напоминаний"""
+
+    __slots__ = ("user", "created_at", "periodicity")
+
+    def __init__(self, user, created_at, periodicity):
+        self.user = user
+        self.created_at = created_at
+        self.periodicity = periodicity
+
+
+def legacy_select_due_habits(habits, now_utc):
+    """Прежний отбор: ZoneInfo и astimezone на каждую привычку (эталон для сравнения)"""
+    due = []
+    for habit in habits:
+        user_tz = ZoneInfo(habit.user.timezone)
+        user_now = now_utc.astimezone(user_tz)
+        created_local = habit.created_at.astimezone(user_tz).date()
+        days_passed = (user_now.date() - created_local).days
+        if habit.created_at.date() == user_now.date() or days_passed % habit.periodicity == 0:
+            due.append((habit, user_now))
+    return due
@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from habits.management.commands.bench import find_regressions, percentile
+from habits.models import Habit
+
+
+class BenchCommandTests(TestCase):
+    """Тестирует команду замеров производительности"""
+
+    scenarios = ["habits_list", "habits_create", "users_retrieve", "send_habit_reminder"]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "baseline.json")
+
+    def bench(self, **options):
+        call_command("bench", sizes=[30], runs=3, warmup=0, scenarios=self.scenarios, stdout=StringIO(), **options)
+
+    def test_saves_baseline_and_rolls_back_data(self):
+        """Проверяет, что результаты сохраняются в JSON, а синтетические данные откатываются"""
+        self.bench(save=self.path)
+
+        with open(self.path, encoding="utf-8") as file:
+            results = json.load(file)["results"]
+        self.assertEqual(set(results), {f"{name}@30" for name in self.scenarios})
+        self.assertEqual(set(results["habits_list@30"]), {"p50_ms", "p95_ms", "p99_ms", "queries", "peak_kib"})
+        self.assertGreater(results["habits_list@30"]["queries"], 0)
+        self.assertFalse(Habit.objects.exists())
+
+    def test_compare_fails_on_regression(self):
+        """Проверяет, что рост количества запросов относительно базовой линии завершает команду с ошибкой"""
+        self.bench(save=self.path)
+        with open(self.path, encoding="utf-8") as file:
+            report = json.load(file)
+        report["results"]["habits_list@30"]["queries"] -= 1
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(report, file)
+
+        with self.assertRaisesMessage(CommandError, "habits_list@30: запросов"):
+            self.bench(compare=self.path, threshold=100)
+
+    def test_find_regressions(self):
+        """Проверяет порог относительного роста и минимальную абсолютную разницу"""
+        base = {"a": {"p50_ms": 10, "p95_ms": 20, "queries": 2, "peak_kib": 100}}
+
+        self.assertEqual(
+            find_regressions(base, {"a": {"p50_ms": 11, "p95_ms": 90, "queries": 2, "peak_kib": 110}}, 0.2), []
+        )
+        self.assertEqual(
+            len(find_regressions(base, {"a": {"p50_ms": 15, "p95_ms": 20, "queries": 2, "peak_kib": 100}}, 0.2)), 1
+        )
+        self.assertEqual(
+            find_regressions(base, {"b": {"p50_ms": 99, "p95_ms": 99, "queries": 9, "peak_kib": 999}}, 0.2), []
+        )
+
+    def test_percentile(self):
+        """Проверяет перцентиль методом ближайшего ранга"""
+        values = list(range(1, 101))
+
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
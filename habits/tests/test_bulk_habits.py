@@ -0,0 +1,146 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from habits.cache import get_public_feed_version
+from habits.models import Habit
+from users.models import CustomUser
+
+
+class BulkHabitsTests(APITestCase):
+    """Тестирует пакетное создание, обновление и удаление привычек"""
+
+    def setUp(self):
+        """Формирует тестовые данные"""
+        cache.clear()
+        self.url = reverse("habits:habits-bulk")
+        self.user = CustomUser.objects.create_user(
+            email="user@example.com", username="user", password="pass123", is_active=True, timezone="Asia/Irkutsk"
+        )
+        self.stranger = CustomUser.objects.create_user(
+            email="stranger@example.com", username="stranger", password="pass123", is_active=True
+        )
+        self.pleasant = Habit.objects.create(user=self.user, action="кофе", place="дома", is_pleasant=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def items(self, count, start=0):
+        return [
+            {"action": f"action {i}", "place": "дома", "habit_time": "08:30", "reward": "чай"}
+            for i in range(start, start + count)
+        ]
+
+    def test_bulk_create(self):
+        """Проверяет создание пачки привычек с вычислением минуты напоминания"""
+        items = self.items(3) + [{"action": "прогулка", "place": "парк", "related_habit": self.pleasant.id}]
+
+        response = self.client.post(self.url, items, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["results"]), 4)
+        self.assertEqual(response.data["errors"], [])
+        habit = Habit.objects.get(action="action 0")
+        self.assertEqual(habit.user, self.user)
+        self.assertEqual(habit.reminder_minute, 30)
+        self.assertEqual(Habit.objects.get(action="прогулка").related_habit, self.pleasant)
+
+    def test_bulk_create_query_count_is_constant(self):
+        """Проверяет, что количество запросов не зависит от размера пачки"""
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, self.items(5), format="json")
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(self.url, self.items(50, start=5), format="json")
+
+        self.assertEqual(Habit.objects.count(), 56)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_bulk_create_reports_errors_per_item(self):
+        """Проверяет, что невалидные элементы возвращаются с индексами, а валидные сохраняются"""
+        Habit.objects.create(user=self.user, action="exists", place="дома", reward="чай")
+        items = [
+            {"action": "ok", "place": "дома", "reward": "чай"},
+            {"action": "both", "place": "дома", "reward": "чай", "related_habit": self.pleasant.id},
+            {"action": "exists", "place": "дома", "reward": "чай"},
+            {"action": "ok", "place": "дома", "reward": "чай"},
+            {"action": "missing", "place": "дома", "related_habit": 999999},
+            {"action": "long", "place": "дома", "reward": "чай", "periodicity": 8},
+            "not an object",
+        ]
+
+        response = self.client.post(self.url, items, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [1, 2, 3, 4, 5, 6])
+        self.assertIn("related_habit", response.data["errors"][3]["errors"])
+        self.assertTrue(Habit.objects.filter(action="ok").exists())
+        self.assertFalse(Habit.objects.filter(action="both").exists())
+
+    def test_bulk_create_all_invalid(self):
+        """Проверяет, что при невалидных элементах ничего не сохраняется"""
+        response = self.client.post(self.url, [{"action": "no place"}], format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["results"], [])
+        self.assertFalse(Habit.objects.filter(action="no place").exists())
+
+    def test_bulk_requires_list(self):
+        """Проверяет, что тело запроса должно быть непустым списком не длиннее лимита"""
+        self.assertEqual(self.client.post(self.url, {"action": "a"}, format="json").status_code, 400)
+        self.assertEqual(self.client.post(self.url, [], format="json").status_code, 400)
+        with override_settings(HABITS_BULK_MAX_ITEMS=2):
+            self.assertEqual(self.client.post(self.url, self.items(3), format="json").status_code, 400)
+
+    def test_bulk_create_public_bumps_feed_version(self):
+        """Проверяет, что создание публичных привычек сбрасывает кэш ленты"""
+        version = get_public_feed_version()
+
+        self.client.post(self.url, [{**self.items(1)[0], "is_public": True}], format="json")
+
+        self.assertGreater(get_public_feed_version(), version)
+
+    def test_bulk_update(self):
+        """Проверяет частичное обновление своих привычек и ошибки для чужих"""
+        own = Habit.objects.create(user=self.user, action="own", place="дома", habit_time="09:00", reward="чай")
+        foreign = Habit.objects.create(user=self.stranger, action="foreign", place="дома", reward="чай")
+        items = [
+            {"id": own.id, "habit_time": "10:00", "place": "парк"},
+            {"id": foreign.id, "place": "парк"},
+        ]
+
+        response = self.client.patch(self.url, items, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data["errors"][0]["index"], 1)
+        own.refresh_from_db()
+        foreign.refresh_from_db()
+        self.assertEqual(own.place, "парк")
+        self.assertEqual(own.reminder_minute, 120)
+        self.assertEqual(foreign.place, "дома")
+
+    def test_bulk_update_validates_merged_instance(self):
+        """Проверяет, что правила модели проверяются для привычки с учетом новых значений"""
+        own = Habit.objects.create(user=self.user, action="own", place="дома", reward="чай")
+
+        response = self.client.patch(self.url, [{"id": own.id, "is_pleasant": True}], format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        own.refresh_from_db()
+        self.assertFalse(own.is_pleasant)
+
+    def test_bulk_delete(self):
+        """Проверяет удаление своих привычек и ошибки для чужих и повторных id"""
+        own = Habit.objects.create(user=self.user, action="own", place="дома", reward="чай")
+        foreign = Habit.objects.create(user=self.stranger, action="foreign", place="дома", reward="чай")
+
+        response = self.client.delete(self.url, [own.id, foreign.id, own.id], format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data["results"], [own.id])
+        self.assertEqual([error["index"] for error in response.data["errors"]], [1, 2])
+        self.assertFalse(Habit.objects.filter(id=own.id).exists())
+        self.assertTrue(Habit.objects.filter(id=foreign.id).exists())
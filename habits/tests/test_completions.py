@@ -0,0 +1,109 @@
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from habits.completions import record_completions
+from habits.models import Habit, HabitCompletion
+from habits.serializers import HabitsSerializer
+from users.models import CustomUser
+
+TODAY = date(2025, 6, 10)
+
+
+@patch("habits.views.get_local_date", return_value=TODAY)
+class HabitCompletionTests(APITestCase):
+    """Тестирует отметку выполнения привычек и серии выполнений"""
+
+    def setUp(self):
+        """Формирует тестовые данные"""
+        self.user = CustomUser.objects.create_user(
+            email="user@example.com", username="user", password="pass123", is_active=True
+        )
+        self.habit = Habit.objects.create(user=self.user, action="бег", place="парк", reward="чай")
+        self.url = reverse("habits:habits-complete", args=[self.habit.id])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def complete(self, day=None):
+        return self.client.post(self.url, {"date": day.isoformat()} if day else {}, format="json")
+
+    def test_complete_today(self, _):
+        """Проверяет запись выполнения за сегодня и повторную отметку"""
+        response = self.complete()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["current_streak"], 1)
+        self.assertEqual(response.data["last_completed_date"], TODAY.isoformat())
+        self.assertEqual(self.complete().status_code, status.HTTP_200_OK)
+        self.assertEqual(HabitCompletion.objects.filter(habit=self.habit).count(), 1)
+
+    def test_streaks_are_incremental(self, _):
+        """Проверяет, что серия продлевается по периодичности и сбрасывается после пропуска"""
+        for days_ago in (9, 8, 7, 3, 2, 1):
+            response = self.complete(TODAY - timedelta(days=days_ago))
+
+        self.assertEqual((response.data["current_streak"], response.data["longest_streak"]), (3, 3))
+
+        # Выполнение задним числом закрывает пропуск: серии пересчитываются по журналу
+        for days_ago in (6, 5, 4):
+            response = self.complete(TODAY - timedelta(days=days_ago))
+
+        self.assertEqual((response.data["current_streak"], response.data["longest_streak"]), (9, 9))
+
+    def test_complete_errors(self, _):
+        """Проверяет, что нельзя отметить выполнение в будущем и чужой привычки"""
+        self.assertEqual(self.complete(TODAY + timedelta(days=1)).status_code, status.HTTP_400_BAD_REQUEST)
+
+        stranger = CustomUser.objects.create_user(email="stranger@example.com", username="stranger", password="pass")
+        self.client.force_authenticate(user=stranger)
+        self.assertEqual(self.complete().status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_streaks_endpoint(self, _):
+        """Проверяет, что просроченная серия отдается как нулевая без чтения журнала выполнений"""
+        weekly = Habit.objects.create(user=self.user, action="баня", place="дома", reward="чай", periodicity=7)
+        record_completions([(self.habit.id, TODAY - timedelta(days=3)), (weekly.id, TODAY - timedelta(days=3))])
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("habits:habits-streaks"))
+
+        streaks = {habit["id"]: habit for habit in response.data["results"]}
+        self.assertEqual(streaks[self.habit.id]["current_streak"], 0)
+        self.assertEqual(streaks[self.habit.id]["longest_streak"], 1)
+        self.assertEqual(streaks[weekly.id]["current_streak"], 1)
+
+    def test_update_keeps_concurrent_streak(self, _):
+        """Проверяет, что изменение привычки, загруженной до выполнения, не перезаписывает серию"""
+        habit = Habit.objects.get(pk=self.habit.pk)
+        record_completions([(self.habit.id, TODAY)])
+
+        serializer = HabitsSerializer(habit, data={"reward": "кофе"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.habit.refresh_from_db()
+        self.assertEqual((self.habit.reward, self.habit.current_streak), ("кофе", 1))
+        self.assertEqual(self.habit.last_completed_date, TODAY)
+
+
+class RecordCompletionsTests(APITestCase):
+    """Тестирует пакетную запись выполнений"""
+
+    def test_batch(self):
+        """Проверяет запись выполнений нескольких привычек одним вызовом без повторов"""
+        user = CustomUser.objects.create_user(email="user@example.com", username="user", password="pass123")
+        first = Habit.objects.create(user=user, action="бег", place="парк", reward="чай")
+        second = Habit.objects.create(user=user, action="сон", place="дома", reward="чай", periodicity=2)
+        completions = [(first.id, TODAY - timedelta(days=1)), (first.id, TODAY), (second.id, TODAY - timedelta(2))]
+
+        habits, created = record_completions(completions + [(second.id, TODAY)])
+        _, repeated = record_completions(completions)
+
+        self.assertEqual(len(created), 4)
+        self.assertEqual(repeated, set())
+        self.assertEqual(habits[first.id].current_streak, 2)
+        second.refresh_from_db()
+        self.assertEqual((second.current_streak, second.last_completed_date), (2, TODAY))
@@ -0,0 +1,131 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from habits.delayed import get_delayed_queue, pop_due_messages, schedule_messages
+from habits.models import Habit
+from habits.tasks import dispatch_delayed_messages, send_telegram_batch
+from habits.telegram import DeliveryReport
+from users.models import CustomUser
+
+NOW = 1_700_000_000.0
+
+
+@patch("habits.delayed.time.time", return_value=NOW)
+class DelayedMessagesTests(APITestCase):
+    """Тестирует очередь отложенных сообщений, диспетчер и повторные отправки"""
+
+    def setUp(self):
+        """Очищает очередь отложенных сообщений"""
+        get_delayed_queue().items.clear()
+
+    def test_pop_only_due_messages(self, _):
+        """Проверяет, что из очереди забираются только наступившие сообщения, по времени отправки"""
+        schedule_messages([(1, "через минуту")], delay=60)
+        schedule_messages([(2, "через 5 секунд")], delay=5)
+        schedule_messages([(3, "повтор", None)], delay=1, attempt=2)
+
+        self.assertEqual(pop_due_messages(now=NOW), {})
+        self.assertEqual(pop_due_messages(now=NOW + 5), {2: [(3, "повтор", None)], 0: [(2, "через 5 секунд")]})
+        self.assertEqual(get_delayed_queue().next_due(), NOW + 60)
+        self.assertEqual(pop_due_messages(now=NOW + 60, limit=1), {0: [(1, "через минуту")]})
+
+    @patch("habits.tasks.send_telegram_batch.delay")
+    def test_dispatch_in_batches(self, mock_delay, mock_time):
+        """Проверяет, что диспетчер отправляет наступившие сообщения пачками, а будущие оставляет в очереди"""
+        schedule_messages([(chat_id, "x") for chat_id in range(5)])
+        schedule_messages([(9, "позже")], delay=30)
+
+        with self.settings(TELEGRAM_BATCH_SIZE=2):
+            self.assertEqual(dispatch_delayed_messages(), 5)
+
+        self.assertEqual([len(call.args[0]) for call in mock_delay.call_args_list], [2, 2, 1])
+        mock_time.return_value = NOW + 30
+        call_command("dispatch_delayed_messages", "--once", stdout=StringIO())
+        mock_delay.assert_called_with([(9, "позже")], 0)
+
+    @patch("habits.tasks.send_telegram_batch.delay")
+    def test_failed_enqueue_keeps_messages(self, mock_delay, _):
+        """Проверяет, что сообщения, которые не удалось поставить в очередь отправки, остаются в очереди"""
+        schedule_messages([(1, "первое")])
+        schedule_messages([(2, "повтор")], attempt=1)
+        mock_delay.side_effect = ConnectionError
+
+        with self.assertRaises(ConnectionError):
+            dispatch_delayed_messages()
+
+        self.assertEqual(pop_due_messages(now=NOW), {0: [(1, "первое")], 1: [(2, "повтор")]})
+
+    @patch("habits.tasks.get_telegram_sender")
+    def test_failed_messages_are_retried(self, mock_sender, _):
+        """
+        Проверяет, что на повтор откладываются только неотправленные сообщения с временной ошибкой,
+        а не все сообщения того же чата, пока не кончатся попытки
+        """
+        report = DeliveryReport(sent=1)
+        report.add_error(1, 2, "Too Many Requests", 429)
+        report.add_error(2, 3, "Forbidden: bot was blocked by the user", 403)
+        mock_sender.return_value.send_batch.return_value = report
+
+        result = send_telegram_batch([(2, "a"), (2, "b", {"k": 1}), (3, "c")])
+
+        self.assertEqual(result["retried"], 1)
+        self.assertEqual(pop_due_messages(now=NOW + 29), {})
+        self.assertEqual(pop_due_messages(now=NOW + 30), {1: [(2, "b", {"k": 1})]})
+
+        self.assertNotIn("retried", send_telegram_batch([(2, "a"), (2, "b"), (3, "c")], attempt=3))
+        self.assertEqual(get_delayed_queue().items, [])
+
+
+@patch("habits.delayed.time.time", return_value=NOW)
+class OneOffReminderTests(APITestCase):
+    """Тестирует разовые напоминания о привычке"""
+
+    def setUp(self):
+        """Формирует тестовые данные"""
+        get_delayed_queue().items.clear()
+        self.user = CustomUser.objects.create_user(
+            email="user@example.com", username="user", password="pass123", tg_chat_id=100, timezone="Europe/Moscow"
+        )
+        self.habit = Habit.objects.create(
+            user=self.user, action="бег", place="парк", reward="чай", habit_time=time(8, 0)
+        )
+        self.url = reverse("habits:habits-remind", args=[self.habit.id])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_remind(self, _):
+        """Проверяет, что разовое напоминание ставится в очередь на указанную секунду с кнопками"""
+        remind_at = (timezone.now() + timedelta(hours=1)).replace(microsecond=0)
+
+        response = self.client.post(self.url, {"remind_at": remind_at.isoformat()}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        [(due_at, _)] = get_delayed_queue().items
+        self.assertEqual(due_at, remind_at.timestamp())
+        [(chat_id, message, keyboard)] = pop_due_messages(now=due_at)[0]
+        self.assertEqual(chat_id, 100)
+        self.assertIn("бег", message)
+        local_day = remind_at.astimezone(dt_timezone(timedelta(hours=3))).date()
+        self.assertEqual(keyboard["inline_keyboard"][0][0]["callback_data"], f"done:{self.habit.id}:{local_day}")
+
+    def test_remind_errors(self, _):
+        """Проверяет, что нельзя запланировать напоминание в прошлом, без Telegram и о чужой привычке"""
+        past = datetime(2020, 1, 1, tzinfo=dt_timezone.utc).isoformat()
+        self.assertEqual(self.client.post(self.url, {"remind_at": past}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        remind_at = (timezone.now() + timedelta(hours=1)).isoformat()
+        CustomUser.objects.filter(pk=self.user.pk).update(tg_chat_id=None)
+        self.assertEqual(self.client.post(self.url, {"remind_at": remind_at}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        stranger = CustomUser.objects.create_user(email="stranger@example.com", username="stranger", password="pass")
+        self.client.force_authenticate(user=stranger)
+        self.assertEqual(self.client.post(self.url, {"remind_at": remind_at}).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(get_delayed_queue().items, [])
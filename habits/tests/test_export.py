@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from habits.models import Habit
+from users.models import CustomUser
+
+
+class HabitsExportTests(APITestCase):
+    """Тестирует потоковую выгрузку привычек в NDJSON и CSV"""
+
+    def setUp(self):
+        """Формирует тестовые данные"""
+        self.user = CustomUser.objects.create_user(
+            email="user@example.com", username="user", password="pass123", is_active=True
+        )
+        self.stranger = CustomUser.objects.create_user(
+            email="stranger@example.com", username="stranger", password="pass123", is_active=True
+        )
+        for i in range(7):
+            Habit.objects.create(
+                user=self.user, action=f"привычка {i}", place="дома", habit_time="08:30", reward="чай"
+            )
+        Habit.objects.create(user=self.stranger, action="чужая", place="дома", reward="чай")
+        Habit.objects.create(user=self.stranger, action="чужая публичная", place="дома", reward="чай", is_public=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    @override_settings(HABITS_EXPORT_CHUNK_SIZE=3)
+    def test_export_ndjson(self):
+        """Проверяет, что выгружаются все доступные пользователю привычки, а не одна страница"""
+        response = self.client.get(reverse("habits:habits-export"))
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(rows), 8)
+        self.assertNotIn("чужая", [row["action"] for row in rows])
+        self.assertEqual(rows[0]["action"], "привычка 0")
+        self.assertEqual(rows[0]["user"], self.user.id)
+        self.assertEqual(rows[0]["habit_time"], "08:30:00")
+        self.assertNotIn("reminder_minute", rows[0])
+
+    def test_export_csv(self):
+        """Проверяет выгрузку в CSV с заголовком"""
+        response = self.client.get(reverse("habits:habits-export"), {"export_format": "csv"})
+
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(rows[0]["action"], "привычка 0")
+        self.assertEqual(rows[0]["related_habit"], "")
+
+    def test_public_export(self):
+        """Проверяет, что лента выгружает только публичные привычки"""
+        response = self.client.get(reverse("habits:habits-public-export"))
+
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row["action"] for row in rows], ["чужая публичная"])
+
+    def test_export_errors(self):
+        """Проверяет неизвестный формат и доступ без авторизации"""
+        response = self.client.get(reverse("habits:habits-export"), {"export_format": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(reverse("habits:habits-export")).status_code, status.HTTP_401_UNAUTHORIZED)
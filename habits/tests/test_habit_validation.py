@@ -0,0 +1,151 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient, APITestCase
+
+from habits.models import Habit
+from habits.serializers import HabitsSerializer
+from habits.validators import HabitsValidator
+from users.models import CustomUser
+
+
+class HabitValidationPathsTests(APITestCase):
+    """
+    Проверяет, что сохранение через API (валидация сериализатором, Habit.save(validate=False))
+    и через ORM (Habit.save() с full_clean) применяют одни и те же правила
+    """
+
+    def setUp(self):
+        """Формирует тестовые данные"""
+        self.user = CustomUser.objects.create_user(
+            email="user@example.com", username="user", password="pass123", is_active=True
+        )
+        self.pleasant = Habit.objects.create(user=self.user, action="кофе", place="дома", is_pleasant=True)
+        self.useful = Habit.objects.create(user=self.user, action="зарядка", place="дома", reward="чай")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def invalid_cases(self):
+        """Возвращает нарушения правил: (название, поля для ORM, поля для API)"""
+        base = {"action": "прогулка", "place": "парк", "reward": "чай"}
+        return [
+            ("reward_and_related", {"related_habit": self.pleasant}, {"related_habit": self.pleasant.id}),
+            (
+                "related_not_pleasant",
+                {"reward": None, "related_habit": self.useful},
+                {"reward": None, "related_habit": self.useful.id},
+            ),
+            ("pleasant_with_reward", {"is_pleasant": True}, {"is_pleasant": True}),
+            ("duration", {"duration": 121}, {"duration": 121}),
+            ("periodicity_too_big", {"periodicity": 8}, {"periodicity": 8}),
+            ("periodicity_zero", {"periodicity": 0}, {"periodicity": 0}),
+            ("action_too_long", {"action": "a" * 501}, {"action": "a" * 501}),
+            ("duplicate", {"action": "зарядка", "place": "дома"}, {"action": "зарядка", "place": "дома"}),
+        ], base
+
+    def test_invalid_habit_rejected_by_both_paths(self):
+        """Проверяет, что каждое нарушение отклоняется и моделью, и API"""
+        cases, base = self.invalid_cases()
+        for name, orm_fields, api_fields in cases:
+            with self.subTest(name, path="orm"):
+                with self.assertRaises((ValidationError, DjangoValidationError)):
+                    Habit(user=self.user, **{**base, **orm_fields}).save()
+
+            with self.subTest(name, path="api"):
+                count = Habit.objects.count()
+                response = self.client.post(reverse("habits:habits-list"), {**base, **api_fields}, format="json")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(Habit.objects.count(), count)
+
+    def test_invalid_update_rejected_by_both_paths(self):
+        """Проверяет, что при изменении привычки правила проверяются с учетом уже сохраненных значений"""
+        habit = Habit.objects.create(user=self.user, action="прогулка", place="парк", reward="чай")
+        url = reverse("habits:habits-detail", args=[habit.id])
+        cases = [
+            ("duration", {"duration": 121}),
+            ("pleasant_with_reward", {"is_pleasant": True}),
+            ("related_with_saved_reward", {"related_habit": self.pleasant.id}),
+            ("duplicate", {"action": "зарядка", "place": "дома"}),
+        ]
+        for name, fields in cases:
+            with self.subTest(name, path="orm"):
+                instance = Habit.objects.get(pk=habit.pk)
+                for field, value in fields.items():
+                    setattr(instance, f"{field}_id" if field == "related_habit" else field, value)
+                with self.assertRaises((ValidationError, DjangoValidationError)):
+                    instance.save()
+
+            with self.subTest(name, path="api"):
+                response = self.client.patch(url, fields, format="json")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                habit.refresh_from_db()
+                self.assertEqual((habit.action, habit.duration, habit.is_pleasant), ("прогулка", 120, False))
+
+    def test_unique_check_needs_request(self):
+        """Проверяет, что без запроса в контексте проверка уникальности новой привычки не пропускается молча"""
+        serializer = HabitsSerializer(data={"action": "зарядка", "place": "дома", "reward": "чай"})
+
+        with self.assertRaises(ValueError):
+            serializer.is_valid()
+
+    def test_valid_habit_accepted_by_both_paths(self):
+        """Проверяет, что корректная привычка сохраняется обоими путями"""
+        Habit(user=self.user, action="прогулка", place="парк", related_habit=self.pleasant).save()
+
+        response = self.client.post(
+            reverse("habits:habits-list"),
+            {"action": "бег", "place": "парк", "related_habit": self.pleasant.id, "habit_time": "07:00"},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        habit = Habit.objects.get(action="бег")
+        self.assertEqual(habit.reminder_minute, Habit.get_reminder_minute(habit.habit_time, self.user.timezone))
+
+    def test_pleasant_habit_created_via_api(self):
+        """Проверяет, что приятную привычку без вознаграждения и связанной привычки можно создать через API"""
+        response = self.client.post(
+            reverse("habits:habits-list"), {"action": "ванна", "place": "дома", "is_pleasant": True}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_validate_many(self):
+        """Проверяет пакетную проверку правил: приятность связанных привычек загружается одним запросом"""
+        items = [
+            {"action": "бег", "related_habit": self.pleasant.id},
+            {"action": "прогулка", "related_habit": self.useful.id},
+            {"action": "сон", "duration": 121, "periodicity": 0},
+            {"action": "чтение", "is_pleasant": True},
+        ]
+
+        with self.assertNumQueries(1):
+            errors = HabitsValidator.validate_many(items)
+
+        self.assertEqual(errors[0], [])
+        self.assertEqual(errors[1], ["Связанная привычка должна быть приятной"])
+        self.assertEqual(len(errors[2]), 2)
+        self.assertEqual(errors[3], [])
+        self.assertEqual(
+            HabitsValidator.validate_many([{"is_pleasant": True}], [self.useful]),
+            [["Приятная привычка не может иметь вознаграждение или связанную привычку"]],
+        )
+
+    def test_api_writes_skip_repeated_validation(self):
+        """Проверяет, что запись через API не повторяет проверки модели отдельными запросами"""
+        url = reverse("habits:habits-list")
+        data = {"action": "бег", "place": "парк", "related_habit": self.pleasant.id}
+        # Связанная привычка, проверка уникальности, вставка
+        with self.assertNumQueries(3):
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Привычка вместе с владельцем и связанной привычкой, связанная привычка из запроса, обновление
+        detail_url = reverse("habits:habits-detail", args=[response.data["id"]])
+        with self.assertNumQueries(3):
+            response = self.client.patch(
+                detail_url, {"habit_time": "10:00", "related_habit": self.pleasant.id}, format="json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
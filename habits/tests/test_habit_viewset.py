@@ -1,3 +1,7 @@
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -12,6 +16,7 @@ class CustomUserViewSetTests(APITestCase):
     def setUp(self):
         """Формирует тестовые данные"""
         super().setUp()
+        cache.clear()
 
         self.superuser = CustomUser.objects.create_superuser(
             email="admin@test.com", username="admin", password="admin123", is_active=True
@@ -213,3 +218,108 @@ class CustomUserViewSetTests(APITestCase):
         response = client.delete(url)
 
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def count_queries(self, client, url):
+        """Возвращает количество запросов к базе при GET-запросе"""
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_list_query_count_does_not_depend_on_related_habits(self):
+        """Проверяет, что списки привычек выполняют одинаковое число запросов при связанных привычках"""
+        urls = [reverse("habits:habits-list"), reverse("habits:habits-public-habits")]
+        before = [self.count_queries(self.client_user1, url) for url in urls]
+
+        pleasant = Habit.objects.create(
+            user=self.user1, action="pleasant", place="дома", is_pleasant=True, is_public=True
+        )
+        for i in range(5):
+            Habit.objects.create(
+                user=self.user1, action=f"related_{i}", place="дома", related_habit=pleasant, is_public=True
+            )
+
+        self.assertEqual([self.count_queries(self.client_user1, url) for url in urls], before)
+
+    def test_retrieve_owner_query_count(self):
+        """Проверяет, что проверка владельца привычки не загружает пользователя отдельным запросом"""
+        url = reverse("habits:habits-detail", args=[self.habit2.id])
+
+        self.assertEqual(self.count_queries(self.client_user1, url), 1)
+
+    def collect_cursor_pages(self, client, url):
+        """Проходит все страницы по курсору и возвращает id привычек и число запросов COUNT"""
+        ids, count_queries = [], 0
+        next_url = f"{url}?pagination=cursor&page_size=2"
+        while next_url:
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(next_url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            count_queries += sum("COUNT(" in query["sql"] for query in context.captured_queries)
+            ids += [habit["id"] for habit in response.data["results"]]
+            next_url = response.data["next"]
+        return ids, count_queries
+
+    def test_cursor_pagination_list(self):
+        """Проверяет, что курсорная пагинация списка проходит все привычки по порядку без подсчета количества"""
+        for place in ("дома", "парк", "сад"):
+            Habit.objects.create(user=self.user1, action="no_time", place=place, reward="чай")
+        Habit.objects.create(user=self.user1, action="weekly", place="дома", habit_time="09:00", periodicity=7)
+
+        ids, count_queries = self.collect_cursor_pages(self.client_user1, reverse("habits:habits-list"))
+
+        expected = list(
+            Habit.objects.filter(user=self.user1)
+            .order_by("periodicity", F("habit_time").asc(nulls_last=True), "id")
+            .values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual(count_queries, 0)
+
+    def test_cursor_pagination_public(self):
+        """Проверяет курсорную пагинацию ленты публичных привычек"""
+        for i in range(4):
+            Habit.objects.create(
+                user=self.stranger, action="test_action1", place=f"place{i}", habit_time="09:00", is_public=True
+            )
+            Habit.objects.create(user=self.stranger, action="test_action1", place=f"no_time{i}", is_public=True)
+
+        ids, count_queries = self.collect_cursor_pages(self.client_user1, reverse("habits:habits-public-habits"))
+
+        expected = list(
+            Habit.objects.filter(is_public=True)
+            .order_by("action", F("habit_time").asc(nulls_last=True), "place", "id")
+            .values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual(count_queries, 0)
+
+    def test_cursor_pagination_row_comparison(self):
+        """Проверяет, что следующая страница выбирается одним сравнением строк по полям сортировки"""
+        response = self.client_user1.get(reverse("habits:habits-list"), {"pagination": "cursor", "page_size": 1})
+
+        with CaptureQueriesContext(connection) as context:
+            self.client_user1.get(response.data["next"])
+
+        self.assertTrue(
+            any(
+                '("habits_habit"."periodicity", "habits_habit"."habit_time", "habits_habit"."id") > (' in query["sql"]
+                for query in context.captured_queries
+            )
+        )
+
+    def test_cursor_pagination_rejects_ordering(self):
+        """Проверяет, что сортировка клиента с курсорной пагинацией возвращает 400, а не игнорируется"""
+        response = self.client_user1.get(
+            reverse("habits:habits-list"), {"pagination": "cursor", "ordering": "-habit_time"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("ordering", response.data)
+
+    def test_cursor_pagination_invalid_cursor(self):
+        """Проверяет, что поврежденный курсор возвращает 404"""
+        response = self.client_user1.get(reverse("habits:habits-list"), {"cursor": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
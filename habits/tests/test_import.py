@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from habits.models import Habit
+from users.models import CustomUser
+
+
+def ndjson(rows):
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode()
+
+
+class HabitsImportTests(APITestCase):
+    """Тестирует импорт привычек из файла NDJSON и CSV"""
+
+    def setUp(self):
+        """Формирует тестовые данные"""
+        self.url = reverse("habits:habits-import")
+        self.user = CustomUser.objects.create_user(
+            email="user@example.com", username="user", password="pass123", is_active=True, timezone="Asia/Irkutsk"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, name, content, **data):
+        return self.client.post(self.url, {"file": SimpleUploadedFile(name, content), **data}, format="multipart")
+
+    @override_settings(HABITS_IMPORT_CHUNK_SIZE=2)
+    def test_import_export_round_trip(self):
+        """Проверяет, что выгрузка другого пользователя импортируется со ссылками на связанные привычки"""
+        source = CustomUser.objects.create_user(email="source@example.com", username="source", password="pass123")
+        coffee = Habit.objects.create(user=source, action="кофе", place="дома", is_pleasant=True)
+        Habit.objects.create(user=source, action="зарядка", place="дома", habit_time="08:30", related_habit=coffee)
+        for i in range(3):
+            Habit.objects.create(user=source, action=f"прогулка {i}", place="парк", reward="чай")
+        self.client.force_authenticate(user=source)
+        exported = b"".join(self.client.get(reverse("habits:habits-export")).streaming_content)
+        self.client.force_authenticate(user=self.user)
+
+        response = self.upload("habits.ndjson", exported)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data["rows"], response.data["imported"], response.data["failed"]), (5, 5, 0))
+        habit = Habit.objects.get(user=self.user, action="зарядка")
+        self.assertEqual(habit.related_habit, Habit.objects.get(user=self.user, action="кофе"))
+        self.assertEqual(habit.reminder_minute, 30)
+
+    def test_import_csv_with_errors(self):
+        """Проверяет ссылку на приятную привычку по действию и ошибки по номерам строк"""
+        Habit.objects.create(user=self.user, action="кофе", place="дома", is_pleasant=True)
+        content = (
+            "action,place,reward,related_action,periodicity\n"
+            "бег,парк,,кофе,1\n"
+            "сон,дома,чай,,8\n"
+            "чтение,дома,,чай,1\n"
+            "ванна,дома,,,\n"
+        ).encode()
+
+        response = self.upload("habits.csv", content)
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [2, 3])
+        self.assertIn("related_action", response.data["errors"][1]["errors"])
+        self.assertEqual(Habit.objects.get(action="бег").related_habit.action, "кофе")
+        self.assertTrue(Habit.objects.filter(action="ванна").exists())
+
+    def test_import_conflicts(self):
+        """Проверяет обновление и пропуск привычек с теми же действием и местом"""
+        Habit.objects.create(user=self.user, action="бег", place="парк", reward="чай", periodicity=1)
+        rows = [
+            {"action": "бег", "place": "парк", "reward": "кофе", "periodicity": 2},
+            {"action": "бег", "place": "дом"},
+        ]
+
+        self.upload("habits.ndjson", ndjson(rows), on_conflict="skip")
+        self.assertEqual(Habit.objects.get(action="бег", place="парк").reward, "чай")
+
+        response = self.upload("habits.ndjson", ndjson(rows))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        habit = Habit.objects.get(action="бег", place="парк")
+        self.assertEqual((habit.reward, habit.periodicity), ("кофе", 2))
+        self.assertEqual(Habit.objects.filter(user=self.user).count(), 2)
+
+    def test_import_keeps_referenced_habit_pleasant(self):
+        """Проверяет, что обновление не делает неприятной привычку, на которую ссылаются другие привычки"""
+        pleasant = Habit.objects.create(user=self.user, action="кофе", place="дома", is_pleasant=True)
+        Habit.objects.create(user=self.user, action="бег", place="парк", related_habit=pleasant)
+        Habit.objects.create(user=self.user, action="чай", place="дома", is_pleasant=True)
+        rows = [
+            {"action": "кофе", "place": "дома", "reward": "печенье"},
+            {"action": "зарядка", "place": "дома", "related_action": "чай"},
+            {"action": "чай", "place": "дома", "reward": "печенье"},
+        ]
+
+        response = self.upload("habits.ndjson", ndjson(rows))
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [1, 3])
+        self.assertIn("is_pleasant", response.data["errors"][0]["errors"])
+        self.assertEqual(Habit.objects.filter(is_pleasant=True).count(), 2)
+
+    def test_import_invalid_request(self):
+        """Проверяет ошибки запроса: нет файла, неизвестный формат, все строки невалидны"""
+        self.assertEqual(self.client.post(self.url, {}, format="multipart").status_code, 400)
+        self.assertEqual(self.upload("habits.xml", b"<habits/>").status_code, 400)
+
+        response = self.upload("habits.ndjson", b"not json\n[1]\n")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [1, 2])
+
+    @override_settings(HABITS_IMPORT_MAX_ROWS=2)
+    def test_import_size_limits(self):
+        """Проверяет, что файл больше лимита строк отклоняется целиком, ничего не записывая"""
+        rows = [{"action": f"действие {i}", "place": "дома", "reward": "чай"} for i in range(3)]
+
+        with override_settings(HABITS_IMPORT_MAX_UPLOAD_SIZE=10):
+            self.assertEqual(self.upload("habits.ndjson", ndjson(rows[:1])).status_code, 400)
+        response = self.upload("habits.ndjson", ndjson(rows))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("file", response.data)
+        self.assertFalse(Habit.objects.exists())
+        self.assertEqual(self.upload("habits.ndjson", ndjson(rows[:2])).status_code, status.HTTP_201_CREATED)
+
+
+class ImportHabitsCommandTests(TestCase):
+    """Тестирует команду import_habits"""
+
+    def test_command(self):
+        """Проверяет импорт файла частями с выводом прогресса"""
+        user = CustomUser.objects.create_user(email="user@example.com", username="user", password="pass123")
+        rows = [{"id": 1, "action": "кофе", "place": "дома", "is_pleasant": True}]
+        rows += [{"action": f"бег {i}", "place": "парк", "related_habit": 1} for i in range(5)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "habits.ndjson")
+            with open(path, "wb") as file:
+                file.write(ndjson(rows))
+            stdout = StringIO()
+            call_command("import_habits", path, user="user@example.com", chunk_size=4, stdout=stdout)
+
+        self.assertEqual(Habit.objects.filter(user=user, related_habit__action="кофе").count(), 5)
+        output = stdout.getvalue()
+        self.assertIn("Строк: 6, импортировано: 6, ошибок: 0", output)
@@ -0,0 +1,103 @@
+from django.core.cache import cache
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from habits.models import Habit
+from users.models import CustomUser
+
+
+class PublicFeedCacheTests(APITestCase):
+    """Тестирует кэширование ленты публичных привычек"""
+
+    def setUp(self):
+        """Формирует тестовые данные"""
+        super().setUp()
+        cache.clear()
+
+        self.superuser = CustomUser.objects.create_superuser(
+            email="admin@test.com", username="admin", password="admin123", is_active=True
+        )
+        self.user = CustomUser.objects.create_user(
+            email="user@test.com", username="user", password="pass123", is_active=True
+        )
+        self.client_user = APIClient()
+        self.client_user.force_authenticate(user=self.user)
+        self.client_super = APIClient()
+        self.client_super.force_authenticate(user=self.superuser)
+
+        self.public_habit = Habit.objects.create(
+            user=self.user, action="public", place="дома", habit_time="09:00", reward="чай", is_public=True
+        )
+        self.private_habit = Habit.objects.create(
+            user=self.user, action="private", place="дома", habit_time="10:00", reward="чай"
+        )
+        self.url = reverse("habits:habits-public-habits")
+
+    def get_actions(self, **params):
+        """Возвращает действия привычек из ленты"""
+        response = self.client_user.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [habit["action"] for habit in response.data["results"]]
+
+    def get_stats(self):
+        """Возвращает счетчики кэша"""
+        return self.client_super.get(reverse("habits:habits-public-cache-stats")).data
+
+    def test_second_request_served_from_cache(self):
+        """Проверяет, что повторный запрос отдается из кэша без обращения к базе"""
+        self.get_actions()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_actions(), ["public"])
+        stats = self.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_pages_cached_per_query_params(self):
+        """Проверяет, что страницы с разными параметрами кэшируются отдельно"""
+        Habit.objects.create(user=self.user, action="second", place="дома", reward="чай", is_public=True)
+
+        self.assertEqual(self.get_actions(page_size=1), ["public"])
+        self.assertEqual(self.get_actions(page_size=1, page=2), ["second"])
+        self.assertEqual(self.get_stats()["misses"], 2)
+
+    def test_invalidated_when_public_habit_changes(self):
+        """Проверяет, что изменение публичной привычки сбрасывает кэш"""
+        self.get_actions()
+        self.public_habit.action = "renamed"
+        self.public_habit.save()
+
+        self.assertEqual(self.get_actions(), ["renamed"])
+
+    def test_invalidated_when_habit_becomes_private(self):
+        """Проверяет, что снятие признака публичности сбрасывает кэш"""
+        self.get_actions()
+        habit = Habit.objects.get(pk=self.public_habit.pk)
+        habit.is_public = False
+        habit.save()
+
+        self.assertEqual(self.get_actions(), [])
+
+    def test_invalidated_when_public_habit_deleted(self):
+        """Проверяет, что удаление публичной привычки сбрасывает кэш"""
+        self.get_actions()
+        self.public_habit.delete()
+
+        self.assertEqual(self.get_actions(), [])
+
+    def test_private_habit_change_keeps_cache(self):
+        """Проверяет, что изменение приватной привычки не сбрасывает кэш ленты"""
+        self.get_actions()
+        habit = Habit.objects.get(pk=self.private_habit.pk)
+        habit.place = "в парке"
+        habit.save()
+
+        with self.assertNumQueries(0):
+            self.get_actions()
+
+    def test_cache_stats_admin_only(self):
+        """Проверяет, что счетчики кэша доступны только администраторам"""
+        response = self.client_user.get(reverse("habits:habits-public-cache-stats"))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -1,10 +1,18 @@
+import random
 from datetime import datetime, time, timedelta, timezone as dt_timezone
 from unittest.mock import patch
 
-from django.test import TestCase
-
-from habits.models import Habit
-from habits.tasks import send_habit_reminder
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from habits.models import Habit, ReminderDelivery
+from habits.reminders import select_due_habits
+from habits.tasks import (
+    cleanup_reminder_deliveries,
+    collect_reminder_stats,
+    send_habit_reminder,
+    send_habit_reminder_shard,
+)
+from habits.tests.reminder_helpers import HabitStub, UserStub, legacy_select_due_habits
 from users.models import CustomUser
 
 
@@ -26,7 +34,7 @@ class HabitReminderTests(TestCase):
             reward="съесть конфету",
         )
 
-    @patch("habits.tasks.send_telegram_message.delay")
+    @patch("habits.tasks.send_telegram_batch.delay")
     def test_reminder_sent_at_correct_time(self, mock_delay):
         """Проверяет, что сообщение отправляется в нужный момент"""
         fake_now = datetime(2024, 1, 1, 7, 0, tzinfo=dt_timezone.utc)
@@ -36,7 +44,35 @@ class HabitReminderTests(TestCase):
 
         mock_delay.assert_called_once()
 
-    @patch("habits.tasks.send_telegram_message.delay")
+    @patch("habits.tasks.send_telegram_batch.delay")
+    def test_reminders_sent_in_one_batch(self, mock_delay):
+        """Проверяет, что напоминания одной минуты отправляются одной пачкой"""
+        other = CustomUser.objects.create_user(
+            email="other@test.com", username="other", password="pass123", tg_chat_id="222"
+        )
+        Habit.objects.create(user=other, action="Зарядка", place="дома", habit_time=time(10, 0), reward="чай")
+        fake_now = datetime(2024, 1, 1, 7, 0, tzinfo=dt_timezone.utc)
+
+        with patch("django.utils.timezone.now", return_value=fake_now):
+            send_habit_reminder()
+
+        mock_delay.assert_called_once()
+        chat_ids = sorted(chat_id for chat_id, *_ in mock_delay.call_args.args[0])
+        self.assertEqual(chat_ids, [111, 222])
+
+    @patch("habits.tasks.send_telegram_batch.delay")
+    def test_reminder_has_buttons(self, mock_delay):
+        """Проверяет, что напоминание отправляется с кнопками "Выполнено" и "Отложить" на локальную дату"""
+        fake_now = datetime(2024, 1, 1, 7, 0, tzinfo=dt_timezone.utc)
+
+        with patch("django.utils.timezone.now", return_value=fake_now):
+            send_habit_reminder()
+
+        [(_, _, keyboard)] = mock_delay.call_args.args[0]
+        buttons = [button["callback_data"] for button in keyboard["inline_keyboard"][0]]
+        self.assertEqual(buttons, [f"done:{self.habit.id}:2024-01-01", f"snooze:{self.habit.id}:2024-01-01"])
+
+    @patch("habits.tasks.send_telegram_batch.delay")
     def test_if_time_does_not_match(self, mock_delay):
         """Если время не совпало, ничего не отправляется"""
         fake_now = datetime(2024, 1, 1, 7, 1, tzinfo=dt_timezone.utc)
@@ -46,7 +82,7 @@ class HabitReminderTests(TestCase):
 
         mock_delay.assert_not_called()
 
-    @patch("habits.tasks.send_telegram_message.delay")
+    @patch("habits.tasks.send_telegram_batch.delay")
     def test_periodicity_respected(self, mock_delay):
         """Проверяет, что периодичность отправки считается корректно"""
         now_utc = datetime(2024, 1, 4, 7, 0, tzinfo=dt_timezone.utc)  # пример "сейчас" в UTC
@@ -61,3 +97,156 @@ class HabitReminderTests(TestCase):
             send_habit_reminder()
 
         mock_delay.assert_called_once()
+
+    def test_reminder_minute_in_utc(self):
+        """Проверяет, что при сохранении привычки вычисляется минута напоминания по UTC"""
+        self.assertEqual(self.habit.reminder_minute, 7 * 60)
+
+    def test_reminder_minute_updated_on_timezone_change(self):
+        """Проверяет, что при смене часового пояса пользователя пересчитываются минуты напоминаний"""
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.timezone = "Asia/Vladivostok"
+        user.save()
+
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.reminder_minute, 0)
+
+    @patch("habits.tasks.send_telegram_batch.delay")
+    def test_only_current_bucket_loaded(self, mock_delay):
+        """Проверяет, что задача загружает только привычки из текущей минуты"""
+        Habit.objects.create(
+            user=self.user, action="Прогулка", place="в парке", habit_time=time(18, 30), reward="кофе"
+        )
+        fake_now = datetime(2024, 1, 1, 7, 0, tzinfo=dt_timezone.utc)
+
+        with patch("django.utils.timezone.now", return_value=fake_now):
+            with self.assertNumQueries(3):
+                send_habit_reminder()
+
+        mock_delay.assert_called_once()
+
+    @patch("habits.tasks.send_telegram_batch.delay")
+    def test_overlapping_ticks_send_once(self, mock_delay):
+        """Проверяет, что повторный запуск той же минуты не отправляет напоминание второй раз"""
+        fake_now = datetime(2024, 1, 1, 7, 0, tzinfo=dt_timezone.utc)
+
+        with patch("django.utils.timezone.now", return_value=fake_now):
+            send_habit_reminder()
+            send_habit_reminder()
+
+        mock_delay.assert_called_once()
+        delivery = ReminderDelivery.objects.get(habit=self.habit)
+        self.assertEqual((str(delivery.local_date), delivery.minute), ("2024-01-01", 10 * 60))
+
+    @patch("habits.tasks.send_telegram_batch.delay")
+    def test_failed_enqueue_releases_claim(self, mock_delay):
+        """Проверяет, что если напоминание не удалось поставить в очередь отправки, повтор задачи его отправит"""
+        fake_now = datetime(2024, 1, 1, 7, 0, tzinfo=dt_timezone.utc)
+        mock_delay.side_effect = [ConnectionError, None]
+
+        with patch("django.utils.timezone.now", return_value=fake_now):
+            with self.assertRaises(ConnectionError):
+                send_habit_reminder()
+            self.assertFalse(ReminderDelivery.objects.exists())
+            send_habit_reminder()
+
+        self.assertEqual(mock_delay.call_count, 2)
+        self.assertTrue(ReminderDelivery.objects.filter(habit=self.habit).exists())
+
+    def test_cleanup_reminder_deliveries(self):
+        """Проверяет, что из журнала удаляются только устаревшие записи"""
+        old = ReminderDelivery.objects.create(habit=self.habit, local_date="2024-01-01", minute=600, run_id="old")
+        ReminderDelivery.objects.filter(pk=old.pk).update(created_at=datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+        ReminderDelivery.objects.create(habit=self.habit, local_date="2024-01-02", minute=600, run_id="new")
+
+        self.assertEqual(cleanup_reminder_deliveries(), 1)
+        self.assertEqual(list(ReminderDelivery.objects.values_list("run_id", flat=True)), ["new"])
+
+
+class HabitReminderShardingTests(TestCase):
+    """Тестирует распределение рассылки напоминаний по шардам"""
+
+    def setUp(self):
+        """Формирует тестовые данные: по привычке на 10:00 у нескольких пользователей"""
+        self.users = []
+        for i in range(5):
+            user = CustomUser.objects.create_user(
+                email=f"user{i}@test.com", username=f"user{i}", password="pass123", tg_chat_id=100 + i
+            )
+            Habit.objects.create(user=user, action="Зарядка", place="дома", habit_time=time(10, 0), reward="чай")
+            self.users.append(user)
+        self.now = datetime(2024, 1, 1, 7, 0, tzinfo=dt_timezone.utc).isoformat()
+
+    @override_settings(REMINDER_SHARDS=3)
+    @patch("habits.tasks.chord")
+    def test_coordinator_dispatches_shards(self, mock_chord):
+        """Проверяет, что координатор запускает группу задач по числу шардов и собирает их статистику"""
+        with patch("django.utils.timezone.now", return_value=datetime.fromisoformat(self.now)):
+            send_habit_reminder()
+
+        header = mock_chord.call_args.args[0]
+        self.assertEqual([task.args for task in header.tasks], [(self.now, shard, 3) for shard in range(3)])
+        callback = mock_chord.return_value.call_args.args[0]
+        self.assertEqual(callback.task, "habits.tasks.collect_reminder_stats")
+
+    @patch("habits.tasks.send_telegram_batch.delay")
+    def test_query_count_does_not_depend_on_reminders(self, mock_delay):
+        """Проверяет, что рассылка выполняет фиксированное число запросов независимо от числа напоминаний"""
+        for user in self.users:
+            pleasant = Habit.objects.create(
+                user=user, action="Послушать музыку", place="дома", habit_time=time(12, 0), is_pleasant=True
+            )
+            Habit.objects.create(
+                user=user, action="Отжимания", place="дома", habit_time=time(10, 0), related_habit=pleasant
+            )
+
+        with self.assertNumQueries(3):
+            result = send_habit_reminder_shard(self.now, 0, 1)
+
+        self.assertEqual(result["due"], 10)
+        messages = [message for call in mock_delay.call_args_list for _, message, _ in call.args[0]]
+        self.assertIn(
+            "Время выполнить привычку: Отжимания. Это займет всего 2 минуты — ты справишься! "
+            "А ещё тебя ждёт приятная привычка: Послушать музыку",
+            messages,
+        )
+
+    @patch("habits.tasks.send_telegram_batch.delay")
+    def test_shards_split_users(self, mock_delay):
+        """Проверяет, что каждый пользователь попадает ровно в один шард"""
+        results = [send_habit_reminder_shard(self.now, shard, 2) for shard in range(2)]
+
+        chat_ids = [chat_id for call in mock_delay.call_args_list for chat_id, *_ in call.args[0]]
+        self.assertEqual(sorted(chat_ids), [100, 101, 102, 103, 104])
+        self.assertEqual(sum(result["due"] for result in results), 5)
+        for call in mock_delay.call_args_list:
+            shards = {CustomUser.objects.get(tg_chat_id=chat_id).id % 2 for chat_id, *_ in call.args[0]}
+            self.assertEqual(len(shards), 1)
+
+    def test_collect_reminder_stats(self):
+        """Проверяет, что статистика шардов суммируется"""
+        stats = collect_reminder_stats(
+            [{"shard": 0, "due": 2, "elapsed": 0.5}, {"shard": 1, "due": 3, "elapsed": 1.5}], self.now
+        )
+
+        self.assertEqual(stats["due"], 5)
+        self.assertEqual(stats["max_elapsed"], 1.5)
+        self.assertEqual(stats["shard_timings"], {0: 0.5, 1: 1.5})
+
+
+class SelectDueHabitsTests(SimpleTestCase):
+    """Тестирует групповой отбор привычек по часовым поясам"""
+
+    def test_matches_per_row_selection(self):
+        """Проверяет, что групповой отбор совпадает с построчным вычислением через astimezone"""
+        rng = random.Random(0)
+        users = [UserStub(tz_name) for tz_name, _ in CustomUser.TIMEZONES]
+        now_utc = datetime(2024, 3, 10, 21, 30, tzinfo=dt_timezone.utc)
+        habits = [
+            HabitStub(rng.choice(users), now_utc - timedelta(seconds=rng.randrange(30 * 86400)), rng.randint(1, 7))
+            for _ in range(2000)
+        ]
+
+        expected = [(id(habit), user_now) for habit, user_now in legacy_select_due_habits(habits, now_utc)]
+        actual = [(id(habit), user_now) for habit, user_now in select_due_habits(habits, now_utc)]
+        self.assertCountEqual(actual, expected)
@@ -0,0 +1,99 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest.mock import patch
+
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from habits.completions import record_completions
+from habits.models import Habit, HabitCompletion, HabitStats, RollupWatermark
+from habits.stats import refresh_habit_stats
+from users.models import CustomUser
+
+TODAY = date(2025, 6, 10)
+NOW = datetime(2025, 6, 10, 9, 0, tzinfo=dt_timezone.utc)
+
+
+@patch("habits.views.get_local_date", return_value=TODAY)
+@patch("habits.stats.timezone.now", return_value=NOW)
+class HabitStatsTests(APITestCase):
+    """Тестирует роллап статистики выполнений и эндпоинты статистики"""
+
+    def setUp(self):
+        """Формирует тестовые данные: привычка на 08:00 по Москве, созданная задолго до сегодняшнего дня"""
+        self.user = CustomUser.objects.create_user(
+            email="user@example.com", username="user", password="pass123", is_active=True
+        )
+        self.habit = Habit.objects.create(user=self.user, action="бег", place="парк", reward="чай", habit_time="08:00")
+        self.other = Habit.objects.create(user=self.user, action="сон", place="дома", reward="чай", periodicity=2)
+        Habit.objects.update(created_at=datetime(2025, 1, 1, tzinfo=dt_timezone.utc))
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def complete(self, habit, days_ago, recorded_at=None):
+        """Записывает выполнение; recorded_at - время отметки (по умолчанию - задним числом)"""
+        day = TODAY - timedelta(days=days_ago)
+        record_completions([(habit.id, day)])
+        HabitCompletion.objects.filter(habit=habit, date=day).update(
+            created_at=recorded_at or NOW - timedelta(hours=1)
+        )
+
+    def test_refresh_is_incremental(self, *_):
+        """Проверяет, что роллап учитывает только новые записи журнала после позиции"""
+        for days_ago in range(1, 6):
+            self.complete(self.habit, days_ago)
+
+        self.assertEqual(refresh_habit_stats(lag=timedelta(0)), 5)
+        self.assertEqual(refresh_habit_stats(lag=timedelta(0)), 0)
+
+        self.complete(self.habit, 0)
+        self.complete(self.other, 0)
+        self.assertEqual(refresh_habit_stats(batch_size=1, lag=timedelta(0)), 2)
+
+        self.assertEqual(HabitStats.objects.get(habit=self.habit).completions, 6)
+        self.assertEqual(RollupWatermark.objects.get().last_id, HabitCompletion.objects.latest("id").id)
+
+    def test_refresh_skips_recent_records(self, *_):
+        """Проверяет, что записи моложе задержки учитываются при следующем запуске"""
+        self.complete(self.habit, 0, recorded_at=NOW)
+
+        self.assertEqual(refresh_habit_stats(lag=timedelta(seconds=10)), 0)
+        self.assertEqual(refresh_habit_stats(lag=timedelta(0)), 1)
+
+    def test_stats_endpoints(self, *_):
+        """Проверяет доли выполнений, лучший день недели и среднее опоздание"""
+        for days_ago in range(1, 6):
+            self.complete(self.habit, days_ago)
+        # Отмечено в день выполнения в 08:10 по Москве - опоздание 10 минут
+        self.complete(self.habit, 0, recorded_at=datetime(2025, 6, 10, 5, 10, tzinfo=dt_timezone.utc))
+        self.complete(self.other, 2)
+        refresh_habit_stats(lag=timedelta(0))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("habits:habits-user-stats"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["completions"], 7)
+        # Ожидается 7 выполнений ежедневной привычки и 4 - привычки раз в два дня
+        self.assertEqual(response.data["completion_rate"]["7"], round(7 / 11, 3))
+        self.assertEqual(response.data["best_weekday"], (TODAY - timedelta(days=2)).weekday())
+        self.assertEqual(response.data["average_delay_minutes"], 10)
+
+        response = self.client.get(reverse("habits:habits-habit-stats", args=[self.other.id]))
+
+        self.assertEqual(response.data["completion_rate"], {"7": 0.25, "30": round(1 / 15, 3), "90": round(1 / 45, 3)})
+        self.assertIsNone(response.data["average_delay_minutes"])
+
+    def test_stats_without_completions(self, *_):
+        """Проверяет статистику привычки без выполнений и доступ к чужой привычке"""
+        response = self.client.get(reverse("habits:habits-habit-stats", args=[self.habit.id]))
+
+        self.assertEqual(response.data["completions"], 0)
+        self.assertEqual(response.data["completion_rate"]["7"], 0)
+        self.assertIsNone(response.data["best_weekday"])
+
+        stranger = CustomUser.objects.create_user(email="stranger@example.com", username="stranger", password="pass")
+        self.client.force_authenticate(user=stranger)
+        response = self.client.get(reverse("habits:habits-habit-stats", args=[self.habit.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,189 @@
+import json
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from django.test import override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from habits.bot import (
+    DONE_ANSWER,
+    LINK_INVALID_MESSAGE,
+    LINKED_MESSAGE,
+    get_update_queue,
+    make_link_token,
+    read_link_token,
+)
+from habits.completions import record_completions
+from habits.models import Habit, HabitCompletion
+from habits.tasks import flush_telegram_completions, process_telegram_updates
+from users.models import CustomUser
+
+SECRET = "webhook-secret"
+DAY = date(2025, 6, 10)
+
+
+def start_update(update_id, chat_id, token):
+    return {"update_id": update_id, "message": {"chat": {"id": chat_id}, "text": f"/start {token}"}}
+
+
+def callback_update(update_id, chat_id, habit_id, action="done", day=DAY):
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": f"cb{update_id}",
+            "from": {"id": chat_id},
+            "message": {"chat": {"id": chat_id}, "text": "Время выполнить привычку", "reply_markup": {"k": 1}},
+            "data": f"{action}:{habit_id}:{day.isoformat()}",
+        },
+    }
+
+
+@override_settings(TELEGRAM_WEBHOOK_SECRET=SECRET, TELEGRAM_BOT_USERNAME="habits_bot")
+@patch("habits.tasks.send_telegram_batch.delay")
+@patch("habits.views.process_telegram_updates.apply_async")
+class TelegramWebhookTests(APITestCase):
+    """Тестирует webhook бота и пакетную обработку входящих обновлений"""
+
+    def setUp(self):
+        """Формирует тестовые данные и очищает очередь обновлений"""
+        self.user = CustomUser.objects.create_user(
+            email="user@example.com", username="user", password="pass123", tg_chat_id=100
+        )
+        self.habit = Habit.objects.create(user=self.user, action="бег", place="парк", reward="чай")
+        self.url = reverse("habits:telegram-webhook")
+        self.client = APIClient()
+        queue = get_update_queue()
+        queue.pop_batch(len(queue.items))
+        queue.pop_completions(len(queue.completions))
+        queue.failed_completions.clear()
+        queue.release()
+
+    def post(self, update, secret=SECRET):
+        return self.client.post(
+            self.url, json.dumps(update), content_type="application/json", HTTP_X_TELEGRAM_BOT_API_SECRET_TOKEN=secret
+        )
+
+    def test_secret_is_checked(self, apply_async, _):
+        """Проверяет, что обновления с неверным секретом не принимаются"""
+        response = self.post(callback_update(1, 100, self.habit.id), secret="wrong")
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(get_update_queue().pop_completions(10), [])
+        with override_settings(TELEGRAM_WEBHOOK_SECRET=None):
+            self.assertEqual(self.post({"update_id": 1}).status_code, status.HTTP_404_NOT_FOUND)
+        apply_async.assert_not_called()
+
+    def test_completions_are_coalesced(self, apply_async, send_batch):
+        """
+        Проверяет, что webhook сразу подтверждает нажатие "Выполнено", не ставя задачу на каждое нажатие,
+        а выполнения записываются пачкой: повторные нажатия схлопываются, чужие привычки пропускаются
+        """
+        other = Habit.objects.create(user=self.user, action="сон", place="дома", reward="чай")
+        stranger = CustomUser.objects.create_user(email="stranger@example.com", username="stranger", password="pass")
+        foreign = Habit.objects.create(user=stranger, action="баня", place="дома", reward="чай")
+
+        response = self.post(callback_update(1, 100, self.habit.id))
+        for update in (
+            callback_update(2, 100, self.habit.id),
+            callback_update(3, 100, other.id),
+            callback_update(4, 100, foreign.id),
+        ):
+            self.post(update)
+
+        self.assertEqual(
+            response.json(), {"method": "answerCallbackQuery", "callback_query_id": "cb1", "text": DONE_ANSWER}
+        )
+        apply_async.assert_not_called()
+        self.assertEqual(len(get_update_queue().completions), 3)
+        self.assertEqual(flush_telegram_completions(), 2)
+        self.assertEqual(
+            set(HabitCompletion.objects.values_list("habit_id", "date")), {(self.habit.id, DAY), (other.id, DAY)}
+        )
+        self.assertEqual(flush_telegram_completions(), 0)
+        send_batch.assert_not_called()
+
+    def test_future_completion_is_skipped(self, *_):
+        """Проверяет, что нажатие с датой в будущем не записывает выполнение"""
+        self.post(callback_update(1, 100, self.habit.id, day=date.today() + timedelta(days=2)))
+
+        self.assertEqual(flush_telegram_completions(), 0)
+        self.assertFalse(HabitCompletion.objects.exists())
+
+    def test_failed_flush_keeps_completions(self, *_):
+        """Проверяет, что при ошибке записи нажатия остаются в очереди до следующего запуска"""
+        self.post(callback_update(1, 100, self.habit.id))
+
+        with patch("habits.bot.record_completions", side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            with self.assertLogs("habits.tasks", "ERROR"):
+                flush_telegram_completions()
+
+        self.assertEqual(flush_telegram_completions(), 1)
+
+    def test_poison_completion_is_dead_lettered(self, *_):
+        """Проверяет, что нажатие, которое не удается записать, не блокирует запись остальных нажатий пачки"""
+        other = Habit.objects.create(user=self.user, action="сон", place="дома", reward="чай")
+        self.post(callback_update(1, 100, self.habit.id))
+        self.post(callback_update(2, 100, other.id))
+        queue = get_update_queue()
+        queue.add_completions(["100:not-a-habit:"])
+
+        def record(completions):
+            if completions[0][0] == other.id:
+                raise RuntimeError
+            return record_completions(completions)
+
+        with patch("habits.bot.record_completions", side_effect=record), self.assertLogs("habits.tasks", "ERROR"):
+            self.assertEqual(flush_telegram_completions(), 1)
+
+        self.assertEqual(queue.completions, set())
+        self.assertEqual(queue.failed_completions, {"100:not-a-habit:", f"100:{other.id}:{DAY.isoformat()}"})
+        self.assertEqual(list(HabitCompletion.objects.values_list("habit_id", flat=True)), [self.habit.id])
+
+    def test_failed_processing_keeps_updates(self, apply_async, send_batch):
+        """Проверяет, что при ошибке обработки пачка обновлений возвращается в очередь в прежнем порядке"""
+        self.post(callback_update(1, 100, self.habit.id, action="snooze"))
+        self.post(callback_update(2, 100, self.habit.id, action="snooze"))
+
+        with patch("habits.tasks.schedule_messages", side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            process_telegram_updates()
+
+        self.assertEqual([json.loads(update)["update_id"] for update in get_update_queue().items], [1, 2])
+        with patch("habits.tasks.schedule_messages"):
+            self.assertEqual(process_telegram_updates()["snoozed"], 2)
+
+    def test_snooze_resends_reminder(self, apply_async, send_batch):
+        """Проверяет, что "Отложить" ставит то же напоминание с теми же кнопками в очередь отложенных сообщений"""
+        response = self.post(callback_update(1, 100, self.habit.id, action="snooze"))
+
+        self.assertEqual(response.json()["text"], "Напомню через 10 мин")
+        apply_async.assert_called_once()
+        with patch("habits.tasks.schedule_messages") as schedule_messages:
+            self.assertEqual(process_telegram_updates()["snoozed"], 1)
+
+        schedule_messages.assert_called_once_with([(100, "Время выполнить привычку", {"k": 1})], delay=600)
+        self.assertFalse(HabitCompletion.objects.exists())
+
+    def test_start_links_chat(self, apply_async, send_batch):
+        """Проверяет привязку чата по ссылке из профиля и отказ по недействительному токену"""
+        self.client.force_authenticate(user=self.user)
+        url = self.client.get(reverse("users:users-telegram-link")).data["url"]
+        self.assertTrue(url.startswith("https://t.me/habits_bot?start="))
+        self.client.force_authenticate(user=None)
+
+        self.post(start_update(1, 200, url.split("=", 1)[1]))
+        self.post(start_update(2, 300, "1_abc_forged"))
+        process_telegram_updates()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.tg_chat_id, 200)
+        send_batch.assert_called_once_with([(300, LINK_INVALID_MESSAGE), (200, LINKED_MESSAGE)])
+
+    def test_link_token_expires(self, *_):
+        """Проверяет срок действия токена привязки"""
+        token = make_link_token(self.user, now=1_000_000)
+
+        self.assertEqual(read_link_token(token, now=1_000_000 + 60), self.user.id)
+        self.assertIsNone(read_link_token(token, now=1_000_000 + 2 * 60 * 60))
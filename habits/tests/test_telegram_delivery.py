@@ -0,0 +1,235 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from django.test import SimpleTestCase, override_settings
+
+from habits.telegram import AsyncTelegramSender, TelegramSender, TokenBucket, get_telegram_sender
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class StubTelegramServer:
+    """Локальная заглушка Telegram Bot API: принимает sendMessage и запоминает запросы"""
+
+    def __init__(self, failing_chat_ids=(), delay=0, throttled_chat_ids=()):
+        self.requests = []
+        self.connections = set()
+        self.failing_chat_ids = {str(chat_id) for chat_id in failing_chat_ids}
+        # Первый запрос в эти чаты получает 429 со страницей ошибки прокси вместо JSON
+        self.throttled_chat_ids = {str(chat_id) for chat_id in throttled_chat_ids}
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                data = {key: value[0] for key, value in parse_qs(self.rfile.read(length).decode()).items()}
+                stub.requests.append((self.path, data))
+                stub.connections.add(self.client_address)
+                with stub.lock:
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                time.sleep(stub.delay)
+                with stub.lock:
+                    stub.in_flight -= 1
+                content_type = "application/json"
+                if data["chat_id"] in stub.throttled_chat_ids:
+                    stub.throttled_chat_ids.discard(data["chat_id"])
+                    status, payload, content_type = 429, b"<html>Too Many Requests</html>", "text/html"
+                elif data["chat_id"] in stub.failing_chat_ids:
+                    status, payload = 400, json.dumps({"ok": False, "description": "Bad Request: chat not found"})
+                else:
+                    status, payload = 200, json.dumps({"ok": True})
+                payload = payload if isinstance(payload, bytes) else payload.encode()
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = StubHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/bot"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeClock:
+    """Управляемые часы: sleep сдвигает время вместо ожидания"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TokenBucketTests(SimpleTestCase):
+
+    def test_consume_until_empty(self):
+        """Проверяет, что токены расходуются и пополняются со временем"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, clock=clock)
+
+        self.assertEqual(bucket.consume(), 0)
+        self.assertEqual(bucket.consume(), 0)
+        self.assertAlmostEqual(bucket.consume(), 0.5)
+
+        clock.now += 0.5
+        self.assertEqual(bucket.consume(), 0)
+
+
+class TelegramSenderTests(SimpleTestCase):
+
+    def make_sender(self, url, clock, **kwargs):
+        options = {"global_rate": 1000, "per_chat_rate": 1, "timeout": 5, "pool_size": 2}
+        options.update(kwargs)
+        return TelegramSender(base_url=url, token="TOKEN", clock=clock, sleep=clock.sleep, **options)
+
+    def test_send_batch_over_pooled_session(self):
+        """Проверяет, что пачка уходит через одно keep-alive соединение и считается статистика"""
+        clock = FakeClock()
+        with StubTelegramServer() as stub:
+            report = self.make_sender(stub.url, clock).send_batch([(1, "a"), (2, "b"), (3, "c")])
+
+        self.assertEqual(report.sent, 3)
+        self.assertEqual(report.failed, 0)
+        self.assertEqual({data["chat_id"] for _, data in stub.requests}, {"1", "2", "3"})
+        self.assertEqual({path for path, _ in stub.requests}, {"/botTOKEN/sendMessage"})
+        self.assertEqual(len(stub.connections), 1)
+
+    def test_send_batch_counts_failures(self):
+        """Проверяет, что ошибки Telegram учитываются в отчете и не прерывают отправку"""
+        clock = FakeClock()
+        with StubTelegramServer(failing_chat_ids=[2]) as stub:
+            report = self.make_sender(stub.url, clock).send_batch([(1, "a"), (2, "b"), (3, "c")])
+
+        self.assertEqual(report.sent, 2)
+        self.assertEqual(report.failed, 1)
+        self.assertEqual(report.errors[0]["chat_id"], 2)
+        self.assertEqual(report.errors[0]["index"], 1)
+        self.assertFalse(report.errors[0]["retryable"])
+
+    def test_send_batch_with_keyboard(self):
+        """Проверяет, что кнопки сообщения передаются в reply_markup строкой JSON"""
+        keyboard = {"inline_keyboard": [[{"text": "Выполнено", "callback_data": "done:1:2024-01-01"}]]}
+        with StubTelegramServer() as stub:
+            report = self.make_sender(stub.url, FakeClock()).send_batch([(1, "a", keyboard), (2, "b")])
+
+        self.assertEqual(report.sent, 2)
+        self.assertEqual(json.loads(stub.requests[0][1]["reply_markup"]), keyboard)
+        self.assertNotIn("reply_markup", stub.requests[1][1])
+
+    def test_throttled_is_not_retried_in_worker(self):
+        """Проверяет, что 429 не повторяется внутри воркера, а попадает в отчет как ошибка для повтора задачей"""
+        with StubTelegramServer(throttled_chat_ids=[1]) as stub:
+            report = self.make_sender(stub.url, FakeClock()).send_batch([(1, "a")])
+
+        self.assertEqual(len(stub.requests), 1)
+        self.assertEqual((report.errors[0]["index"], report.errors[0]["retryable"]), (0, True))
+
+    def test_only_connect_errors_are_retried(self):
+        """Проверяет, что таймаут чтения не повторяется: Telegram мог уже принять сообщение"""
+        retry = self.make_sender("http://127.0.0.1/bot", FakeClock()).session.get_adapter("https://").max_retries
+
+        self.assertEqual((retry.connect, retry.read, retry.status), (3, 0, 0))
+        self.assertFalse(retry.status_forcelist)
+
+    def test_per_chat_limit_defers_messages(self):
+        """Проверяет, что второе сообщение в тот же чат откладывается, не задерживая остальные чаты"""
+        clock = FakeClock()
+        with StubTelegramServer() as stub:
+            report = self.make_sender(stub.url, clock).send_batch([(1, "a"), (1, "b"), (2, "c")])
+
+        self.assertEqual(report.sent, 3)
+        self.assertEqual([data["text"] for _, data in stub.requests], ["a", "c", "b"])
+        self.assertEqual(clock.sleeps, [1.0])
+
+    def test_global_limit(self):
+        """Проверяет, что глобальный лимит ограничивает скорость отправки"""
+        clock = FakeClock()
+        with StubTelegramServer() as stub:
+            report = self.make_sender(stub.url, clock, global_rate=2).send_batch([(i, "x") for i in range(6)])
+
+        self.assertEqual(report.sent, 6)
+        self.assertAlmostEqual(sum(clock.sleeps), 2.0)
+        self.assertAlmostEqual(report.throughput, 3.0)
+
+
+class AsyncTelegramSenderTests(SimpleTestCase):
+
+    def make_sender(self, url, concurrency):
+        return AsyncTelegramSender(
+            base_url=url, token="TOKEN", timeout=5, concurrency=concurrency, global_rate=1000, per_chat_rate=1
+        )
+
+    def test_concurrency_is_bounded(self):
+        """Проверяет, что одновременно выполняется не больше concurrency запросов"""
+        with StubTelegramServer(delay=0.05) as stub:
+            report = self.make_sender(stub.url, concurrency=4).send_batch([(i, "x") for i in range(20)])
+
+        self.assertEqual(report.sent, 20)
+        self.assertLessEqual(stub.max_in_flight, 4)
+        self.assertGreater(stub.max_in_flight, 1)
+
+    def test_throughput_scales_with_concurrency(self):
+        """Проверяет, что скорость отправки растет с лимитом конкурентности, а не ограничена задержкой сети"""
+        messages = [(i, "x") for i in range(10)]
+        with StubTelegramServer(delay=0.1) as stub:
+            sequential = self.make_sender(stub.url, concurrency=1).send_batch(messages)
+            concurrent = self.make_sender(stub.url, concurrency=10).send_batch(messages)
+
+        self.assertEqual(concurrent.sent, 10)
+        self.assertGreater(concurrent.throughput, sequential.throughput * 3)
+
+    def test_failures_reported(self):
+        """Проверяет, что ошибки Telegram попадают в отчет асинхронной отправки"""
+        with StubTelegramServer(failing_chat_ids=[1]) as stub:
+            report = self.make_sender(stub.url, concurrency=2).send_batch([(1, "a"), (2, "b")])
+
+        self.assertEqual(report.sent, 1)
+        self.assertEqual(report.failed, 1)
+        self.assertEqual(report.errors[0]["chat_id"], 1)
+        self.assertEqual((report.errors[0]["index"], report.errors[0]["retryable"]), (0, False))
+
+    def test_throttled_without_json_body(self):
+        """Проверяет, что 429 не в формате JSON не прерывает пачку: пауза берется из Retry-After, запрос повторяется"""
+        with StubTelegramServer(throttled_chat_ids=[1]) as stub:
+            report = self.make_sender(stub.url, concurrency=2).send_batch([(1, "a"), (2, "b")])
+
+        self.assertEqual((report.sent, report.failed), (2, 0))
+        self.assertEqual(len(stub.requests), 3)
+
+    @override_settings(TELEGRAM_SENDER="async")
+    def test_sender_selected_by_setting(self):
+        """Проверяет, что режим отправки выбирается настройкой TELEGRAM_SENDER"""
+        self.assertIsInstance(get_telegram_sender(), AsyncTelegramSender)
+        with override_settings(TELEGRAM_SENDER="sync"):
+            self.assertIsInstance(get_telegram_sender(), TelegramSender)
@@ -3,7 +3,7 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from habits.apps import HabitsConfig
-from habits.views import HabitsViewSet
+from habits.views import HabitsViewSet, telegram_webhook
 
 app_name = HabitsConfig.name
 
@@ -12,4 +12,5 @@ router.register(r"habits", HabitsViewSet, basename="habits")
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("telegram/webhook/", telegram_webhook, name="telegram-webhook"),
 ]
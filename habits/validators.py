@@ -1,45 +1,137 @@
+from dataclasses import dataclass
+from typing import Callable, NamedTuple
+
+from django.apps import apps
+
 from rest_framework import serializers
 
+HABIT_FIELDS = ("reward", "related_habit", "is_pleasant", "duration", "periodicity")
+
+
+@dataclass(frozen=True, slots=True)
+class HabitValues:
+    """Значения привычки, по которым проверяются правила. Приятность связанной привычки вычисляется один раз"""
+
+    reward: str | None
+    has_related: bool
+    related_is_pleasant: bool
+    is_pleasant: bool
+    duration: int | None
+    periodicity: int | None
+
+    @classmethod
+    def build(cls, values, related_is_pleasant=None):
+        """
+        Собирает значения из словаря полей. related_habit - привычка или ее id;
+        для id приятность передается в related_is_pleasant (см. HabitsValidator.validate_many)
+        """
+        related = values.get("related_habit")
+        if related_is_pleasant is None:
+            related_is_pleasant = bool(getattr(related, "is_pleasant", False))
+        return cls(
+            reward=values.get("reward"),
+            has_related=related is not None,
+            related_is_pleasant=related_is_pleasant,
+            is_pleasant=bool(values.get("is_pleasant")),
+            duration=values.get("duration"),
+            periodicity=values.get("periodicity"),
+        )
+
+    @classmethod
+    def from_instance(cls, habit):
+        """Значения сохраняемой модели"""
+        return cls.build(_instance_values(habit))
+
+    @classmethod
+    def from_attrs(cls, attrs, instance=None, related_is_pleasant=None):
+        """Значения из запроса поверх сохраненных значений привычки (для частичного обновления)"""
+        values = _instance_values(instance) if instance is not None else {}
+        return cls.build({**values, **attrs}, related_is_pleasant)
+
+
+def _instance_values(habit):
+    return {name: getattr(habit, name) for name in HABIT_FIELDS}
+
+
+def _is_related_id(value):
+    return value is not None and not hasattr(value, "is_pleasant")
+
+
+class HabitRule(NamedTuple):
+    """Правило привычки: нарушено, если violated(values) истинно"""
+
+    name: str
+    violated: Callable[[HabitValues], bool]
+    message: str
+
+
+HABIT_RULES = (
+    HabitRule(
+        "reward_and_related",
+        lambda v: bool(v.reward) and v.has_related,
+        "Нельзя указывать и вознаграждение, и связанную привычку одновременно",
+    ),
+    HabitRule(
+        "related_not_pleasant",
+        lambda v: v.has_related and not v.related_is_pleasant,
+        "Связанная привычка должна быть приятной",
+    ),
+    HabitRule(
+        "pleasant_with_reward",
+        lambda v: v.is_pleasant and (bool(v.reward) or v.has_related),
+        "Приятная привычка не может иметь вознаграждение или связанную привычку",
+    ),
+    HabitRule(
+        "duration",
+        lambda v: v.duration is not None and v.duration > 120,
+        "Время выполнения должно быть не больше 120 секунд",
+    ),
+    HabitRule(
+        "periodicity",
+        lambda v: v.periodicity is not None and not (1 <= v.periodicity <= 7),
+        "Периодичность должна быть от 1 до 7 дней",
+    ),
+)
+
+
+def check_habit_rules(values):
+    """Проверяет все правила за один проход. Возвращает сообщения нарушенных правил"""
+    return [rule.message for rule in HABIT_RULES if rule.violated(values)]
+
 
 class HabitsValidator:
-    """Класс-валидатор привычек"""
-
-    def validate_reward(self, attrs):
-        """Проверяет, что заполнено только одно поле из двух - или вознаграждение, или связанная привычка"""
-        if bool(attrs.get("reward")) == bool(attrs.get("related_habit")):
-            raise serializers.ValidationError("Нельзя указывать и вознаграждение, и связанную привычку одновременно")
-
-    def validate_related_habit(self, attrs):
-        """Проверяет, что связанная привычка является приятной"""
-        related = attrs.get("related_habit")
-        if related and not related.is_pleasant:
-            raise serializers.ValidationError("Связанная привычка должна быть приятной")
-
-    def validate_pleasant_habit(self, attrs):
-        """Проверяет, что приятная привычка не имеет вознаграждение или связанную привычку"""
-        if bool(attrs.get("is_pleasant")):
-            if attrs.get("reward") or attrs.get("related_habit"):
-                raise serializers.ValidationError(
-                    "Приятная привычка не может иметь вознаграждение или связанную привычку"
-                )
-
-    def validate_habit_duration(self, attrs):
-        """Проверяет, что время выполнения действия не превышает 120 секунд"""
-        time_success = attrs.get("time_success")
-        if time_success and time_success > 120:
-            raise serializers.ValidationError("Время выполнения не должно превышать 120 секунд")
-
-    def validate_habit_periodicity(self, attrs):
-        """Проверяет, что периодичность выполнения привычки от 1 до 7 дней"""
-        periodicity = attrs.get("periodicity")
-        if periodicity and not (1 <= periodicity <= 7):
-            raise serializers.ValidationError("Периодичность должна быть от 1 до 7 дней")
-
-    def __call__(self, attrs):
-        """Вызывает все валидаторы"""
-        self.validate_reward(attrs)
-        self.validate_related_habit(attrs)
-        self.validate_pleasant_habit(attrs)
-        self.validate_habit_duration(attrs)
-        self.validate_habit_periodicity(attrs)
+    """
+    Класс-валидатор привычек: проверяет таблицу правил HABIT_RULES (те же правила проверяет Habit.clean).
+    При частичном обновлении учитывает сохраненные значения привычки
+    """
+
+    requires_context = True
+
+    def __call__(self, attrs, serializer):
+        """Проверяет правила для значений из запроса поверх сохраненной привычки"""
+        errors = check_habit_rules(HabitValues.from_attrs(attrs, serializer.instance))
+        if errors:
+            raise serializers.ValidationError(errors)
         return attrs
+
+    @staticmethod
+    def validate_many(items, instances=None):
+        """
+        Проверяет правила для пачки значений привычек. items - словари полей (related_habit - привычка или id),
+        instances - сохраненные привычки для тех же индексов (None для новых).
+        Приятность связанных привычек, заданных id, загружается одним запросом.
+        Возвращает списки сообщений об ошибках для каждого элемента (пустой, если элемент валиден)
+        """
+        instances = instances or [None] * len(items)
+        related_ids = {item.get("related_habit") for item in items if _is_related_id(item.get("related_habit"))}
+        pleasant = {}
+        if related_ids:
+            habit_model = apps.get_model("habits", "Habit")
+            pleasant = dict(habit_model.objects.filter(id__in=related_ids).values_list("id", "is_pleasant"))
+
+        errors = []
+        for item, instance in zip(items, instances):
+            related = item.get("related_habit")
+            related_is_pleasant = pleasant.get(related, False) if _is_related_id(related) else None
+            errors.append(check_habit_rules(HabitValues.from_attrs(item, instance, related_is_pleasant)))
+        return errors
@@ -1,18 +1,43 @@
+import hmac
+import json
+import os
+
+from django.conf import settings
 from django.db.models import Q
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
-from rest_framework import viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import OrderingFilter
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
+from habits.bot import enqueue_update, webhook_answer
+from habits.bulk import bulk_create_habits, bulk_delete_habits, bulk_update_habits
+from habits.cache import get_public_feed_cache_stats, get_public_feed_page, public_feed_cache_key, set_public_feed_page
+from habits.completions import get_local_date, record_completions
+from habits.delayed import schedule_reminder
+from habits.export import export_response
+from habits.importer import ON_CONFLICT_CHOICES, READERS, count_lines, import_habits
 from habits.models import Habit
-from habits.paginators import HabitsPaginator
-from habits.serializers import HabitsSerializer
+from habits.paginators import HabitsCursorPaginator, HabitsPaginator, PublicHabitsCursorPaginator
+from habits.serializers import (
+    HabitCompletionSerializer,
+    HabitReminderSerializer,
+    HabitsSerializer,
+    HabitStreakSerializer,
+)
+from habits.stats import build_stats
+from habits.tasks import process_telegram_updates
+from monitoring.mixins import PerformanceMixin
 from users.permissions import IsOwner
 
 
-class HabitsViewSet(viewsets.ModelViewSet):
+class HabitsViewSet(PerformanceMixin, viewsets.ModelViewSet):
     """Вьюсет привычки"""
 
     queryset = Habit.objects.all()
@@ -21,30 +46,224 @@ class HabitsViewSet(viewsets.ModelViewSet):
     ordering_fields = ["periodicity", "habit_time"]
     pagination_class = HabitsPaginator
 
+    @property
+    def paginator(self):
+        """
+        Возвращает пагинатор: постраничный по умолчанию или курсорный (без подсчета общего количества),
+        если клиент передал ?pagination=cursor или курсор следующей страницы
+        """
+        if not hasattr(self, "_paginator"):
+            params = self.request.query_params
+            if params.get("pagination") == "cursor" or "cursor" in params:
+                if self.action == "public_habits":
+                    self._paginator = PublicHabitsCursorPaginator()
+                else:
+                    self._paginator = HabitsCursorPaginator()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_queryset(self):
         """
         Возвращает только привычки текущего пользователя.
-        Суперпользователь видит все привычки
+        Суперпользователь видит все привычки.
+        При изменении привычки сразу загружаются владелец и связанная привычка, которые нужны для проверки правил
+        и пересчета минуты напоминания
         """
         user = self.request.user
         if user.is_superuser:
-            return Habit.objects.all()
-        if user.is_authenticated:
-            return Habit.objects.filter(Q(user=user) | Q(is_public=True))
-        return Habit.objects.none()
+            queryset = Habit.objects.all()
+        elif user.is_authenticated:
+            queryset = Habit.objects.filter(Q(user=user) | Q(is_public=True))
+        else:
+            return Habit.objects.none()
+        if self.action == "habit_stats":
+            queryset = queryset.select_related("stats", "user")
+        if self.action == "remind":
+            queryset = queryset.select_related("user", "related_habit")
+        if self.action in ("update", "partial_update"):
+            queryset = queryset.select_related("user", "related_habit")
+        return queryset
 
     @action(detail=False, methods=["get"], url_path="public", permission_classes=[IsAuthenticated])
     def public_habits(self, request):
-        """Возвращает список публичных привычек всех пользователей для авторизованных пользователей"""
+        """
+        Возвращает список публичных привычек всех пользователей для авторизованных пользователей.
+        Лента одинакова для всех, поэтому сериализованные страницы кэшируются по набору параметров запроса
+        """
+        cache_key = None
+        if settings.CACHE_ENABLED:
+            cache_key = public_feed_cache_key(request)
+            data = get_public_feed_page(cache_key)
+            if data is not None:
+                return Response(data, status=200)
 
         queryset = Habit.objects.filter(is_public=True).order_by("action", "habit_time", "place")
 
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = HabitsSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = HabitsSerializer(queryset, many=True)
-        return Response(serializer.data, status=200)
+            serializer = self.get_serializer(page, many=True)
+            response = self.get_paginated_response(serializer.data)
+        else:
+            serializer = self.get_serializer(queryset, many=True)
+            response = Response(serializer.data, status=200)
+
+        if cache_key is not None:
+            set_public_feed_page(cache_key, response.data)
+        return response
+
+    @action(detail=False, methods=["get"], url_path="public/cache-stats", permission_classes=[IsAdminUser])
+    def public_cache_stats(self, request):
+        """Возвращает счетчики попаданий и промахов кэша ленты публичных привычек (для администраторов)"""
+        return Response(get_public_feed_cache_stats(), status=200)
+
+    @action(detail=True, methods=["post"], url_path="complete")
+    def complete(self, request, pk=None):
+        """
+        Отмечает выполнение своей привычки за локальную дату (date, по умолчанию - сегодня) и возвращает серии.
+        Статус 201, если выполнение записано, 200 - если за эту дату оно уже было
+        """
+        habit = self.get_object()
+        today = get_local_date(request.user)
+        serializer = HabitCompletionSerializer(data=request.data, context={"today": today})
+        serializer.is_valid(raise_exception=True)
+        day = serializer.validated_data.get("date", today)
+
+        habits, created = record_completions([(habit.id, day)])
+
+        data = HabitStreakSerializer(habits[habit.id], context={"today": today}).data
+        return Response(data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    @action(detail=True, methods=["post"], url_path="remind")
+    def remind(self, request, pk=None):
+        """
+        Планирует разовое напоминание о своей привычке в момент remind_at (с точностью до секунды).
+        Напоминание приходит в привязанный чат Telegram с кнопками "Выполнено" и "Отложить"
+        """
+        habit = self.get_object()
+        serializer = HabitReminderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if not habit.user.tg_chat_id:
+            raise ValidationError({"detail": "Привяжите Telegram, чтобы получать напоминания"})
+        schedule_reminder(habit, serializer.validated_data["remind_at"])
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=["get"], url_path="streaks")
+    def streaks(self, request):
+        """Возвращает серии выполнений своих привычек (сохраненные значения, без чтения журнала выполнений)"""
+        queryset = (
+            Habit.objects.filter(user=request.user)
+            .only("id", "action", "periodicity", "current_streak", "longest_streak", "last_completed_date")
+            .order_by("id")
+        )
+        context = {"today": get_local_date(request.user)}
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(HabitStreakSerializer(page, many=True, context=context).data)
+        return Response(HabitStreakSerializer(queryset, many=True, context=context).data)
+
+    @action(detail=False, methods=["get"], url_path="stats", url_name="user-stats")
+    def user_stats(self, request):
+        """Возвращает статистику выполнений всех своих привычек (из роллапа, без чтения журнала выполнений)"""
+        user = request.user
+        habits = Habit.objects.filter(user=user).select_related("stats").order_by()
+        return Response(build_stats(habits, get_local_date(user), user.timezone))
+
+    @action(detail=True, methods=["get"], url_path="stats", url_name="habit-stats")
+    def habit_stats(self, request, pk=None):
+        """Возвращает статистику выполнений своей привычки (из роллапа, без чтения журнала выполнений)"""
+        habit = self.get_object()
+        owner = habit.user
+        return Response({"id": habit.id, **build_stats([habit], get_local_date(owner), owner.timezone)})
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """
+        Потоково выгружает все доступные пользователю привычки (те же, что в списке) без пагинации.
+        Формат задается параметром export_format: ndjson (по умолчанию) или csv
+        """
+        return export_response(self.get_queryset(), request.query_params.get("export_format", "ndjson"), "habits")
+
+    @action(detail=False, methods=["get"], url_path="public/export", permission_classes=[IsAuthenticated])
+    def public_export(self, request):
+        """Потоково выгружает все публичные привычки (формат - как в export)"""
+        queryset = Habit.objects.filter(is_public=True)
+        return export_response(queryset, request.query_params.get("export_format", "ndjson"), "public_habits")
+
+    @action(detail=False, methods=["post"], url_path="import", url_name="import", parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        """
+        Импортирует привычки текущего пользователя из загруженного файла (поле file) в формате NDJSON или CSV
+        (import_format, по умолчанию - по расширению файла). Файл читается построчно, привычки записываются частями;
+        совпадающие по действию и месту привычки обновляются (on_conflict=update) или пропускаются (skip).
+        Возвращает отчет с ошибками по номерам строк: статус 207, если часть строк не импортирована, 400 - если все.
+        Импорт идет внутри запроса, поэтому файл ограничен HABITS_IMPORT_MAX_UPLOAD_SIZE и HABITS_IMPORT_MAX_ROWS
+        строками; большие файлы импортируются командой import_habits
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": ["Загрузите файл NDJSON или CSV"]})
+        import_format = request.data.get("import_format") or os.path.splitext(upload.name)[1].lstrip(".").lower()
+        if import_format not in READERS:
+            raise ValidationError({"import_format": [f"Допустимые форматы: {', '.join(READERS)}"]})
+        on_conflict = request.data.get("on_conflict", "update")
+        if on_conflict not in ON_CONFLICT_CHOICES:
+            raise ValidationError({"on_conflict": [f"Допустимые значения: {', '.join(ON_CONFLICT_CHOICES)}"]})
+        # Заголовок CSV строкой привычки не считается
+        max_lines = settings.HABITS_IMPORT_MAX_ROWS + (1 if import_format == "csv" else 0)
+        if upload.size > settings.HABITS_IMPORT_MAX_UPLOAD_SIZE or count_lines(upload.file) > max_lines:
+            raise ValidationError(
+                {
+                    "file": [
+                        f"Не больше {settings.HABITS_IMPORT_MAX_ROWS} строк и "
+                        f"{settings.HABITS_IMPORT_MAX_UPLOAD_SIZE // (1024 * 1024)} МБ за один запрос"
+                    ]
+                }
+            )
+
+        report = import_habits(request.user, upload.file, import_format, on_conflict=on_conflict)
+
+        if not report.failed:
+            response_status = status.HTTP_201_CREATED
+        elif report.imported:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(report.as_dict(), status=response_status)
+
+    @action(detail=False, methods=["post", "patch", "delete"], url_path="bulk")
+    def bulk(self, request):
+        """
+        Пакетная операция над списком привычек (не больше HABITS_BULK_MAX_ITEMS):
+        POST - создание, PATCH - частичное обновление (элементы с id), DELETE - удаление (список id).
+        Список валидируется за один проход и записывается одной транзакцией; невалидные элементы не записываются
+        и возвращаются в errors с индексом. Статус 207, если часть элементов не прошла валидацию, 400 - если все
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError({"non_field_errors": ["Ожидается непустой список"]})
+        if len(items) > settings.HABITS_BULK_MAX_ITEMS:
+            raise ValidationError(
+                {"non_field_errors": [f"Не больше {settings.HABITS_BULK_MAX_ITEMS} элементов за один запрос"]}
+            )
+
+        if request.method == "POST":
+            result, success_status = bulk_create_habits(request.user, items), status.HTTP_201_CREATED
+        elif request.method == "PATCH":
+            result, success_status = bulk_update_habits(request.user, items), status.HTTP_200_OK
+        else:
+            result, success_status = bulk_delete_habits(request.user, items), status.HTTP_200_OK
+
+        results = result.results
+        if request.method != "DELETE":
+            results = self.get_serializer(results, many=True).data
+        if not result.errors:
+            response_status = success_status
+        elif result.results:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({"results": results, "errors": result.errors}, status=response_status)
 
     def perform_create(self, serializer):
         """При создании привычки устанавливает пользователя как владельца"""
@@ -60,6 +279,36 @@ class HabitsViewSet(viewsets.ModelViewSet):
 
         if self.request.user.is_superuser:
             return []
-        if self.action in ["retrieve", "update", "partial_update", "destroy"]:
+        if self.action == "public_cache_stats":
+            return [IsAdminUser()]
+        if self.action in ["retrieve", "update", "partial_update", "destroy", "complete", "habit_stats", "remind"]:
             return [IsAuthenticated(), IsOwner()]
         return [IsAuthenticated()]
+
+
+@csrf_exempt
+@require_POST
+def telegram_webhook(request):
+    """
+    Принимает обновления бота от Telegram: проверяет секрет из заголовка X-Telegram-Bot-Api-Secret-Token,
+    кладет обновление в очередь и сразу отвечает. Обработка - пачками задачей process_telegram_updates,
+    которая ставится не чаще раза в TELEGRAM_UPDATES_BATCH_DELAY секунд; нажатия "Выполнено" записываются
+    в базу периодической задачей flush_telegram_completions
+    """
+    secret = settings.TELEGRAM_WEBHOOK_SECRET
+    if not secret:
+        return HttpResponseNotFound()
+    if not hmac.compare_digest(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), secret):
+        return HttpResponseForbidden()
+    try:
+        update = json.loads(request.body)
+    except ValueError:
+        return HttpResponse()
+    if not isinstance(update, dict):
+        return HttpResponse()
+
+    if enqueue_update(request.body, update):
+        process_telegram_updates.apply_async(countdown=settings.TELEGRAM_UPDATES_BATCH_DELAY)
+
+    answer = webhook_answer(update)
+    return JsonResponse(answer) if answer else HttpResponse()
@@ -0,0 +1,302 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    """Экранирует значение метки для текстового формата Prometheus"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Базовая метрика: значения хранятся в словаре по кортежу значений меток"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.registry = registry if registry is not None else REGISTRY
+        self.registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: ожидались метки {self.labelnames}, получены {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def describe(self):
+        """Возвращает описание метрики для файла процесса"""
+        return {"kind": self.kind, "documentation": self.documentation, "labelnames": list(self.labelnames)}
+
+
+class Counter(Metric):
+    """Монотонно растущий счетчик"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        self.registry.changed()
+
+    @staticmethod
+    def merge(left, right):
+        return left + right
+
+    def samples(self, values, data):
+        for key, value in sorted(values.items()):
+            yield self.name + "_total", list(zip(data["labelnames"], key)), value
+
+
+class Histogram(Metric):
+    """Гистограмма: количество наблюдений по корзинам (не накопительно), сумма и количество"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def describe(self):
+        return {**super().describe(), "buckets": list(self.buckets)}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.registry.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+        self.registry.changed()
+
+    @contextmanager
+    def time(self, **labels):
+        """Замеряет длительность блока в секундах"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    @staticmethod
+    def merge(left, right):
+        return [a + b for a, b in zip(left, right)]
+
+    def samples(self, values, data):
+        buckets = list(data.get("buckets", self.buckets)) + [float("inf")]
+        for key, state in sorted(values.items()):
+            labels = list(zip(data["labelnames"], key))
+            cumulative = 0
+            for le, count in zip(buckets, state):
+                cumulative += count
+                yield self.name + "_bucket", labels + [("le", _format_value(float(le)))], cumulative
+            yield self.name + "_sum", labels, state[-1]
+            yield self.name + "_count", labels, cumulative
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса. Если задана настройка METRICS_MULTIPROC_DIR, каждый процесс (воркер gunicorn,
+    процесс Celery) не чаще раза в METRICS_FLUSH_INTERVAL секунд сохраняет свои значения в отдельный файл
+    каталога, а /metrics суммирует файлы всех процессов. Без каталога отдаются метрики текущего процесса
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.flushed_at = 0.0
+        # pid, для которого уже проверен файл, оставшийся от завершившегося процесса с тем же pid
+        self.pid = None
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self.metrics[metric.name] = metric
+
+    @property
+    def directory(self):
+        return getattr(settings, "METRICS_MULTIPROC_DIR", None)
+
+    def process_file(self):
+        """Файл метрик текущего процесса (имя хоста нужно, если каталог общий у нескольких контейнеров)"""
+        return os.path.join(self.directory, f"{socket.gethostname()}_{os.getpid()}.json")
+
+    def own_file(self):
+        """
+        Файл метрик текущего процесса. Файл, найденный при первом обращении процесса, остался от завершившегося
+        процесса с тем же pid: его значения добавляются к значениям текущего, чтобы счетчики не уменьшались
+        """
+        path = self.process_file()
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self._adopt(path)
+        return path
+
+    def _adopt(self, path):
+        """Добавляет к значениям процесса значения из файла"""
+        try:
+            with open(path) as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            return
+        with self.lock:
+            for name, data in snapshot.items():
+                metric = self.metrics.get(name)
+                if (
+                    metric is None
+                    or {key: value for key, value in data.items() if key != "values"} != metric.describe()
+                ):
+                    continue
+                for key, value in data["values"]:
+                    key = tuple(key)
+                    metric.values[key] = metric.merge(metric.values[key], value) if key in metric.values else value
+
+    def clear(self):
+        """
+        Удаляет файлы метрик этого хоста, оставшиеся от прошлого запуска, чтобы каталог не рос.
+        Вызывается при старте мастер-процесса gunicorn и воркера Celery
+        """
+        if not self.directory:
+            return
+        for path in glob.glob(os.path.join(self.directory, f"{glob.escape(socket.gethostname())}_*.json")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+
+    def snapshot(self):
+        """Возвращает значения всех метрик процесса в сериализуемом виде"""
+        with self.lock:
+            return {
+                name: {
+                    **metric.describe(),
+                    "values": [
+                        [list(key), list(value) if isinstance(value, list) else value]
+                        for key, value in metric.values.items()
+                    ],
+                }
+                for name, metric in self.metrics.items()
+            }
+
+    def changed(self):
+        """Сохраняет значения в файл процесса, если с прошлого сохранения прошло достаточно времени"""
+        if self.directory and time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Атомарно записывает значения процесса в его файл"""
+        directory = self.directory
+        if not directory:
+            return
+        self.flushed_at = time.monotonic()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = self.own_file()
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as file:
+                json.dump(self.snapshot(), file)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Не удалось сохранить метрики процесса: %s", e)
+
+    def collect(self):
+        """Собирает значения метрик всех процессов: {name: (описание, {ключ меток: значение})}"""
+        own_file = self.own_file() if self.directory else None
+        snapshots = [self.snapshot()]
+        if own_file:
+            for path in glob.glob(os.path.join(self.directory, "*.json")):
+                if path == own_file:
+                    continue
+                try:
+                    with open(path) as file:
+                        snapshots.append(json.load(file))
+                except (OSError, ValueError):
+                    continue
+
+        collected = {}
+        for snapshot in snapshots:
+            for name, data in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None or data["kind"] != metric.kind:
+                    continue
+                _, values = collected.setdefault(name, (data, {}))
+                for key, value in data["values"]:
+                    key = tuple(key)
+                    values[key] = metric.merge(values[key], value) if key in values else value
+        return collected
+
+    def expose(self):
+        """Возвращает метрики в текстовом формате Prometheus"""
+        lines = []
+        collected = self.collect()
+        for name, metric in self.metrics.items():
+            data, values = collected.get(name, (metric.describe(), {}))
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for sample_name, labels, value in metric.samples(values, data):
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+atexit.register(REGISTRY.flush)
+
+REMINDER_TICK_SECONDS = Histogram(
+    "habit_reminder_tick_seconds", "Длительность обработки шарда минуты рассылки напоминаний", ["shard"]
+)
+REMINDER_LAG_SECONDS = Histogram(
+    "habit_reminder_lag_seconds",
+    "Отставание окончания обработки шарда от начала минуты рассылки (больше 60 - рассылка не успевает)",
+    ["shard"],
+    buckets=(1, 5, 10, 20, 30, 45, 60, 90, 120, 300),
+)
+REMINDER_DUE_HABITS = Histogram(
+    "habit_reminder_due_habits",
+    "Количество напоминаний за одну минуту рассылки",
+    buckets=(0, 10, 100, 500, 1000, 5000, 10000, 50000, 100000),
+)
+TELEGRAM_MESSAGES = Counter("telegram_messages", "Сообщения, отправленные в Telegram", ["status"])
+TELEGRAM_REQUEST_SECONDS = Histogram(
+    "telegram_request_seconds", "Длительность запроса sendMessage к Telegram Bot API", ["sender"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Длительность обработки HTTP-запросов API", ["route", "method", "status"]
+)
+CELERY_TASK_SECONDS = Histogram(
+    "celery_task_duration_seconds",
+    "Длительность выполнения Celery-задач",
+    ["task", "state"],
+    buckets=DEFAULT_BUCKETS + (30, 60, 120),
+)
+CELERY_TASK_FAILURES = Counter("celery_task_failures", "Celery-задачи, завершившиеся ошибкой", ["task"])
@@ -0,0 +1,62 @@
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from monitoring.metrics import HTTP_REQUEST_SECONDS
+from monitoring.perf import RequestPerf, activate_perf
+
+logger = logging.getLogger("monitoring.requests")
+
+
+class PerformanceMiddleware:
+    """
+    Замеряет запросы, попавшие в выборку (PERFORMANCE_SAMPLE_RATE): общее время, количество и время запросов
+    к базе и этапы обработки DRF (см. PerformanceMixin). Результат отдается в заголовке Server-Timing
+    и пишется структурированной строкой JSON в лог monitoring.requests.
+    Запросы вне выборки не замеряются вовсе, поэтому middleware можно оставлять включенным в продакшене
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = settings.PERFORMANCE_SAMPLE_RATE
+        if sample_rate <= 0 or (sample_rate < 1 and random.random() >= sample_rate):
+            return self.get_response(request)
+
+        perf = RequestPerf()
+        with activate_perf(perf), connection.execute_wrapper(perf):
+            response = self.get_response(request)
+        perf.finish()
+
+        if settings.PERFORMANCE_SERVER_TIMING:
+            response["Server-Timing"] = perf.server_timing()
+
+        record = {"method": request.method, "path": request.path, "status": response.status_code, **perf.as_dict()}
+        if record["view"] is None and request.resolver_match is not None:
+            record["view"] = request.resolver_match.view_name
+        logger.info(json.dumps(record, ensure_ascii=False), extra={"perf": record})
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Записывает длительность каждого запроса в гистограмму http_request_duration_seconds.
+    Маршрут берется по имени URL (например, habits:habits-list), чтобы число меток не зависело от id в пути
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        route = request.resolver_match.view_name if request.resolver_match is not None else "unmatched"
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started, route=route, method=request.method, status=response.status_code
+        )
+        return response
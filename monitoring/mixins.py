@@ -0,0 +1,82 @@
+from functools import lru_cache
+
+from rest_framework.serializers import ListSerializer
+
+from monitoring.perf import get_current_perf, timed
+
+
+class TimedSerializerMixin:
+    """Замеряет валидацию (is_valid, включая валидаторы привычек) и сериализацию (data) текущего запроса"""
+
+    def is_valid(self, *args, **kwargs):
+        with timed("validate"):
+            return super().is_valid(*args, **kwargs)
+
+    @property
+    def data(self):
+        with timed("serialize"):
+            return super().data
+
+
+@lru_cache(maxsize=None)
+def timed_serializer_class(serializer_class):
+    """
+    Возвращает подкласс сериализатора с замерами (в том числе для many=True).
+    Имя класса сохраняется, чтобы не менялись имена схем в документации API
+    """
+    attrs = {"__module__": serializer_class.__module__, "__qualname__": serializer_class.__qualname__}
+    meta = getattr(serializer_class, "Meta", None)
+    if meta is not None:
+        list_class = getattr(meta, "list_serializer_class", ListSerializer)
+        timed_list = type(list_class.__name__, (TimedSerializerMixin, list_class), {})
+        attrs["Meta"] = type("Meta", (meta,), {"list_serializer_class": timed_list})
+    return type(serializer_class.__name__, (TimedSerializerMixin, serializer_class), attrs)
+
+
+class TimedRenderer:
+    """Обертка рендерера ответа, замеряющая рендеринг (например, кодирование JSON)"""
+
+    def __init__(self, renderer):
+        self.renderer = renderer
+
+    def __getattr__(self, name):
+        return getattr(self.renderer, name)
+
+    def render(self, *args, **kwargs):
+        with timed("render"):
+            return self.renderer.render(*args, **kwargs)
+
+
+class PerformanceMixin:
+    """
+    Миксин представлений DRF для PerformanceMiddleware: подписывает замеры именем представления и действием
+    и замеряет аутентификацию (JWT), валидацию, сериализацию и рендеринг ответа
+    """
+
+    def initial(self, request, *args, **kwargs):
+        perf = get_current_perf()
+        if perf is not None:
+            perf.view = type(self).__name__
+            perf.action = getattr(self, "action", None) or request.method.lower()
+        super().initial(request, *args, **kwargs)
+
+    def perform_authentication(self, request):
+        with timed("auth"):
+            super().perform_authentication(request)
+
+    def get_serializer(self, *args, **kwargs):
+        """
+        Создает сериализатор с замерами. Класс подменяется здесь, а не в get_serializer_class,
+        чтобы замеры работали и в представлениях, переопределяющих get_serializer_class без super()
+        """
+        serializer_class = self.get_serializer_class()
+        if get_current_perf() is not None:
+            serializer_class = timed_serializer_class(serializer_class)
+        kwargs.setdefault("context", self.get_serializer_context())
+        return serializer_class(*args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if get_current_perf() is not None and getattr(response, "accepted_renderer", None) is not None:
+            response.accepted_renderer = TimedRenderer(response.accepted_renderer)
+        return response
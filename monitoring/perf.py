@@ -0,0 +1,88 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current_perf = ContextVar("request_perf", default=None)
+
+
+class RequestPerf:
+    """
+    Замеры одного запроса: общее время, количество и время запросов к базе, время этапов обработки
+    (аутентификация, валидация, сериализация, рендеринг). Экземпляр служит и обработчиком execute_wrapper
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.phases = {}
+        self.view = None
+        self.action = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """Считает запросы к базе и время их выполнения"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.db_queries += 1
+
+    def add(self, phase, seconds):
+        """Добавляет время к этапу обработки"""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def finish(self):
+        """Фиксирует общее время запроса"""
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Возвращает значение заголовка Server-Timing (длительности в миллисекундах)"""
+        metrics = [
+            f"total;dur={self.total * 1000:.1f}",
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"',
+        ]
+        metrics += [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in self.phases.items()]
+        return ", ".join(metrics)
+
+    def as_dict(self):
+        """Возвращает замеры для структурированного лога"""
+        record = {
+            "view": self.view,
+            "action": self.action,
+            "total_ms": round(self.total * 1000, 2),
+            "db_queries": self.db_queries,
+            "db_ms": round(self.db_time * 1000, 2),
+        }
+        record.update({f"{phase}_ms": round(seconds * 1000, 2) for phase, seconds in self.phases.items()})
+        return record
+
+
+def get_current_perf():
+    """Возвращает замеры текущего запроса или None, если запрос не попал в выборку"""
+    return _current_perf.get()
+
+
+@contextmanager
+def activate_perf(perf):
+    """Делает замеры текущими на время обработки запроса"""
+    token = _current_perf.set(perf)
+    try:
+        yield perf
+    finally:
+        _current_perf.reset(token)
+
+
+@contextmanager
+def timed(phase):
+    """Замеряет этап обработки текущего запроса; вне выборки ничего не делает"""
+    perf = _current_perf.get()
+    if perf is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        perf.add(phase, time.perf_counter() - started)
@@ -0,0 +1,39 @@
+import time
+
+from celery.signals import task_failure, task_postrun, task_prerun, worker_init, worker_process_shutdown
+
+from monitoring.metrics import CELERY_TASK_FAILURES, CELERY_TASK_SECONDS, REGISTRY
+
+_task_started = {}
+
+
+@task_prerun.connect
+def task_started(task_id=None, **kwargs):
+    """Запоминает время начала Celery-задачи"""
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def task_finished(task_id=None, task=None, state=None, **kwargs):
+    """Записывает длительность Celery-задачи"""
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_SECONDS.observe(time.perf_counter() - started, task=task.name, state=state or "UNKNOWN")
+
+
+@task_failure.connect
+def task_failed(sender=None, **kwargs):
+    """Считает Celery-задачи, завершившиеся ошибкой"""
+    CELERY_TASK_FAILURES.inc(task=sender.name)
+
+
+@worker_process_shutdown.connect
+def worker_process_stopped(**kwargs):
+    """Сохраняет метрики процесса Celery перед его завершением"""
+    REGISTRY.flush()
+
+
+@worker_init.connect
+def worker_started(**kwargs):
+    """Удаляет файлы метрик прошлого запуска воркера Celery"""
+    REGISTRY.clear()
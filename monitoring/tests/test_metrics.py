@@ -0,0 +1,134 @@
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from habits.tasks import send_telegram_message
+from monitoring.metrics import Counter, Histogram, MetricsRegistry
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    """Тестирует реестр метрик и текстовый формат Prometheus"""
+
+    def make_registry(self):
+        registry = MetricsRegistry()
+        counter = Counter("messages", "Сообщения", ["status"], registry=registry)
+        histogram = Histogram("tick_seconds", "Длительность тика", buckets=(0.1, 1), registry=registry)
+        return registry, counter, histogram
+
+    def test_expose(self):
+        """Проверяет счетчики и накопительные корзины гистограммы"""
+        registry, counter, histogram = self.make_registry()
+        counter.inc(status="sent")
+        counter.inc(2, status="sent")
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        text = registry.expose()
+
+        self.assertIn("# TYPE messages counter", text)
+        self.assertIn('messages_total{status="sent"} 3', text)
+        self.assertIn('tick_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('tick_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn('tick_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn("tick_seconds_sum 5.55", text)
+        self.assertIn("tick_seconds_count 3", text)
+
+    def test_wrong_labels(self):
+        """Проверяет, что метрика не принимает неизвестные метки"""
+        _, counter, _ = self.make_registry()
+
+        with self.assertRaises(ValueError):
+            counter.inc(chat="1")
+
+    def test_processes_are_aggregated(self):
+        """Проверяет, что значения из файлов других процессов суммируются со значениями текущего процесса"""
+        other, other_counter, other_histogram = self.make_registry()
+        other_counter.inc(5, status="sent")
+        other_histogram.observe(0.5)
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROC_DIR=directory):
+            with open(os.path.join(directory, "worker_1.json"), "w") as file:
+                json.dump(other.snapshot(), file)
+
+            registry, counter, histogram = self.make_registry()
+            counter.inc(status="sent")
+            counter.inc(status="failed")
+            histogram.observe(0.05)
+            registry.flush()
+            text = registry.expose()
+
+            self.assertEqual(len(os.listdir(directory)), 2)
+
+        self.assertIn('messages_total{status="sent"} 6', text)
+        self.assertIn('messages_total{status="failed"} 1', text)
+        self.assertIn('tick_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn("tick_seconds_count 2", text)
+
+    def test_reused_pid_keeps_counters(self):
+        """Проверяет, что процесс, получивший pid завершившегося процесса, продолжает его счетчики"""
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROC_DIR=directory):
+            dead, dead_counter, _ = self.make_registry()
+            dead_counter.inc(5, status="sent")
+            dead.flush()
+
+            registry, counter, _ = self.make_registry()
+            counter.inc(status="sent")
+            text = registry.expose()
+            registry.flush()
+            with open(registry.process_file()) as file:
+                saved = json.load(file)
+
+        self.assertIn('messages_total{status="sent"} 6', text)
+        self.assertEqual(saved["messages"]["values"], [[["sent"], 6]])
+
+    def test_clear_removes_own_host_files(self):
+        """Проверяет, что при старте удаляются файлы процессов этого хоста, а файлы других хостов остаются"""
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROC_DIR=directory):
+            registry, counter, _ = self.make_registry()
+            counter.inc(status="sent")
+            registry.flush()
+            open(os.path.join(directory, "other-host_1.json"), "w").close()
+
+            registry.clear()
+
+            self.assertEqual(os.listdir(directory), ["other-host_1.json"])
+
+
+class MetricsEndpointTests(TestCase):
+    """Тестирует эндпоинт /metrics"""
+
+    @override_settings(METRICS_TOKEN="secret")
+    @patch("habits.telegram.requests.Session.post")
+    def test_metrics_endpoint(self, mock_post):
+        """Проверяет, что в /metrics попадают отправки в Telegram и длительность запросов API"""
+        mock_post.return_value.status_code = 200
+        send_telegram_message(chat_id=1, message="Hello")
+        self.client.get(reverse("habits:habits-list"))
+
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('telegram_messages_total{status="sent"}', text)
+        self.assertIn('telegram_request_seconds_count{sender="sync"}', text)
+        self.assertIn(
+            'http_request_duration_seconds_count{route="habits:habits-list",method="GET",status="401"}', text
+        )
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_token(self):
+        """Проверяет, что при заданном токене метрики доступны только с ним"""
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_closed_without_token(self):
+        """Проверяет, что без настройки METRICS_TOKEN метрики недоступны"""
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
@@ -0,0 +1,87 @@
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from habits.models import Habit
+from habits.serializers import HabitsSerializer
+from monitoring.mixins import timed_serializer_class
+from users.models import CustomUser
+
+
+@override_settings(PERFORMANCE_SAMPLE_RATE=1, PERFORMANCE_SERVER_TIMING=True)
+class PerformanceMiddlewareTests(APITestCase):
+    """Тестирует замеры производительности запросов"""
+
+    def setUp(self):
+        """Формирует тестовые данные"""
+        self.user = CustomUser.objects.create_user(
+            email="user@example.com", username="user", password="pass123", is_active=True
+        )
+        Habit.objects.create(user=self.user, action="action", place="place", habit_time="09:00", reward="reward")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def get_record(self, logs):
+        return json.loads(logs.records[-1].getMessage())
+
+    def test_list_is_measured(self):
+        """Проверяет заголовок Server-Timing и структурированную запись лога для списка привычек"""
+        with self.assertLogs("monitoring.requests", "INFO") as logs, CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("habits:habits-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = response["Server-Timing"]
+        for metric in ("total;dur=", "db;dur=", "auth;dur=", "serialize;dur=", "render;dur="):
+            self.assertIn(metric, timing)
+
+        record = self.get_record(logs)
+        self.assertEqual(record["view"], "HabitsViewSet")
+        self.assertEqual(record["action"], "list")
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["db_queries"], len(queries.captured_queries))
+        self.assertGreaterEqual(record["total_ms"], record["db_ms"])
+
+    def test_users_list_is_measured(self):
+        """Проверяет замер сериализации в представлении, которое переопределяет get_serializer_class"""
+        with self.assertLogs("monitoring.requests", "INFO") as logs:
+            response = self.client.get(reverse("users:users-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        record = self.get_record(logs)
+        self.assertEqual(record["view"], "CustomUserViewSet")
+        self.assertIn("serialize_ms", record)
+
+    def test_create_measures_validation(self):
+        """Проверяет, что при создании привычки замеряется валидация"""
+        data = {"action": "new", "place": "place", "habit_time": "10:00", "reward": "reward"}
+        with self.assertLogs("monitoring.requests", "INFO") as logs:
+            response = self.client.post(reverse("habits:habits-list"), data)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        record = self.get_record(logs)
+        self.assertEqual(record["action"], "create")
+        self.assertIn("validate_ms", record)
+        self.assertIn("serialize_ms", record)
+
+    @override_settings(PERFORMANCE_SAMPLE_RATE=0)
+    def test_not_sampled_request_is_not_measured(self):
+        """Проверяет, что запрос вне выборки не замеряется"""
+        with self.assertNoLogs("monitoring.requests", "INFO"):
+            response = self.client.get(reverse("habits:habits-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Server-Timing", response)
+
+    def test_timed_serializer_keeps_name(self):
+        """Проверяет, что сериализатор с замерами сохраняет имя и настройки исходного"""
+        serializer_class = timed_serializer_class(HabitsSerializer)
+
+        self.assertEqual(serializer_class.__name__, "HabitsSerializer")
+        self.assertTrue(issubclass(serializer_class, HabitsSerializer))
+        self.assertEqual(serializer_class.Meta.exclude, HabitsSerializer.Meta.exclude)
@@ -0,0 +1,17 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from monitoring.metrics import REGISTRY
+
+
+def metrics_view(request):
+    """
+    Отдает метрики всех процессов в текстовом формате Prometheus.
+    Требуется заголовок Authorization: Bearer <токен из настройки METRICS_TOKEN>; без настройки доступ закрыт
+    """
+    token = settings.METRICS_TOKEN
+    if not token or not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.expose(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,171 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import time as dt_time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from habits.cache import bump_public_feed_version
+from habits.models import Habit
+from users.models import CustomUser
+
+EMAIL_DOMAIN = "load.test"
+
+TIMEZONE_WEIGHTS = {
+    "Europe/Moscow": 55,
+    "Europe/Kaliningrad": 3,
+    "Asia/Yekaterinburg": 10,
+    "Asia/Novosibirsk": 9,
+    "Asia/Krasnoyarsk": 6,
+    "Asia/Irkutsk": 5,
+    "Asia/Yakutsk": 2,
+    "Asia/Vladivostok": 5,
+    "Asia/Sakhalin": 2,
+    "Asia/Magadan": 1,
+    "Asia/Kamchatka": 2,
+}
+PERIODICITY_WEIGHTS = {1: 60, 2: 12, 3: 10, 4: 3, 5: 3, 6: 2, 7: 10}
+# Часы напоминаний: пики утром и вечером
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 8, 14, 12, 6, 4, 3, 4, 3, 3, 3, 3, 4, 6, 9, 10, 8, 5, 2]
+
+USEFUL_ACTIONS = ["поприседать 20 раз", "выпить стакан воды", "сделать зарядку", "прочитать 5 страниц", "медитировать"]
+PLEASANT_ACTIONS = ["послушать музыку", "выпить кофе", "посмотреть серию", "погладить кота", "полистать ленту"]
+PLACES = ["дома", "в парке", "в офисе", "в спортзале", "на балконе"]
+REWARDS = ["съесть конфету", "чашка какао", "10 минут отдыха", "прогулка"]
+
+
+@contextmanager
+def explicit_created_at():
+    """Позволяет задать created_at при bulk_create (по умолчанию его перезаписывает auto_now_add)"""
+    field = Habit._meta.get_field("created_at")
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        "Создает синтетических пользователей и привычки для нагрузочного тестирования "
+        "с реалистичными распределениями и фиксированным seed (chunked bulk_create)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Количество пользователей")
+        parser.add_argument("--habits", type=int, default=10000, help="Количество привычек")
+        parser.add_argument("--seed", type=int, default=42, help="Seed генератора случайных чисел")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Размер пачки bulk_create")
+        parser.add_argument(
+            "--clear", action="store_true", help=f"Удалить ранее сгенерированные данные (@{EMAIL_DOMAIN})"
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        self.rng = random.Random(options["seed"])
+        self.chunk_size = options["chunk_size"]
+        self.now = timezone.now().replace(second=0, microsecond=0)
+
+        if options["clear"]:
+            deleted, _ = CustomUser.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").delete()
+            self.stdout.write(self.style.WARNING(f"Удалено записей: {deleted}"))
+
+        users = self.create_users(options["users"])
+        with explicit_created_at():
+            created = self.create_habits(users, options["habits"])
+        bump_public_feed_version()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Создано пользователей: {len(users)}, привычек: {created} за {elapsed:.1f} с")
+        )
+
+    def create_users(self, count):
+        """Создает пользователей пачками; пароль хэшируется один раз для всех"""
+        password = make_password("load-test-password")
+        start = CustomUser.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").count()
+        timezones, weights = zip(*TIMEZONE_WEIGHTS.items())
+        users = []
+        for chunk_start in range(start, start + count, self.chunk_size):
+            chunk = [
+                CustomUser(
+                    username=f"load_user_{i}",
+                    email=f"load_user_{i}@{EMAIL_DOMAIN}",
+                    password=password,
+                    timezone=self.rng.choices(timezones, weights)[0],
+                    tg_chat_id=10**9 + i if self.rng.random() < 0.8 else None,
+                )
+                for i in range(chunk_start, min(chunk_start + self.chunk_size, start + count))
+            ]
+            users += CustomUser.objects.bulk_create(chunk)
+            self.stdout.write(f"Пользователи: {len(users)}/{count}")
+        return users
+
+    def create_habits(self, users, count):
+        """
+        Создает привычки пачками: сначала приятные (около 20%), затем полезные,
+        которые ссылаются на приятную привычку своего пользователя или имеют вознаграждение
+        """
+        offsets = {
+            tz_name: int(self.now.astimezone(ZoneInfo(tz_name)).utcoffset().total_seconds()) // 60
+            for tz_name in TIMEZONE_WEIGHTS
+        }
+        owners = [self.rng.choice(users) for _ in range(count)]
+        pleasant_count = count // 5
+        counters = {}
+        pleasant_by_user = {}
+        created = 0
+
+        with transaction.atomic():
+            for chunk_start in range(0, count, self.chunk_size):
+                chunk = []
+                for i in range(chunk_start, min(chunk_start + self.chunk_size, count)):
+                    habit = self.build_habit(owners[i], i < pleasant_count, counters, offsets, pleasant_by_user)
+                    chunk.append(habit)
+                chunk = Habit.objects.bulk_create(chunk)
+                for habit in chunk:
+                    if habit.is_pleasant:
+                        pleasant_by_user.setdefault(habit.user_id, []).append(habit.id)
+                created += len(chunk)
+                self.stdout.write(f"Привычки: {created}/{count}")
+        return created
+
+    def build_habit(self, user, is_pleasant, counters, offsets, pleasant_by_user):
+        """Создает объект привычки со случайными реалистичными значениями"""
+        rng = self.rng
+        number = counters[user.id] = counters.get(user.id, 0) + 1
+        actions = PLEASANT_ACTIONS if is_pleasant else USEFUL_ACTIONS
+        habit_time = None
+        reminder_minute = None
+        if rng.random() < 0.95:
+            habit_time = dt_time(rng.choices(range(24), HOUR_WEIGHTS)[0], rng.choice([0, 0, 0, 15, 30, 30, 45]))
+            local_minute = habit_time.hour * 60 + habit_time.minute
+            reminder_minute = (local_minute - offsets[user.timezone]) % 1440
+
+        related_habit_id, reward = None, None
+        if not is_pleasant:
+            own_pleasant = pleasant_by_user.get(user.id)
+            if own_pleasant and rng.random() < 0.5:
+                related_habit_id = rng.choice(own_pleasant)
+            else:
+                reward = rng.choice(REWARDS)
+
+        created_at = self.now - timedelta(days=rng.randrange(365), minutes=rng.randrange(1440))
+        return Habit(
+            user_id=user.id,
+            action=f"{rng.choice(actions)} #{number}",
+            place=rng.choice(PLACES),
+            habit_time=habit_time,
+            reminder_minute=reminder_minute,
+            periodicity=rng.choices(list(PERIODICITY_WEIGHTS), list(PERIODICITY_WEIGHTS.values()))[0],
+            duration=rng.choice([30, 60, 90, 120]),
+            is_pleasant=is_pleasant,
+            related_habit_id=related_habit_id,
+            reward=reward,
+            is_public=rng.random() < 0.3,
+            created_at=created_at,
+        )
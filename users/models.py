@@ -58,6 +58,29 @@ class CustomUser(AbstractUser):
         """Строковое отображение пользователя"""
         return self.username or self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает загруженный из базы часовой пояс, чтобы отследить его изменение при сохранении"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_timezone = instance.__dict__.get("timezone")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Сохраняет пользователя и при смене часового пояса пересчитывает минуты напоминаний его привычек"""
+        loaded_timezone = getattr(self, "_loaded_timezone", None)
+        timezone_changed = self.pk is not None and loaded_timezone is not None and loaded_timezone != self.timezone
+        super().save(*args, **kwargs)
+        self._loaded_timezone = self.timezone
+        if timezone_changed:
+            self.update_habits_reminder_minute()
+
+    def update_habits_reminder_minute(self):
+        """Пересчитывает минуту напоминания (UTC) для всех привычек пользователя"""
+        habits = list(self.habits.all())
+        for habit in habits:
+            habit.reminder_minute = habit.get_reminder_minute(habit.habit_time, self.timezone)
+        self.habits.model.objects.bulk_update(habits, ["reminder_minute"])
+
     class Meta:
         verbose_name = "пользователь"
         verbose_name_plural = "пользователи"
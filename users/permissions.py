@@ -7,7 +7,7 @@ class IsOwner(BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.is_superuser:
             return True
-        return obj.user == request.user
+        return obj.user_id == request.user.id
 
 
 class IsProfileOwner(BasePermission):
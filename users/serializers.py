@@ -42,6 +42,19 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 
+def get_user_habits(user, public_only=False):
+    """
+    Возвращает привычки пользователя. Если привычки предзагружены вьюсетом (prefetched_habits),
+    они фильтруются в памяти без дополнительных запросов к базе
+    """
+    habits = getattr(user, "prefetched_habits", None)
+    if habits is None:
+        habits = user.habits.filter(is_public=True) if public_only else user.habits.all()
+    elif public_only:
+        habits = [h for h in habits if h.is_public]
+    return habits
+
+
 class PublicUserSerializer(serializers.ModelSerializer):
     """Сериализатор для публичного профиля пользователя"""
 
@@ -51,14 +64,12 @@ class PublicUserSerializer(serializers.ModelSerializer):
     @staticmethod
     def get_pleasant_public_habits(user):
         """Возвращает список публичных приятных привычек для публичного профиля пользователя"""
-        habits = user.habits.filter(is_pleasant=True, is_public=True)
-        return [str(h) for h in habits]
+        return [str(h) for h in get_user_habits(user, public_only=True) if h.is_pleasant]
 
     @staticmethod
     def get_useful_public_habits(user):
         """Возвращает список публичных привычек для публичного профиля пользователя"""
-        habits = user.habits.filter(is_pleasant=False, is_public=True)
-        return [str(h) for h in habits]
+        return [str(h) for h in get_user_habits(user, public_only=True) if not h.is_pleasant]
 
     class Meta:
         model = CustomUser
@@ -74,14 +85,12 @@ class CustomUserSerializer(serializers.ModelSerializer):
     @staticmethod
     def get_pleasant_habits(user):
         """Возвращает список атомных привычек для профиля пользователя"""
-        habits = user.habits.filter(is_pleasant=True)
-        return [str(h) for h in habits]
+        return [str(h) for h in get_user_habits(user) if h.is_pleasant]
 
     @staticmethod
     def get_useful_habits(user):
         """Возвращает список атомных привычек для профиля пользователя"""
-        habits = user.habits.filter(is_pleasant=False)
-        return [str(h) for h in habits]
+        return [str(h) for h in get_user_habits(user) if not h.is_pleasant]
 
     class Meta:
         model = CustomUser
@@ -0,0 +1,39 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from habits.models import Habit
+from users.models import CustomUser
+
+
+class GenerateLoadDataTests(TestCase):
+    """Тестирует генератор синтетических данных для нагрузочного тестирования"""
+
+    def generate(self, **options):
+        call_command("generate_load_data", users=5, habits=60, chunk_size=7, stdout=StringIO(), **options)
+
+    def test_creates_users_and_habits(self):
+        """Проверяет количество созданных записей и согласованность вычисляемых полей"""
+        self.generate()
+
+        self.assertEqual(CustomUser.objects.filter(email__endswith="@load.test").count(), 5)
+        self.assertEqual(Habit.objects.count(), 60)
+        for habit in Habit.objects.select_related("user", "related_habit"):
+            self.assertEqual(habit.reminder_minute, Habit.get_reminder_minute(habit.habit_time, habit.user.timezone))
+            if habit.related_habit:
+                self.assertTrue(habit.related_habit.is_pleasant)
+                self.assertEqual(habit.related_habit.user_id, habit.user_id)
+                self.assertIsNone(habit.reward)
+            if habit.is_pleasant:
+                self.assertIsNone(habit.reward)
+
+    def test_fixed_seed_is_reproducible(self):
+        """Проверяет, что при одном seed данные воспроизводятся"""
+        self.generate()
+        first = list(Habit.objects.order_by("id").values_list("action", "habit_time", "periodicity", "is_public"))
+
+        self.generate(clear=True)
+        second = list(Habit.objects.order_by("id").values_list("action", "habit_time", "periodicity", "is_public"))
+
+        self.assertEqual(first, second)
@@ -1,8 +1,11 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
 
+from habits.models import Habit
 from users.models import CustomUser
 
 
@@ -146,3 +149,54 @@ class CustomUserViewSetTests(APITestCase):
         response = self.client_stranger.delete(url)
 
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def add_habits(self, user, prefix):
+        """Создает пользователю публичные приятную и полезную привычки и одну приватную"""
+        Habit.objects.create(user=user, action=f"{prefix}_pleasant", place="дома", is_pleasant=True, is_public=True)
+        Habit.objects.create(user=user, action=f"{prefix}_useful", place="дома", reward="чай", is_public=True)
+        Habit.objects.create(user=user, action=f"{prefix}_private", place="дома", reward="чай")
+
+    def count_queries(self, client, url):
+        """Возвращает количество запросов к базе при GET-запросе"""
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_list_query_count_does_not_depend_on_habits(self):
+        """Проверяет, что список пользователей выполняет одинаковое число запросов независимо от числа привычек"""
+        url = reverse("users:users-list")
+        self.add_habits(self.user1, "first")
+        public_queries = self.count_queries(self.client_stranger, url)
+        full_queries = self.count_queries(self.client_super, url)
+
+        for user in (self.user2, self.user3, self.stranger):
+            self.add_habits(user, "more")
+
+        self.assertEqual(self.count_queries(self.client_stranger, url), public_queries)
+        self.assertEqual(self.count_queries(self.client_super, url), full_queries)
+        self.assertLessEqual(public_queries, 3)
+
+    def test_list_public_habits_split_in_memory(self):
+        """Проверяет, что в публичном списке привычки делятся на приятные и полезные, приватные скрыты"""
+        self.add_habits(self.user1, "first")
+        url = reverse("users:users-list")
+        response = self.client_stranger.get(f"{url}?page_size=10")
+
+        users = {user["username"]: user for user in response.data["results"]}
+        self.assertEqual(users["user1"]["pleasant_public_habits"], ["first_pleasant в None дома"])
+        self.assertEqual(users["user1"]["useful_public_habits"], ["first_useful в None дома"])
+
+    def test_retrieve_query_count_does_not_depend_on_habits(self):
+        """Проверяет, что просмотр профиля выполняет одинаковое число запросов независимо от числа привычек"""
+        url = reverse("users:users-detail", args=[self.user1.id])
+        self.add_habits(self.user1, "first")
+        own_queries = self.count_queries(self.client_user1, url)
+        public_queries = self.count_queries(self.client_stranger, url)
+
+        self.add_habits(self.user1, "second")
+
+        self.assertEqual(self.count_queries(self.client_user1, url), own_queries)
+        self.assertEqual(self.count_queries(self.client_stranger, url), public_queries)
+        response = self.client_user1.get(url)
+        self.assertEqual(len(response.data["useful_habits"]), 4)
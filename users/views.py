@@ -1,13 +1,18 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
+from django.db.models import Prefetch
 
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.filters import OrderingFilter
 from rest_framework.generics import CreateAPIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from habits.bot import get_link_url
+from habits.models import Habit
+from monitoring.mixins import PerformanceMixin
 from users.models import CustomUser
 from users.permissions import IsProfileOwner
 from users.serializers import (
@@ -19,7 +24,7 @@ from users.serializers import (
 User = get_user_model()
 
 
-class RegisterAPIView(CreateAPIView):
+class RegisterAPIView(PerformanceMixin, CreateAPIView):
     """Представление для регистрации пользователя"""
 
     serializer_class = RegisterSerializer
@@ -30,7 +35,7 @@ class RegisterAPIView(CreateAPIView):
     authentication_classes = []
 
 
-class ActivationView(APIView):
+class ActivationView(PerformanceMixin, APIView):
     """Подтверждение email, активация аккаунта пользователя после регистрации"""
 
     permission_classes = [AllowAny]
@@ -49,7 +54,7 @@ class ActivationView(APIView):
         return Response({"detail": "Неверный токен"}, status=400)
 
 
-class CustomUserViewSet(viewsets.ModelViewSet):
+class CustomUserViewSet(PerformanceMixin, viewsets.ModelViewSet):
     """Представление для модели пользователя"""
 
     serializer_class = CustomUserSerializer
@@ -60,6 +65,21 @@ class CustomUserViewSet(viewsets.ModelViewSet):
         IsAuthenticated,
     ]
 
+    def get_queryset(self):
+        """
+        Предзагружает привычки пользователей одним запросом: для публичного списка - только публичные.
+        Сериализаторы делят их на приятные и полезные в памяти
+        """
+        habits = Habit.objects.only("user", "action", "place", "habit_time", "is_pleasant", "is_public")
+        if self.action == "list" and not self.request.user.is_superuser:
+            habits = habits.filter(is_public=True)
+        return CustomUser.objects.prefetch_related(Prefetch("habits", queryset=habits, to_attr="prefetched_habits"))
+
+    @action(detail=False, methods=["get"], url_path="telegram-link")
+    def telegram_link(self, request):
+        """Ссылка на бота для привязки Telegram: по команде /start бот запомнит чат текущего пользователя"""
+        return Response({"url": get_link_url(request.user)})
+
     def get_serializer_class(self):
         """
         Возвращает публичный или полный сериализатор в зависимости от прав пользователя:
@@ -67,8 +87,7 @@ class CustomUserViewSet(viewsets.ModelViewSet):
         """
 
         if self.action == "retrieve":
-            user = self.get_object()
-            if self.request.user.is_superuser or user.id == self.request.user.id:
+            if self.request.user.is_superuser or str(self.request.user.id) == str(self.kwargs.get(self.lookup_field)):
                 return CustomUserSerializer
             return PublicUserSerializer
 